@@ -1,444 +1,307 @@
 import json
 import os
-import tempfile
-from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
 
 import streamlit as st
 
-
-def load_prompt_config(config_path: Path) -> Dict[str, List[str]]:
-    """Carrega listas de classificação a partir de um arquivo JSON."""
-    with config_path.open(encoding="utf-8") as fh:
-        data = json.load(fh)
-
-    required_keys = [
-        "quality_terms",
-        "background_keywords",
-        "character_identifiers",
-        "physical_traits",
-        "action_clothing_keywords",
-        "clothing_keywords",
-        "pose_keywords",
-    ]
-
-    for key in required_keys:
-        data.setdefault(key, [])
-
-    return data
-
-
-CONFIG_PATH = Path(__file__).with_name("prompt_config.json")
-PROMPT_CONFIG = load_prompt_config(CONFIG_PATH)
-
-# Diretórios para regras customizadas (compatível com Streamlit Cloud)
-DEFAULT_CUSTOM_RULES_PATH = Path(__file__).with_name("custom_rules.json")
-DATA_DIR = Path(
-    os.environ.get("PROMPT_SECTIONS_DATA_DIR", Path(tempfile.gettempdir()) / "prompt_sections")
+from promptsections import profiling
+from promptsections.analytics import unmatched_tags as unmatched_tags_of
+from promptsections.archive import PromptArchive
+from promptsections.cache import CachedResult, ResultCache
+from promptsections.classifier import (
+    CATEGORY_OPTIONS,
+    RuleSet,
+    delete_custom_rule as delete_custom_rule_core,
+    export_custom_rules_json,
+    format_output,
+    get_rule_set,
+    list_custom_rules,
+    replace_custom_rules,
+    set_custom_rule as set_custom_rule_core,
+    tag_cache_stats,
 )
-DATA_DIR.mkdir(parents=True, exist_ok=True)
-CUSTOM_RULES_STORAGE_PATH = Path(
-    os.environ.get("PROMPT_SECTIONS_RULES_PATH", DATA_DIR / "custom_rules.json")
+from promptsections.config import ARCHIVE_PATH, CUSTOM_RULES_STORAGE_PATH
+from promptsections.incremental import IncrementalParse
+from promptsections.rules import RulesFileError, normalize_rules_dict
+from promptsections.sessions import (
+    RuleOverlay,
+    SessionStore,
+    forget_changes,
+    overlay_changes,
+    replacement_changes,
+    session_rule_set,
 )
+from promptsections.trace import TraceRecord, page_trace
+from promptsections.watcher import RulesWatcher
 
+# Prompt padrão exibido ao abrir o app
+DEFAULT_PROMPT = (
+    "1girl, solo, blush, ((Zero Two from Darling in the Franxx)), bikini, masterpiece, "
+    "best quality, tsinne, 3d, blurry background, beach"
+)
 
-def load_custom_rules(path: Path) -> Tuple[Dict[str, str], Dict[str, str]]:
-    """Carrega regras customizadas e retorna (raw, normalizado)."""
-    if not path.exists():
-        return {}, {}
 
+def session_overlay() -> RuleOverlay:
     try:
-        with path.open(encoding="utf-8") as fh:
-            data = json.load(fh)
-    except (json.JSONDecodeError, OSError):
-        return {}, {}
-
-    if not isinstance(data, dict):
-        return {}, {}
-
-    return normalize_rules_dict(data)
-
-
-def normalize_rules_dict(data: Dict[str, str]) -> Tuple[Dict[str, str], Dict[str, str]]:
-    raw_rules: Dict[str, str] = {}
-    normalized_rules: Dict[str, str] = {}
-
-    for key, value in data.items():
-        if not isinstance(key, str) or not isinstance(value, str):
-            continue
-        key_clean = key.strip()
-        category_clean = value.strip()
-        if not key_clean or not category_clean:
-            continue
-        raw_rules[key_clean] = category_clean
-        normalized_rules[key_clean.lower()] = category_clean
+        return st.session_state.get('rule_overlay') or {}
+    except Exception:
+        return {}
 
-    return raw_rules, normalized_rules
 
+def store_overlay(overlay: RuleOverlay) -> None:
+    """
+    Guarda na sessão as alterações que não foram gravadas (disco somente leitura).
 
-def save_custom_rules(path: Path, rules: Dict[str, str]) -> bool:
-    serialized = json.dumps(rules, indent=2, ensure_ascii=False)
+    Só as alterações desta sessão ficam nela e só ela as vê: as regras em si
+    são o conjunto ativo, compartilhado e imutável, que não é trocado.
+    """
     try:
-        path.parent.mkdir(parents=True, exist_ok=True)
-        path.write_text(serialized, encoding="utf-8")
-        return True
-    except OSError:
-        return False
+        st.session_state['rule_overlay'] = overlay
+    except Exception:
+        pass
 
 
-def update_custom_rules(raw_rules: Dict[str, str]) -> None:
-    global CUSTOM_RULES_RAW, CUSTOM_RULES
-    CUSTOM_RULES_RAW = dict(sorted(raw_rules.items()))
-    CUSTOM_RULES = {key.lower(): value for key, value in CUSTOM_RULES_RAW.items()}
+def current_rules() -> RuleSet:
+    """Regras desta sessão: o conjunto ativo com o overlay da sessão por cima."""
+    return session_rule_set(session_overlay(), get_rule_set())
 
 
-INITIAL_RULES_PATH = (
-    CUSTOM_RULES_STORAGE_PATH if CUSTOM_RULES_STORAGE_PATH.exists() else DEFAULT_CUSTOM_RULES_PATH
-)
-CUSTOM_RULES_RAW, CUSTOM_RULES = load_custom_rules(INITIAL_RULES_PATH)
+def report_corrupt_rules_file(error: RulesFileError) -> None:
+    """Explica por que a alteração foi desfeita (nada foi gravado nem aplicado)."""
+    st.error(
+        f"Regra não salva: o arquivo de regras em disco está corrompido ({error}). "
+        "Corrija ou remova o arquivo e tente de novo."
+    )
 
 
-def set_custom_rule(tag: str, category: str) -> None:
-    """Atualiza uma regra customizada e persiste no disco."""
+def set_custom_rule(tag: str, category: str) -> bool:
+    """
+    Atualiza uma regra customizada e persiste no disco.
+    False se o arquivo de regras está corrompido.
+    """
+    previous = get_rule_set()
     tag_key = tag.strip()
-    if not tag_key:
-        return
+    try:
+        saved = set_custom_rule_core(tag, category, keep_unsaved=False)
+    except RulesFileError as exc:
+        report_corrupt_rules_file(exc)
+        return False
+    if saved:
+        store_overlay(forget_changes(session_overlay(), [tag_key]))
+    else:
+        category_value = category.strip() or "Restante do Prompt"
+        store_overlay(overlay_changes(session_overlay(), {tag_key: category_value}))
+    refresh_archive(previous)
+    return True
 
-    category_value = category.strip() or "Restante do Prompt"
 
-    new_rules = dict(CUSTOM_RULES_RAW)
-    new_rules[tag_key] = category_value
-    update_custom_rules(new_rules)
-    persisted = save_custom_rules(CUSTOM_RULES_STORAGE_PATH, CUSTOM_RULES_RAW)
-    if not persisted:
-        cache_rules_in_session(CUSTOM_RULES_RAW)
+def delete_custom_rule(tag: str) -> bool:
+    """Remove uma regra customizada; False se o arquivo de regras está corrompido."""
+    previous = get_rule_set()
+    tag_key = tag.strip()
+    try:
+        saved = delete_custom_rule_core(tag, keep_unsaved=False)
+    except RulesFileError as exc:
+        report_corrupt_rules_file(exc)
+        return False
+    if saved:
+        store_overlay(forget_changes(session_overlay(), [tag_key]))
+    else:
+        store_overlay(overlay_changes(session_overlay(), {tag_key: None}))
+    refresh_archive(previous)
+    return True
 
 
-def delete_custom_rule(tag: str) -> None:
-    """Remove uma regra customizada."""
-    tag_key = tag.strip()
-    if not tag_key:
-        return
+def import_custom_rules(raw_rules: Dict[str, str]) -> bool:
+    """
+    Substitui as regras pelas importadas; sem gravação, só nesta sessão.
+    False se o arquivo de regras está corrompido.
+    """
+    previous = get_rule_set()
+    try:
+        saved = replace_custom_rules(raw_rules, keep_unsaved=False)
+    except RulesFileError as exc:
+        report_corrupt_rules_file(exc)
+        return False
+    if saved:
+        store_overlay({})
+    else:
+        store_overlay(replacement_changes(previous, raw_rules))
+    refresh_archive(previous)
+    return True
 
-    if tag_key in CUSTOM_RULES_RAW:
-        new_rules = dict(CUSTOM_RULES_RAW)
-        del new_rules[tag_key]
-        update_custom_rules(new_rules)
-        persisted = save_custom_rules(CUSTOM_RULES_STORAGE_PATH, CUSTOM_RULES_RAW)
-        if not persisted:
-            cache_rules_in_session(CUSTOM_RULES_RAW)
 
-# Prompt padrão exibido ao abrir o app
-DEFAULT_PROMPT = (
-    "1girl, solo, blush, ((Zero Two from Darling in the Franxx)), bikini, masterpiece, "
-    "best quality, tsinne, 3d, blurry background, beach"
-)
+RULES_PAGE_SIZE = 50
+TRACE_PAGE_SIZE = 50
 
-# Listas de termos predefinidos carregadas do JSON
-QUALITY_TERMS = PROMPT_CONFIG["quality_terms"]
-BACKGROUND_KEYWORDS = PROMPT_CONFIG["background_keywords"]
-CHARACTER_IDENTIFIERS = PROMPT_CONFIG["character_identifiers"]
-PHYSICAL_TRAITS = PROMPT_CONFIG["physical_traits"]
-ACTION_CLOTHING_KEYWORDS = PROMPT_CONFIG["action_clothing_keywords"]
-CLOTHING_KEYWORDS = PROMPT_CONFIG["clothing_keywords"]
-POSE_KEYWORDS = PROMPT_CONFIG["pose_keywords"]
-
-QUALITY_TERMS_LOWER = tuple(term.lower() for term in QUALITY_TERMS)
-BACKGROUND_KEYWORDS_LOWER = tuple(term.lower() for term in BACKGROUND_KEYWORDS)
-CHARACTER_IDENTIFIERS_SET = {identifier.lower() for identifier in CHARACTER_IDENTIFIERS}
-PHYSICAL_TRAITS_LOWER = tuple(trait.lower() for trait in PHYSICAL_TRAITS)
-ACTION_CLOTHING_KEYWORDS_LOWER = tuple(
-    keyword.lower() for keyword in ACTION_CLOTHING_KEYWORDS
+RESULT_CACHE_MAX_BYTES = int(
+    os.environ.get("PROMPT_SECTIONS_RESULT_CACHE_BYTES", str(64 * 1024 * 1024))
 )
-CLOTHING_KEYWORDS_LOWER = tuple(keyword.lower() for keyword in CLOTHING_KEYWORDS)
-POSE_KEYWORDS_LOWER = tuple(keyword.lower() for keyword in POSE_KEYWORDS)
-
-CATEGORY_OPTIONS = [
-    "Estilo",
-    "Qualidade",
-    "Background",
-    "Personagem",
-    "Pose",
-    "Roupas",
-    "Restante do Prompt",
-]
+MAX_SESSIONS = int(os.environ.get("PROMPT_SECTIONS_MAX_SESSIONS", "256"))
+SESSION_IDLE_SECONDS = float(os.environ.get("PROMPT_SECTIONS_SESSION_IDLE_SECONDS", "1800"))
 
 
-def detect_style(tags: List[str], index: int) -> tuple[bool, int]:
-    """
-    Detecta se o tag atual é parte de um padrão de estilo.
-    Padrão: autor, autor_style ou autor, autor estilo style
-    Retorna (is_style, próximo_index)
-    """
-    if index >= len(tags) - 1:
-        return False, index + 1
-    
-    current_tag = tags[index].lower().strip()
-    next_tag = tags[index + 1].lower().strip()
-    
-    # Verificar se próximo tag contém 'style'
-    if 'style' not in next_tag:
-        return False, index + 1
-    
-    # Extrair palavras do nome do autor
-    author_words = current_tag.replace('_', ' ').replace('-', ' ').split()
-    
-    # Verificar se alguma palavra do autor aparece no próximo tag
-    for word in author_words:
-        if len(word) > 2 and word in next_tag:  # Palavras com mais de 2 letras
-            return True, index + 2
-    
-    return False, index + 1
+@st.cache_resource
+def get_rules_watcher() -> RulesWatcher:
+    """Observador dos arquivos de regras, único por processo."""
+    return RulesWatcher()
 
 
-def is_physical_trait(tag: str) -> bool:
-    """Verifica se o tag é uma característica física permanente."""
-    tag_lower = tag.lower()
-    return any(trait in tag_lower for trait in PHYSICAL_TRAITS_LOWER)
+@st.cache_resource
+def get_result_cache() -> ResultCache:
+    """Cache de resultados único por processo, compartilhado entre sessões e reruns."""
+    return ResultCache(max_bytes=RESULT_CACHE_MAX_BYTES)
 
 
-def is_action_or_clothing(tag: str) -> bool:
-    """Verifica se o tag é uma ação ou pose."""
-    tag_lower = tag.lower()
-    return any(keyword in tag_lower for keyword in ACTION_CLOTHING_KEYWORDS_LOWER)
+@st.cache_resource
+def get_session_store() -> SessionStore:
+    """Análises incrementais das sessões, único por processo, sem as sessões ociosas."""
+    return SessionStore(max_sessions=MAX_SESSIONS, idle_seconds=SESSION_IDLE_SECONDS)
 
 
-def is_clothing_tag(tag: str) -> bool:
-    """Verifica se o tag descreve uma peça de roupa."""
-    tag_lower = tag.lower()
-    return any(keyword in tag_lower for keyword in CLOTHING_KEYWORDS_LOWER)
+def session_id() -> str:
+    """Id desta sessão no ``SessionStore``."""
+    if 'session_id' not in st.session_state:
+        st.session_state['session_id'] = SessionStore.new_id()
+    return st.session_state['session_id']
 
 
-def is_pose_tag(tag: str) -> bool:
-    """Verifica se o tag descreve pose/enquadramento."""
-    tag_lower = tag.lower()
-    return any(keyword in tag_lower for keyword in POSE_KEYWORDS_LOWER)
+@st.cache_resource
+def get_prompt_archive() -> Optional[PromptArchive]:
+    """Arquivo de prompts classificados, se ``PROMPT_SECTIONS_ARCHIVE_PATH`` estiver definido."""
+    if ARCHIVE_PATH is None:
+        return None
+    return PromptArchive(ARCHIVE_PATH)
 
 
-def normalize_tag(tag: str) -> str:
-    """Remove ênfases simples do tipo (tag:1.2) mantendo apenas a tag."""
-    stripped = tag.strip()
-    if len(stripped) < 5:
-        return stripped
-    if stripped.startswith("(") and stripped.endswith(")"):
-        inner = stripped[1:-1]
-        if ":" in inner and inner.count(":") == 1:
-            candidate, weight = inner.split(":")
-            candidate = candidate.strip()
-            weight = weight.strip()
-            if candidate and weight.replace(".", "", 1).isdigit():
-                return candidate
-    return stripped
+def refresh_archive(previous: RuleSet) -> None:
+    """Regrava os prompts arquivados afetados pela troca de ``previous`` pelas regras ativas."""
+    archive = get_prompt_archive()
+    if archive is not None:
+        archive.reclassify_changes(previous)
 
 
-def parse_prompt(prompt: str) -> tuple[Dict[str, List[str]], List[Dict[str, str]]]:
-    """
-    Parseia o prompt e separa em categorias.
-    """
-    # Limpar e separar por vírgulas
-    tags = [tag.strip() for tag in prompt.split(',') if tag.strip()]
-    
-    style_tags = []
-    quality_tags = []
-    background_detected = False
-    character_tags = []
-    clothing_tags = []
-    pose_tags = []
-    rest_tags = []
-    
-    classification_details: List[Dict[str, str]] = []
-
-    def record(tag_value: str, category: str, reason: str) -> None:
-        classification_details.append(
-            {
-                "tag": tag_value,
-                "categoria": category,
-                "motivo": reason,
-            }
-        )
+def classify_prompt_cached(
+    prompt: str, key: Optional[Tuple[str, str]] = None, rules: Optional[RuleSet] = None
+) -> CachedResult:
+    """Retorna (categorizado, detalhamento, formatado), reaproveitando o cache."""
+    cache = get_result_cache()
+    rules = rules or current_rules()
+    if key is None:
+        key = cache.make_key(prompt, rules.version)
+    result = cache.get(key)
+    if result is None:
+        categorized, trace = classify_prompt_incremental(prompt, rules)
+        result = (categorized, trace, format_output(categorized))
+        cache.put(key, result)
+    return result
 
-    i = 0
-    in_character_section = False
-    
-    custom_rules = CUSTOM_RULES
 
-    while i < len(tags):
-        tag_raw = tags[i]
-        tag = normalize_tag(tag_raw)
-        tag_lower = tag.lower()
-        
-        # 1. Detectar ESTILO (autor + autor_style)
-        is_style, next_i = detect_style(tags, i)
-        if is_style:
-            author_tag = normalize_tag(tags[i])
-            style_tag = normalize_tag(tags[i + 1])
-            style_tags.append(author_tag)
-            style_tags.append(style_tag)
-            record(author_tag, "Estilo", "Autor detectado em sequência de estilo")
-            record(style_tag, "Estilo", "Tag identificada como estilo")
-            i = next_i
-            continue
-        
-        # 2. Detectar QUALIDADE
-        matched_quality = next(
-            (quality_term for quality_term in QUALITY_TERMS_LOWER if quality_term in tag_lower),
-            None,
-        )
-        if matched_quality:
-            quality_tags.append(tag)
-            record(tag, "Qualidade", f"Indicador de qualidade ({matched_quality})")
-            i += 1
-            continue
-        
-        # 3. Detectar BACKGROUND
-        matched_background = next(
-            (bg_keyword for bg_keyword in BACKGROUND_KEYWORDS_LOWER if bg_keyword in tag_lower),
-            None,
-        )
-        if matched_background:
-            background_detected = True
-            record(tag, "Background", f"Cenário detectado ({matched_background})")
-            i += 1
-            continue
-        
-        # 4. Detectar início de seção PERSONAGEM
-        if tag_lower in CHARACTER_IDENTIFIERS_SET:
-            character_tags.append(tag)
-            in_character_section = True
-            record(tag, "Personagem", "Identificador de personagem")
-            i += 1
-            continue
-        
-        # 5. Detectar personagem nomeado (padrão "from [série]")
-        if ' from ' in tag:
-            character_tags.append(tag)
-            in_character_section = True
-            record(tag, "Personagem", "Personagem nomeado detectado")
-            i += 1
-            continue
-        
-        # 6. Se estamos na seção de personagem, classificar entre físico e ação/roupa
-        if in_character_section:
-            # Características físicas vão para PERSONAGEM
-            if is_physical_trait(tag):
-                character_tags.append(tag)
-                record(tag, "Personagem", "Característica física permanente")
-                i += 1
-                continue
-            
-            # Itens de roupa vão para ROUPAS e encerram a seção
-            if is_clothing_tag(tag):
-                clothing_tags.append(tag)
-                record(tag, "Roupas", "Item de vestuário detectado")
-                in_character_section = False
-                i += 1
-                continue
-
-            # Poses vão para POSE e encerram a seção
-            if is_pose_tag(tag):
-                pose_tags.append(tag)
-                record(tag, "Pose", "Pose detectada")
-                in_character_section = False
-                i += 1
-                continue
-
-            # Ações terminam a seção de personagem
-            if is_action_or_clothing(tag):
-                in_character_section = False
-                rest_tags.append(tag)
-                record(tag, "Restante do Prompt", "Ação/pose detectada")
-                i += 1
-                continue
-            
-            # Tags genéricas na seção de personagem (ex: "medieval barmaid")
-            # Heurística: descrições curtas sem termos de ação vão para personagem
-            if len(tag.split()) <= 3 and not any(char.isdigit() for char in tag):
-                character_tags.append(tag)
-                record(tag, "Personagem", "Descrição curta atribuída ao personagem")
-                i += 1
-                continue
-
-        # 6.5 Regras customizadas definidas pelo usuário
-        custom_category = custom_rules.get(tag_lower)
-        if custom_category:
-            normalized_category = custom_category.strip()
-            if normalized_category == "Background":
-                background_detected = True
-            elif normalized_category == "Estilo":
-                style_tags.append(tag)
-            elif normalized_category == "Qualidade":
-                quality_tags.append(tag)
-            elif normalized_category == "Personagem":
-                character_tags.append(tag)
-                in_character_section = True
-            elif normalized_category == "Pose":
-                pose_tags.append(tag)
-                in_character_section = False
-            elif normalized_category == "Roupas":
-                clothing_tags.append(tag)
-            else:
-                normalized_category = "Restante do Prompt"
-                rest_tags.append(tag)
-
-            record(tag, normalized_category, "Regra customizada")
-            i += 1
-            continue
-
-        # 6.6 Itens de roupa fora da seção de personagem
-        if is_clothing_tag(tag):
-            clothing_tags.append(tag)
-            record(tag, "Roupas", "Item de vestuário detectado")
-            in_character_section = False
-            i += 1
-            continue
-
-        # 6.7 Poses fora da seção
-        if is_pose_tag(tag):
-            pose_tags.append(tag)
-            record(tag, "Pose", "Pose detectada")
-            in_character_section = False
-            i += 1
-            continue
-        
-        # 7. Tudo que não se encaixou vai para RESTANTE
-        rest_tags.append(tag)
-        record(tag, "Restante do Prompt", "Sem regra aplicada")
-        i += 1
-    
-    categorized = {
-        'Estilo': style_tags,
-        'Qualidade': quality_tags,
-        'Background': ['((simple background))'] if background_detected else [],
-        'Personagem': character_tags,
-        'Pose': pose_tags,
-        'Roupas': clothing_tags,
-        'Restante do Prompt': rest_tags
-    }
-    
-    return categorized, classification_details
+def classify_prompt_incremental(
+    prompt: str, rules: Optional[RuleSet] = None
+) -> Tuple[Dict[str, List[str]], List[TraceRecord]]:
+    """Reclassifica a partir da primeira tag alterada desde o último prompt desta sessão."""
+    rules = rules or current_rules()
+    store = get_session_store()
+    try:
+        current_session = session_id()
+    except Exception:
+        current_session = None
+    previous = store.get(current_session) if current_session else None
+    if previous is None:
+        parsed = IncrementalParse.parse(prompt, rules)
+    else:
+        parsed = previous.update(prompt, rules)
+    if current_session:
+        store.put(current_session, parsed)
+    return parsed.categorized, parsed.records
 
 
-def format_output(categorized: Dict[str, List[str]]) -> str:
+def store_classification(prompt: str) -> CachedResult:
     """
-    Formata a saída no formato esperado.
+    Classifica o prompt; a sessão guarda só o prompt e a chave do resultado
+    no cache compartilhado.
     """
-    output_parts: List[str] = []
-    ordered_sections = [
-        "Estilo",
-        "Qualidade",
-        "Background",
-        "Personagem",
-        "Pose",
-        "Roupas",
-        "Restante do Prompt",
-    ]
+    rules = current_rules()
+    key = ResultCache.make_key(prompt, rules.version)
+    result = classify_prompt_cached(prompt, key, rules)
+    st.session_state['result_key'] = key
+    st.session_state['result_prompt'] = prompt
+    return result
+
+
+def load_classification() -> Optional[CachedResult]:
+    """Último resultado desta sessão; se já saiu do cache, o mesmo prompt é reclassificado."""
+    key = st.session_state.get('result_key')
+    if key is None:
+        return None
+    result = get_result_cache().get(key)
+    if result is None:
+        result = store_classification(st.session_state.get('result_prompt', ''))
+    return result
+
+
+def render_cache_stats() -> None:
+    """Exibe os contadores dos caches de classificação."""
+    result_stats = get_result_cache().stats()
+    tag_stats = tag_cache_stats()
+    with st.expander("📈 Estatísticas de cache", expanded=False):
+        col_result, col_tag = st.columns(2)
+        with col_result:
+            st.markdown("**Resultados (todas as sessões)**")
+            st.metric("Acertos", result_stats["hits"])
+            st.metric("Falhas", result_stats["misses"])
+            st.caption(
+                f"{result_stats['entries']} prompts, "
+                f"{result_stats['bytes'] / 1024:.0f} de "
+                f"{result_stats['max_bytes'] / 1024:.0f} KiB, "
+                f"{result_stats['evictions']} descartes"
+            )
+        with col_tag:
+            st.markdown("**Tags**")
+            st.metric("Acertos", tag_stats["hits"])
+            st.metric("Falhas", tag_stats["misses"])
+            st.caption(f"{tag_stats['size']} de {tag_stats['maxsize']} decisões em cache")
+        session_stats = get_session_store().stats()
+        st.caption(
+            f"Sessões com análise incremental: {session_stats['sessions']} de "
+            f"{session_stats['max_sessions']} ({session_stats['evictions']} descartadas por ociosidade ou limite)"
+        )
 
-    for section in ordered_sections:
-        content = categorized.get(section, [])
-        if content:
-            output_parts.append(', '.join(content))
 
-    return "\n\n".join(output_parts)
+def render_diagnostics() -> None:
+    """Painel da instrumentação por etapa (vale para o processo inteiro)."""
+    with st.expander("🩺 Diagnóstico de desempenho", expanded=False):
+        enabled = st.checkbox(
+            "Medir etapas da classificação",
+            value=profiling.ACTIVE is not None,
+            key="profiling_enabled",
+        )
+        if not enabled:
+            profiling.disable()
+            st.caption("Ative e processe alguns prompts para ver contagens e tempos por etapa.")
+            return
+        profiler = profiling.enable()
+        if st.button("🧹 Zerar medições"):
+            profiler.reset()
+        snapshot = profiler.snapshot()
+        col_prompts, col_tags, col_time = st.columns(3)
+        col_prompts.metric("Prompts", snapshot["prompts"])
+        col_tags.metric("Tags", snapshot["tags"])
+        col_time.metric("Tempo total", f"{snapshot['total_seconds'] * 1000:.1f} ms")
+        st.markdown("**Por etapa**")
+        rows = ["| Etapa | Tags | ms |", "| --- | ---: | ---: |"]
+        for stage, numbers in snapshot["stages"].items():
+            rows.append(f"| {stage} | {numbers['hits']} | {numbers['seconds'] * 1000:.3f} |")
+        st.markdown("\n".join(rows))
+        st.caption(f"Tokenização e demais passos: {snapshot['other_seconds'] * 1000:.1f} ms")
+        col_lists, col_keywords = st.columns(2)
+        with col_lists:
+            st.markdown("**Listas da configuração**")
+            st.json(snapshot["config_lists"])
+        with col_keywords:
+            st.markdown("**Palavras-chave mais usadas**")
+            st.json(snapshot["top_keywords"])
 
 
 def render_copy_prompt(text: str) -> None:
@@ -454,19 +317,47 @@ def render_copy_prompt(text: str) -> None:
             st.toast("Selecione o prompt acima e copie manualmente (Ctrl+C).")
 
 
-def render_classification_table(details: List[Dict[str, str]]) -> None:
-    """Exibe uma tabela simples com o detalhamento das tags classificadas."""
+def render_pager(total: int, page_size: int, key: str) -> int:
+    """Seletor de página (só com mais de uma); retorna o deslocamento da página escolhida."""
+    page_count = max(1, -(-total // page_size))
+    if page_count == 1:
+        return 0
+    # Um filtro novo pode deixar a página guardada além da última
+    if st.session_state.get(key, 1) > page_count:
+        st.session_state[key] = 1
+    page_number = st.number_input(
+        f"Página (de {page_count})", min_value=1, max_value=page_count, key=key
+    )
+    return (page_number - 1) * page_size
+
+
+def render_classification_table(details: Sequence[Mapping[str, str]]) -> None:
+    """Exibe o detalhamento das tags classificadas, filtrado e uma página por vez."""
     if not details:
         return
 
     def escape(value: str) -> str:
         return value.replace("|", "\\|")
 
+    col_search, col_category = st.columns([2, 1])
+    with col_search:
+        search = st.text_input("Filtrar por tag", key="trace_search")
+    with col_category:
+        category = st.selectbox("Categoria", ["", *CATEGORY_OPTIONS], key="trace_category")
+    total, _ = page_trace(details, 0, 0, search, category)
+    offset = render_pager(total, TRACE_PAGE_SIZE, "trace_page")
+    _, visible = page_trace(details, offset, TRACE_PAGE_SIZE, search, category)
+    if not visible:
+        st.info("Nenhuma tag corresponde ao filtro.")
+        return
+    if total > TRACE_PAGE_SIZE:
+        st.caption(f"Tags {offset + 1}–{offset + len(visible)} de {total}")
+
     rows = [
         "| Tag | Categoria | Motivo |",
         "| --- | --- | --- |",
     ]
-    for item in details:
+    for item in visible:
         rows.append(
             f"| {escape(item['tag'])} | {escape(item['categoria'])} | {escape(item['motivo'])} |"
         )
@@ -481,8 +372,9 @@ def main():
         layout="wide"
     )
 
-    if 'custom_rules_runtime' in st.session_state:
-        update_custom_rules(st.session_state['custom_rules_runtime'])
+    # Regras alteradas em disco (por outro processo ou réplica) entram em vigor aqui
+    get_rules_watcher().maybe_reload()
+
     
     st.title("🎨 Prompt Sections para Stable Diffusion")
     st.markdown("Separe e organize seus prompts em categorias estruturadas.")
@@ -505,19 +397,19 @@ def main():
         
         if st.button("🔄 Processar Prompt", type="primary", use_container_width=True):
             if prompt_input.strip():
-                categorized, trace = parse_prompt(prompt_input)
-                st.session_state['categorized'] = categorized
-                st.session_state['classification_trace'] = trace
-                st.session_state['formatted_output'] = format_output(categorized)
+                store_classification(prompt_input)
+                archive = get_prompt_archive()
+                if archive is not None:
+                    archive.add(prompt_input)
             else:
                 st.warning("⚠️ Por favor, insira um prompt válido.")
     
     with col2:
         st.subheader("✨ Resultado Categorizado")
         
-        if 'categorized' in st.session_state:
-            categorized = st.session_state['categorized']
-            trace = st.session_state.get('classification_trace', [])
+        result = load_classification()
+        if result is not None:
+            categorized, trace, formatted = result
             
             # Exibir cada categoria
             categories_display = {
@@ -530,11 +422,7 @@ def main():
                 'Restante do Prompt': '📝'
             }
 
-            unmatched_tags: List[str] = []
-            for item in trace:
-                if item['categoria'] == 'Restante do Prompt' and item['motivo'] == 'Sem regra aplicada':
-                    if item['tag'] not in unmatched_tags:
-                        unmatched_tags.append(item['tag'])
+            unmatched_tags = unmatched_tags_of(trace)
             
             for category, icon in categories_display.items():
                 content = categorized[category]
@@ -566,15 +454,11 @@ def main():
                         )
                         submitted = st.form_submit_button("Salvar regra")
                     
-                    if submitted:
-                        set_custom_rule(tag_choice, category_choice)
+                    if submitted and set_custom_rule(tag_choice, category_choice):
                         st.success(f"Regra salva: {tag_choice} → {category_choice}")
                         current_prompt = st.session_state.get('prompt_input', '')
                         if current_prompt:
-                            categorized, trace = parse_prompt(current_prompt)
-                            st.session_state['categorized'] = categorized
-                            st.session_state['classification_trace'] = trace
-                            st.session_state['formatted_output'] = format_output(categorized)
+                            store_classification(current_prompt)
                             st.rerun()
 
             with st.expander("🗂️ Gerenciar regras customizadas", expanded=False):
@@ -585,7 +469,19 @@ def main():
                         "Usando regras padrão do repositório. Ao salvar, criaremos um arquivo temporário compatível com Streamlit Cloud."
                     )
 
-                custom_rules_items = sorted(CUSTOM_RULES_RAW.items())
+                rules_search = st.text_input("Filtrar regras por tag", key="rules_search")
+                session_rules = current_rules()
+                # Total e página numa consulta só, pela página guardada na sessão
+                requested = (st.session_state.get("rules_page", 1) - 1) * RULES_PAGE_SIZE
+                total_rules, custom_rules_items = list_custom_rules(
+                    requested, RULES_PAGE_SIZE, rules_search, session_rules
+                )
+                offset = render_pager(total_rules, RULES_PAGE_SIZE, "rules_page")
+                if offset != requested:
+                    # Com outro filtro a página guardada pode ter passado da última
+                    _, custom_rules_items = list_custom_rules(
+                        offset, RULES_PAGE_SIZE, rules_search, session_rules
+                    )
                 if custom_rules_items:
                     st.table(
                         {
@@ -593,19 +489,20 @@ def main():
                             "Categoria": [category for _, category in custom_rules_items],
                         }
                     )
+                elif rules_search.strip():
+                    st.info("Nenhuma regra corresponde ao filtro.")
                 else:
                     st.info("Nenhuma regra cadastrada ainda.")
 
-                download_data = json.dumps(
-                    CUSTOM_RULES_RAW, indent=2, ensure_ascii=False
-                ).encode("utf-8")
-                st.download_button(
-                    "Baixar JSON de regras",
-                    data=download_data,
-                    file_name="custom_rules.json",
-                    mime="application/json",
-                    use_container_width=True,
-                )
+                # O JSON completo só é gerado (e enviado ao navegador) quando pedido
+                if st.checkbox("Preparar JSON de regras para download", key="rules_export"):
+                    st.download_button(
+                        "Baixar JSON de regras",
+                        data=export_custom_rules_json(session_rules).encode("utf-8"),
+                        file_name="custom_rules.json",
+                        mime="application/json",
+                        use_container_width=True,
+                    )
 
                 with st.form("import_rules_form"):
                     uploaded_file = st.file_uploader(
@@ -628,19 +525,13 @@ def main():
                                 raw_rules, _ = normalize_rules_dict(uploaded_data)
                                 if not raw_rules:
                                     st.warning("Nenhuma regra válida encontrada no arquivo.")
-                                else:
-                                    update_custom_rules(raw_rules)
-                                    persisted = save_custom_rules(
-                                        CUSTOM_RULES_STORAGE_PATH, CUSTOM_RULES_RAW
-                                    )
-                                    if not persisted:
-                                        cache_rules_in_session(CUSTOM_RULES_RAW)
+                                elif import_custom_rules(raw_rules):
                                     st.success("Regras importadas com sucesso.")
                                     st.rerun()
 
                 st.markdown("### Adicionar regra manualmente")
                 with st.form("manual_rule_form", clear_on_submit=True):
-                    manual_tag = st.text_input("Tag exata (case-insensitive)")
+                    manual_tag = st.text_input("Tag ou padrão com * (ex.: * hair)")
                     manual_category = st.selectbox(
                         "Categoria",
                         CATEGORY_OPTIONS,
@@ -649,15 +540,15 @@ def main():
                     )
                     submitted_manual = st.form_submit_button("Salvar nova regra")
 
-                if submitted_manual and manual_tag.strip():
-                    set_custom_rule(manual_tag, manual_category)
+                if (
+                    submitted_manual
+                    and manual_tag.strip()
+                    and set_custom_rule(manual_tag, manual_category)
+                ):
                     st.success(f"Regra salva: {manual_tag.strip()} → {manual_category}")
                     current_prompt = st.session_state.get('prompt_input', '')
                     if current_prompt:
-                        categorized, trace = parse_prompt(current_prompt)
-                        st.session_state['categorized'] = categorized
-                        st.session_state['classification_trace'] = trace
-                        st.session_state['formatted_output'] = format_output(categorized)
+                        store_classification(current_prompt)
                     st.rerun()
 
                 if custom_rules_items:
@@ -670,15 +561,11 @@ def main():
                         )
                         delete_submit = st.form_submit_button("Remover regra")
 
-                    if delete_submit:
-                        delete_custom_rule(delete_choice)
+                    if delete_submit and delete_custom_rule(delete_choice):
                         st.warning(f"Regra removida: {delete_choice}")
                         current_prompt = st.session_state.get('prompt_input', '')
                         if current_prompt:
-                            categorized, trace = parse_prompt(current_prompt)
-                            st.session_state['categorized'] = categorized
-                            st.session_state['classification_trace'] = trace
-                            st.session_state['formatted_output'] = format_output(categorized)
+                            store_classification(current_prompt)
                         st.rerun()
             
             if trace:
@@ -713,15 +600,11 @@ def main():
                             )
                             submit_reclass = st.form_submit_button("Reclassificar")
 
-                        if submit_reclass and tag_choice:
-                            set_custom_rule(tag_choice, new_category)
+                        if submit_reclass and tag_choice and set_custom_rule(tag_choice, new_category):
                             st.success(f"{tag_choice} movido para {new_category}.")
                             current_prompt = st.session_state.get('prompt_input', '')
                             if current_prompt:
-                                categorized, trace = parse_prompt(current_prompt)
-                                st.session_state['categorized'] = categorized
-                                st.session_state['classification_trace'] = trace
-                                st.session_state['formatted_output'] = format_output(categorized)
+                                store_classification(current_prompt)
                             st.rerun()
                     else:
                         st.info("Nenhuma tag disponível para reclassificar.")
@@ -733,8 +616,6 @@ def main():
             
             # Saída formatada final
             st.subheader("📋 Prompt Formatado")
-            formatted = format_output(categorized)
-            st.session_state['formatted_output'] = formatted
             st.text_area(
                 "Copie o prompt reorganizado:",
                 value=formatted,
@@ -744,6 +625,9 @@ def main():
             render_copy_prompt(formatted)
         else:
             st.info("👈 Cole um prompt e clique em 'Processar Prompt' para ver os resultados.")
+
+    render_cache_stats()
+    render_diagnostics()
     
     # Rodapé com exemplos
     with st.expander("📚 Ver Exemplos de Prompts"):
@@ -774,12 +658,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-CUSTOM_RULES_RAW, CUSTOM_RULES = load_custom_rules(INITIAL_RULES_PATH)
-
-
-def cache_rules_in_session(raw_rules: Dict[str, str]) -> None:
-    """Guarda regras em memória para ambientes somente leitura."""
-    try:
-        st.session_state['custom_rules_runtime'] = dict(raw_rules)
-    except Exception:
-        pass
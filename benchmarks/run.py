@@ -0,0 +1,335 @@
+"""
+Benchmarks do classificador com corpora sintéticos.
+
+Uso:
+    python -m benchmarks.run                      # cenários padrão
+    python -m benchmarks.run --tags 10,150 --rules 100,50000
+    python -m benchmarks.run --compare benchmarks/results/<anterior>.json
+
+Cada execução grava um JSON em ``benchmarks/results/`` com o commit atual,
+para comparar vazão, latência (p50/p95/p99) e pico de memória entre commits.
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from itertools import count, product
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from promptsections.classifier import (
+    CompiledConfig,
+    RuleSet,
+    format_output,
+    normalize_tag,
+    parse_prompt,
+)
+from promptsections.config import CONFIG_PATH, load_prompt_config
+from promptsections.incremental import IncrementalParse
+from promptsections.rules import RuleStore
+from promptsections.tokenizer import tokenize_prompt
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+_SYLLABLES = ("ka", "ri", "mo", "to", "na", "shi", "ru", "ye", "lo", "zen", "vi", "da")
+
+
+def _word(rng: random.Random, parts: int = 3) -> str:
+    return "".join(rng.choice(_SYLLABLES) for _ in range(parts))
+
+
+def synthetic_config(keyword_count: int, seed: int = 0) -> Dict[str, List[str]]:
+    """Configuração real acrescida de ``keyword_count`` palavras sintéticas por lista."""
+    rng = random.Random(seed)
+    config = load_prompt_config(CONFIG_PATH)
+    for key, keywords in config.items():
+        if key == "character_identifiers":
+            continue
+        extra = [f"{_word(rng)} {_word(rng, 2)}" for _ in range(keyword_count)]
+        config[key] = list(keywords) + extra
+    return config
+
+
+def synthetic_rules(rule_count: int, seed: int = 0) -> Dict[str, str]:
+    rng = random.Random(seed + 1)
+    categories = ("Estilo", "Qualidade", "Personagem", "Pose", "Roupas", "Restante do Prompt")
+    return {f"{_word(rng, 4)} {index}": rng.choice(categories) for index in range(rule_count)}
+
+
+def synthetic_prompts(
+    count: int,
+    tags_per_prompt: int,
+    config: Dict[str, List[str]],
+    rules: Dict[str, str],
+    emphasis_ratio: float = 0.2,
+    seed: int = 0,
+) -> List[str]:
+    """Prompts com tags da configuração, das regras, ênfases ``(tag:1.2)`` e pares de estilo."""
+    rng = random.Random(seed + 2)
+    vocabulary = [keyword for keywords in config.values() for keyword in keywords[:200]]
+    vocabulary += list(rules)[:500]
+    vocabulary += [_word(rng) for _ in range(200)]
+
+    prompts = []
+    for _ in range(count):
+        tags = []
+        while len(tags) < tags_per_prompt:
+            roll = rng.random()
+            if roll < 0.03:
+                author = _word(rng)
+                tags += [author, f"{author}_style"]
+                continue
+            tag = rng.choice(vocabulary)
+            if roll < 0.03 + emphasis_ratio:
+                tag = f"({tag}:{rng.choice(('0.8', '1.1', '1.2', '1.4'))})"
+            tags.append(tag)
+        prompts.append(", ".join(tags[:tags_per_prompt]))
+    return prompts
+
+
+def _percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def measure(
+    func: Callable[[Any], Any],
+    inputs: Sequence[Any],
+    reset: Optional[Callable[[], None]] = None,
+) -> Dict[str, float]:
+    """
+    Vazão e latência por chamada. O pico de memória vem de uma passada
+    separada, feita antes, que inclui o que a primeira passada aloca (ex.:
+    entradas de cache). ``reset`` volta ao estado inicial entre as passadas,
+    para que a cronometrada também parta dele.
+    """
+    tracemalloc.start()
+    for item in inputs:
+        func(item)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if reset is not None:
+        reset()
+
+    latencies = []
+    perf_counter = time.perf_counter
+    started = perf_counter()
+    for item in inputs:
+        call_start = perf_counter()
+        func(item)
+        latencies.append(perf_counter() - call_start)
+    total = perf_counter() - started
+
+    latencies.sort()
+    return {
+        "ops": len(inputs),
+        "total_s": round(total, 6),
+        "ops_per_s": round(len(inputs) / total, 1) if total > 0 else 0.0,
+        "mean_us": round(statistics.fmean(latencies) * 1e6, 3) if latencies else 0.0,
+        "p50_us": round(_percentile(latencies, 0.50) * 1e6, 3),
+        "p95_us": round(_percentile(latencies, 0.95) * 1e6, 3),
+        "p99_us": round(_percentile(latencies, 0.99) * 1e6, 3),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def run_scenario(
+    prompt_count: int,
+    tags_per_prompt: int,
+    keyword_count: int,
+    rule_count: int,
+    emphasis_ratio: float,
+    seed: int = 0,
+) -> List[Dict[str, Any]]:
+    """Executa todos os benchmarks para uma combinação de parâmetros."""
+    params = {
+        "prompts": prompt_count,
+        "tags_per_prompt": tags_per_prompt,
+        "keywords": keyword_count,
+        "rules": rule_count,
+        "emphasis_ratio": emphasis_ratio,
+    }
+    config = synthetic_config(keyword_count, seed)
+    rules = synthetic_rules(rule_count, seed)
+    prompts = synthetic_prompts(prompt_count, tags_per_prompt, config, rules, emphasis_ratio, seed)
+
+    build_started = time.perf_counter()
+    compiled = CompiledConfig(config)
+    build_s = time.perf_counter() - build_started
+    rule_set = RuleSet(compiled, rules)
+
+    tag_lists = [[tag.strip() for tag in prompt.split(",")] for prompt in prompts]
+    all_tags = [tag for tags in tag_lists for tag in tags]
+    style_pairs = [pair for tags in tag_lists[:200] for pair in zip(tags, tags[1:])]
+
+    results: List[Dict[str, Any]] = []
+
+    def add(name: str, metrics: Dict[str, float]) -> None:
+        results.append({"benchmark": name, "params": params, **metrics})
+
+    add("compile_config", {"ops": 1, "total_s": round(build_s, 6)})
+    # Primeira passada com cache de tags vazio, depois com cache aquecido
+    cold = {"rules": RuleSet(compiled, rules)}
+
+    def reset_cold() -> None:
+        cold["rules"] = RuleSet(compiled, rules)
+
+    add(
+        "parse_prompt_cold",
+        measure(lambda prompt: parse_prompt(prompt, rules=cold["rules"]), prompts, reset_cold),
+    )
+    for prompt in prompts:
+        parse_prompt(prompt, rules=rule_set)
+    add("parse_prompt", measure(lambda prompt: parse_prompt(prompt, rules=rule_set), prompts))
+    add(
+        "parse_prompt_no_trace",
+        measure(lambda prompt: parse_prompt(prompt, rules=rule_set, trace=False), prompts),
+    )
+    # Edição de uma tag no fim de um prompt já classificado
+    parsed = [IncrementalParse.parse(prompt, rule_set) for prompt in prompts]
+    add(
+        "parse_incremental",
+        measure(lambda item: item[0].update(item[1], rule_set), [
+            (previous, prompt.rsplit(",", 1)[0] + ", edited tag")
+            for previous, prompt in zip(parsed, prompts)
+        ]),
+    )
+    # Nova regra para uma tag do meio de um prompt, com o resultado anterior em mãos
+    sample_tags = parsed[0].tags
+    changed_rules = rule_set.with_rule_changes(
+        {sample_tags[len(sample_tags) // 2] if sample_tags else "bench tag": "Pose"}
+    )
+    add("reclassify_rule_change", measure(lambda item: item.with_rules(changed_rules), parsed))
+    add("tokenize_prompt", measure(lambda prompt: list(tokenize_prompt(prompt)), prompts))
+    add("normalize_tag", measure(normalize_tag, all_tags))
+    # Par autor + estilo no índice da configuração sintética (o de ``detect_style``)
+    is_pair = rule_set.compiled.style.is_pair
+    add("detect_style", measure(lambda pair: is_pair(*pair), style_pairs))
+    categorized = [parse_prompt(prompt, rules=rule_set)[0] for prompt in prompts[:1000]]
+    add("format_output", measure(format_output, categorized))
+    add("custom_rule_save", _measure_rule_save(rule_set, min(200, max(20, prompt_count // 10))))
+    return results
+
+
+def _measure_rule_save(rule_set: RuleSet, saves: int) -> Dict[str, float]:
+    """Caminho de ``set_custom_rule``: novo RuleSet + gravação no armazenamento."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        state: Dict[str, Any] = {}
+        passes = count()
+
+        def reset() -> None:
+            # Cada passada grava em um arquivo novo, a partir das mesmas regras
+            store = RuleStore(Path(tmp_dir) / f"custom_rules_{next(passes)}.json")
+            store.replace_all(rule_set.custom_rules_raw)
+            state.update(rules=rule_set, store=store)
+
+        def save(index: int) -> None:
+            changes = {f"bench tag {index}": "Pose"}
+            state["rules"] = state["rules"].with_rule_changes(changes)
+            state["store"].apply(changes)
+
+        reset()
+        return measure(save, list(range(saves)), reset)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        completed = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).resolve().parent,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return completed.stdout.strip() or None
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def _result_key(result: Dict[str, Any]) -> str:
+    return json.dumps([result["benchmark"], result["params"]], sort_keys=True)
+
+
+def print_results(results: List[Dict[str, Any]], baseline: Optional[Dict[str, Any]] = None) -> None:
+    previous = {}
+    if baseline:
+        previous = {_result_key(item): item for item in baseline.get("results", [])}
+
+    header = (
+        f"{'benchmark':<22} {'tags':>5} {'kw':>6} {'rules':>7} {'total s':>9} "
+        f"{'ops/s':>12} {'p50 us':>9} {'p99 us':>9} {'peak KiB':>9}"
+    )
+    if baseline:
+        header += f" {'vs base':>8}"
+    print(header)
+    for result in results:
+        params = result["params"]
+        line = (
+            f"{result['benchmark']:<22} {params['tags_per_prompt']:>5} {params['keywords']:>6} "
+            f"{params['rules']:>7} {result['total_s']:>9.3f} {result.get('ops_per_s', 0):>12.1f} "
+            f"{result.get('p50_us', 0):>9.1f} {result.get('p99_us', 0):>9.1f} "
+            f"{result.get('peak_kib', 0):>9.1f}"
+        )
+        old = previous.get(_result_key(result))
+        if old and old.get("ops_per_s"):
+            line += f" {result.get('ops_per_s', 0) / old['ops_per_s']:>7.2f}x"
+        print(line)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--prompts", type=int, default=1000, help="Prompts por cenário.")
+    parser.add_argument("--tags", type=_int_list, default=[10, 40, 150], help="Tags por prompt.")
+    parser.add_argument("--keywords", type=_int_list, default=[0, 2000], help="Palavras extras por lista.")
+    parser.add_argument("--rules", type=_int_list, default=[100, 20000], help="Regras customizadas.")
+    parser.add_argument("--emphasis", type=float, default=0.2, help="Fração de tags com peso.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="Arquivo JSON de resultados.")
+    parser.add_argument("--compare", type=Path, help="Resultado anterior para comparação.")
+    args = parser.parse_args(argv)
+
+    results: List[Dict[str, Any]] = []
+    for tags, keywords, rules in product(args.tags, args.keywords, args.rules):
+        print(f"cenário: {tags} tags, {keywords} palavras extras, {rules} regras...", file=sys.stderr)
+        results.extend(run_scenario(args.prompts, tags, keywords, rules, args.emphasis, args.seed))
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    output = args.output
+    if output is None:
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        output = RESULTS_DIR / f"{stamp}-{commit or 'sem-commit'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    baseline = None
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+    print_results(results, baseline)
+    print(f"\nResultados gravados em {output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
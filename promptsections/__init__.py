@@ -0,0 +1,30 @@
+"""Núcleo de classificação de prompts do Prompt Sections.
+
+Importar o pacote não carrega o Streamlit nem lê arquivos; as regras são
+compiladas no primeiro uso de ``parse_prompt``.
+"""
+from promptsections.classifier import (
+    CATEGORY_OPTIONS,
+    RuleSet,
+    classify_tag,
+    detect_style,
+    format_output,
+    get_rule_set,
+    normalize_tag,
+    parse_prompt,
+    set_rule_set,
+    update_custom_rules,
+)
+
+__all__ = [
+    "CATEGORY_OPTIONS",
+    "RuleSet",
+    "classify_tag",
+    "detect_style",
+    "format_output",
+    "get_rule_set",
+    "normalize_tag",
+    "parse_prompt",
+    "set_rule_set",
+    "update_custom_rules",
+]
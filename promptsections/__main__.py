@@ -0,0 +1,5 @@
+import sys
+
+from promptsections.cli import main
+
+sys.exit(main())
@@ -0,0 +1,114 @@
+"""Estatísticas de tags sem regra em corpora grandes, com memória limitada."""
+import json
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from promptsections.classifier import RuleSet, get_rule_set, parse_prompt
+from promptsections.rule_index import canonical_tag
+
+DEFAULT_CAPACITY = 10000
+UNMATCHED_CATEGORY = "Restante do Prompt"
+
+
+def unmatched_tags(trace: Iterable[Mapping[str, str]]) -> List[str]:
+    """Tags sem regra aplicada, sem repetição e na ordem do prompt."""
+    return list(
+        dict.fromkeys(
+            item["tag"]
+            for item in trace
+            if item["categoria"] == UNMATCHED_CATEGORY and item["motivo"] == "Sem regra aplicada"
+        )
+    )
+
+
+class SpaceSaving:
+    """
+    Contagem aproximada dos itens mais frequentes (algoritmo Space-Saving).
+
+    Guarda no máximo ``2 * capacity`` contadores. Quando o limite é atingido,
+    só os ``capacity`` maiores ficam, e um item novo começa do maior contador
+    descartado até então. Cada estimativa é maior ou igual à contagem real e
+    a excede em no máximo ``error``; os itens frequentes ficam com erro zero
+    ou pequeno, e a memória não cresce com o tamanho do corpus.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY) -> None:
+        self.capacity = max(1, capacity)
+        self.total = 0
+        self._counts: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+        self._floor = 0
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def add(self, item: str, count: int = 1) -> None:
+        self.total += count
+        counts = self._counts
+        if item in counts:
+            counts[item] += count
+            return
+        counts[item] = self._floor + count
+        self._errors[item] = self._floor
+        if len(counts) > 2 * self.capacity:
+            self._prune()
+
+    def _prune(self) -> None:
+        ranked = sorted(self._counts.items(), key=lambda pair: pair[1], reverse=True)
+        kept = ranked[: self.capacity]
+        self._floor = max(self._floor, ranked[self.capacity][1])
+        self._counts = dict(kept)
+        self._errors = {item: self._errors[item] for item, _ in kept}
+
+    def top(self, limit: Optional[int] = None) -> List[Tuple[str, int, int]]:
+        """``(item, contagem estimada, erro máximo)`` em ordem decrescente."""
+        ranked = sorted(self._counts.items(), key=lambda pair: (-pair[1], pair[0]))
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [(item, count, self._errors[item]) for item, count in ranked]
+
+
+class UnmatchedReport:
+    """Acumula as tags sem regra de muitos prompts, um prompt por vez."""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, rules: Optional[RuleSet] = None) -> None:
+        self.rules = rules or get_rule_set()
+        self.counter = SpaceSaving(capacity)
+        self.prompts = 0
+        self.tags = 0
+
+    def add_prompt(self, prompt: str) -> None:
+        _, trace = parse_prompt(prompt, rules=self.rules)
+        self.prompts += 1
+        self.tags += len(trace)
+        add = self.counter.add
+        for item in trace:
+            if item.reason == "no_rule":
+                # Na forma canônica, como as regras customizadas são aplicadas
+                add(canonical_tag(item.tag))
+
+    def add_prompts(self, prompts: Iterable[str]) -> "UnmatchedReport":
+        for prompt in prompts:
+            self.add_prompt(prompt)
+        return self
+
+    def to_dict(self, limit: int = 100) -> Dict[str, object]:
+        return {
+            "prompts": self.prompts,
+            "tags": self.tags,
+            "unmatched": self.counter.total,
+            "rules_version": self.rules.version,
+            "top": [
+                {"tag": tag, "count": count, "error": error}
+                for tag, count, error in self.counter.top(limit)
+            ],
+        }
+
+    def rules_template(self, limit: int = 100) -> str:
+        """
+        JSON no formato do ``custom_rules.json``: regras atuais + as tags mais
+        frequentes sem regra, com a categoria padrão para revisar e importar.
+        """
+        template = dict(self.rules.custom_rules_raw)
+        for tag, _, _ in self.counter.top(limit):
+            template.setdefault(tag, UNMATCHED_CATEGORY)
+        return json.dumps(template, indent=2, ensure_ascii=False)
@@ -0,0 +1,195 @@
+"""Arquivo de prompts já classificados, com índice invertido tag → prompts."""
+import json
+import sqlite3
+from contextlib import closing, contextmanager
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from promptsections.classifier import RuleSet, format_output, get_rule_set, parse_prompt
+from promptsections.rule_index import canonical_tag
+from promptsections.tokenizer import tag_texts
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS prompts (
+    id INTEGER PRIMARY KEY,
+    prompt TEXT NOT NULL UNIQUE,
+    categorized TEXT NOT NULL,
+    formatted TEXT NOT NULL,
+    rules_version TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS prompt_tags (
+    tag_lower TEXT NOT NULL,
+    prompt_id INTEGER NOT NULL,
+    PRIMARY KEY (tag_lower, prompt_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_prompt_tags_prompt ON prompt_tags (prompt_id);
+"""
+
+# Limite de parâmetros por consulta ``IN (...)``
+_QUERY_CHUNK = 500
+# ``PRAGMA user_version``; 1: índice com as tags na forma canônica
+_INDEX_VERSION = 1
+
+
+class PromptArchive:
+    """
+    Prompts classificados em um arquivo SQLite, com o resultado atual de cada um.
+
+    O índice ``prompt_tags`` liga cada tag (na forma canônica, como as regras
+    customizadas são aplicadas) aos prompts que a contêm. As tags vêm da
+    tokenização e não dependem das regras, então o índice só muda quando um
+    prompt entra ou sai; ao mudar uma regra só os prompts com a tag são
+    reclassificados e regravados.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+            if conn.execute("PRAGMA user_version").fetchone()[0] < _INDEX_VERSION:
+                self._rebuild_index(conn)
+                conn.execute(f"PRAGMA user_version = {_INDEX_VERSION}")
+
+    @staticmethod
+    def _rebuild_index(conn: sqlite3.Connection) -> None:
+        """Refaz o índice de arquivos antigos (tags só em minúsculas) a partir dos prompts."""
+        conn.execute("DELETE FROM prompt_tags")
+        for prompt_id, prompt in conn.execute("SELECT id, prompt FROM prompts").fetchall():
+            conn.executemany(
+                "INSERT OR IGNORE INTO prompt_tags (tag_lower, prompt_id) VALUES (?, ?)",
+                ((tag, prompt_id) for tag in {canonical_tag(text) for text in tag_texts(prompt)}),
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        with closing(sqlite3.connect(self.path, timeout=30)) as conn:
+            with conn:
+                yield conn
+
+    def add(self, prompt: str, rules: Optional[RuleSet] = None) -> int:
+        """Classifica e guarda ``prompt``; retorna o id (o existente, se já arquivado)."""
+        return self.add_many([prompt], rules)[0]
+
+    def add_many(self, prompts: Iterable[str], rules: Optional[RuleSet] = None) -> List[int]:
+        """Como ``add`` para vários prompts, em uma única transação."""
+        rules = rules or get_rule_set()
+        ids = []
+        with self._connect() as conn:
+            for prompt in prompts:
+                row = conn.execute("SELECT id FROM prompts WHERE prompt = ?", (prompt,)).fetchone()
+                if row is not None:
+                    ids.append(row[0])
+                    continue
+                categorized, trace = parse_prompt(prompt, rules=rules)
+                cursor = conn.execute(
+                    "INSERT INTO prompts (prompt, categorized, formatted, rules_version) "
+                    "VALUES (?, ?, ?, ?)",
+                    (
+                        prompt,
+                        json.dumps(categorized, ensure_ascii=False),
+                        format_output(categorized),
+                        rules.version,
+                    ),
+                )
+                prompt_id = cursor.lastrowid
+                conn.executemany(
+                    "INSERT OR IGNORE INTO prompt_tags (tag_lower, prompt_id) VALUES (?, ?)",
+                    ((tag, prompt_id) for tag in {canonical_tag(item.tag) for item in trace}),
+                )
+                ids.append(prompt_id)
+        return ids
+
+    def remove(self, prompt_id: int) -> bool:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM prompt_tags WHERE prompt_id = ?", (prompt_id,))
+            return conn.execute("DELETE FROM prompts WHERE id = ?", (prompt_id,)).rowcount > 0
+
+    def get(self, prompt_id: int) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, prompt, categorized, formatted, rules_version FROM prompts WHERE id = ?",
+                (prompt_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0],
+            "prompt": row[1],
+            "categorized": json.loads(row[2]),
+            "formatted": row[3],
+            "rules_version": row[4],
+        }
+
+    def count(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM prompts").fetchone()[0]
+
+    def prompts_with_tags(self, tags: Iterable[str]) -> List[int]:
+        """Ids dos prompts que contêm alguma das tags (comparadas na forma canônica)."""
+        lowered = iter(sorted({canonical_tag(tag) for tag in tags}))
+        ids = set()
+        with self._connect() as conn:
+            while True:
+                chunk = list(islice(lowered, _QUERY_CHUNK))
+                if not chunk:
+                    break
+                placeholders = ", ".join("?" * len(chunk))
+                ids.update(
+                    row[0]
+                    for row in conn.execute(
+                        f"SELECT prompt_id FROM prompt_tags WHERE tag_lower IN ({placeholders})",
+                        chunk,
+                    )
+                )
+        return sorted(ids)
+
+    def reclassify_tags(self, tags: Iterable[str], rules: Optional[RuleSet] = None) -> int:
+        """Reclassifica só os prompts que contêm ``tags``; retorna quantos foram regravados."""
+        return self._reclassify(self.prompts_with_tags(tags), rules)
+
+    def reclassify_all(self, rules: Optional[RuleSet] = None) -> int:
+        """Reclassifica o arquivo inteiro (ex.: depois de mudar o ``prompt_config.json``)."""
+        with self._connect() as conn:
+            ids = [row[0] for row in conn.execute("SELECT id FROM prompts ORDER BY id")]
+        return self._reclassify(ids, rules)
+
+    def reclassify_changes(self, previous: RuleSet, rules: Optional[RuleSet] = None) -> int:
+        """Reclassifica o que pode ter mudado entre ``previous`` e ``rules``."""
+        rules = rules or get_rule_set()
+        changed = rules.changed_tags(previous)
+        if changed is None:
+            return self.reclassify_all(rules)
+        return self.reclassify_tags(changed, rules) if changed else 0
+
+    def _reclassify(self, ids: List[int], rules: Optional[RuleSet]) -> int:
+        rules = rules or get_rule_set()
+        version = rules.version
+        updated = 0
+        with self._connect() as conn:
+            for start in range(0, len(ids), _QUERY_CHUNK):
+                chunk = ids[start:start + _QUERY_CHUNK]
+                placeholders = ", ".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT id, prompt FROM prompts WHERE id IN ({placeholders})", chunk
+                ).fetchall()
+                changes = []
+                for prompt_id, prompt in rows:
+                    # As tags do índice não mudam com as regras: o detalhamento é dispensável
+                    categorized, _ = parse_prompt(prompt, rules=rules, trace=False)
+                    changes.append(
+                        (
+                            json.dumps(categorized, ensure_ascii=False),
+                            format_output(categorized),
+                            version,
+                            prompt_id,
+                        )
+                    )
+                conn.executemany(
+                    "UPDATE prompts SET categorized = ?, formatted = ?, rules_version = ? "
+                    "WHERE id = ?",
+                    changes,
+                )
+                updated += len(changes)
+        return updated
@@ -0,0 +1,158 @@
+"""
+Artefato binário com o conjunto de regras já compilado (``compile-rules``).
+
+Formato: cabeçalho fixo (assinatura, versão do formato e ``MAGIC_NUMBER`` do
+Python que gravou), metadados em JSON e o estado compilado em ``marshal``.
+O arquivo é lido via ``mmap``; ``marshal`` só decodifica tipos básicos, então
+carregar um artefato não executa código. Um artefato de outra versão do
+formato ou do Python é ignorado, assim como a parte cujas fontes (o
+``prompt_config.json`` e o arquivo de regras) mudaram depois da compilação.
+"""
+import hashlib
+import json
+import marshal
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from datetime import datetime, timezone
+from functools import lru_cache
+from importlib.util import MAGIC_NUMBER
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Optional
+
+from promptsections.classifier import CompiledConfig, RuleSet, load_rule_set
+from promptsections.config import CONFIG_PATH, initial_rules_path
+from promptsections.rules import is_sqlite_path, load_custom_rules
+
+# 2: regras customizadas com chaves na forma canônica; 3: versão pelo XOR dos hashes das regras
+ARTIFACT_FORMAT = 3
+_SIGNATURE = b"PSRULES\x00"
+# assinatura, versão do formato, MAGIC_NUMBER do Python, tamanho dos metadados
+_HEADER = struct.Struct("<8sH4sI")
+
+
+class RulesArtifact(NamedTuple):
+    meta: Dict[str, Any]
+    compiled: CompiledConfig
+    custom_rules_raw: Dict[str, str]
+    custom_rules: Dict[str, str]
+
+
+def source_digest(path: Path) -> Optional[str]:
+    """SHA-256 do conteúdo de ``path``; ``None`` se não existir ou for SQLite."""
+    if is_sqlite_path(path):
+        # O banco muda a cada gravação pontual: as regras vêm sempre da fonte
+        return None
+    try:
+        return hashlib.sha256(path.read_bytes()).hexdigest()
+    except OSError:
+        return None
+
+
+def compile_rules(
+    output: Path,
+    config_path: Path = CONFIG_PATH,
+    rules_path: Optional[Path] = None,
+) -> Dict[str, Any]:
+    """Compila as regras das fontes e grava o artefato em ``output``; retorna os metadados."""
+    rules_path = rules_path or initial_rules_path()
+    # Hash antes da leitura: uma fonte alterada no meio invalida o artefato, não o contrário
+    config_sha256 = source_digest(config_path)
+    rules_sha256 = source_digest(rules_path)
+    rules = load_rule_set(config_path, rules_path, artifact_path=None)
+    meta = {
+        "format": ARTIFACT_FORMAT,
+        "python": sys.version.split()[0],
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "rules_version": rules.version,
+        "config_path": str(config_path),
+        "config_sha256": config_sha256,
+        "rules_path": str(rules_path),
+        "rules_sha256": rules_sha256,
+        "custom_rules": len(rules.custom_rules_raw),
+    }
+    payload = marshal.dumps(
+        (rules.compiled.to_state(), dict(rules.custom_rules_raw), dict(rules.custom_rules))
+    )
+    meta_bytes = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+    header = _HEADER.pack(_SIGNATURE, ARTIFACT_FORMAT, MAGIC_NUMBER, len(meta_bytes))
+    _write_atomic(output, header + meta_bytes + payload)
+    return meta
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+
+
+@lru_cache(maxsize=4)
+def _read_artifact_file(path: Path, mtime_ns: int, size: int) -> Optional[RulesArtifact]:
+    try:
+        with path.open("rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            signature, version, python_magic, meta_size = _HEADER.unpack_from(mapped)
+            if (signature, version, python_magic) != (_SIGNATURE, ARTIFACT_FORMAT, MAGIC_NUMBER):
+                return None
+            offset = _HEADER.size + meta_size
+            meta = json.loads(mapped[_HEADER.size:offset].decode("utf-8"))
+            with memoryview(mapped) as view, view[offset:] as body:
+                compiled_state, custom_rules_raw, custom_rules = marshal.loads(body)
+    except (OSError, ValueError, EOFError, TypeError, struct.error):
+        # Arquivo vazio, truncado ou corrompido: recompila a partir das fontes
+        return None
+    return RulesArtifact(
+        meta, CompiledConfig.from_state(compiled_state), custom_rules_raw, custom_rules
+    )
+
+
+def read_artifact(path: Path) -> Optional[RulesArtifact]:
+    """
+    Lê o artefato (uma vez por versão do arquivo); ``None`` se ausente ou incompatível.
+
+    A mesma leitura devolve o mesmo ``CompiledConfig``, o que preserva
+    ``RuleSet.changed_tags`` entre recargas das regras customizadas.
+    """
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return _read_artifact_file(path, stat.st_mtime_ns, stat.st_size)
+
+
+def load_artifact_rule_set(
+    artifact_path: Path, config_path: Path, rules_path: Path
+) -> Optional[RuleSet]:
+    """
+    Conjunto de regras a partir do artefato, ou ``None`` se a configuração
+    mudou desde a compilação. Regras customizadas alteradas são lidas da fonte,
+    reaproveitando a configuração compilada.
+    """
+    artifact = read_artifact(artifact_path)
+    if artifact is None:
+        return None
+    meta = artifact.meta
+    if meta["config_sha256"] is None or source_digest(config_path) != meta["config_sha256"]:
+        return None
+    rules_sha256 = meta["rules_sha256"]
+    if rules_sha256 is not None and source_digest(rules_path) == rules_sha256:
+        return RuleSet(
+            artifact.compiled,
+            artifact.custom_rules_raw,
+            custom_rules=artifact.custom_rules,
+            version=meta["rules_version"],
+        )
+    raw_rules, _ = load_custom_rules(rules_path)
+    return RuleSet(artifact.compiled, raw_rules)
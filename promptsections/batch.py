@@ -0,0 +1,256 @@
+"""Classificação em lote de arquivos de prompts, processados em streaming."""
+import json
+import mmap
+import sys
+from collections import deque
+from contextlib import ExitStack, contextmanager
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Mapping, Optional, TextIO, Tuple
+
+Parser = Callable[[str], Tuple[Dict[str, List[str]], Iterable[Mapping[str, str]]]]
+Formatter = Callable[[Dict[str, List[str]]], str]
+
+INPUT_FORMATS = ("auto", "jsonl", "text")
+DEFAULT_CHUNK_SIZE = 256
+_RANGE_SAMPLE_BYTES = 64 * 1024
+
+
+def default_parser(include_trace: bool = True) -> Tuple[Parser, Formatter]:
+    """Retorna (parse_prompt, format_output) do classificador padrão."""
+    from promptsections.classifier import format_output, parse_prompt
+
+    if not include_trace:
+        # Sem detalhamento nenhum registro por tag é criado
+        return partial(parse_prompt, trace=False), format_output
+    return parse_prompt, format_output
+
+
+def resolve_format(path: str, input_format: str = "auto") -> str:
+    """Define o formato de entrada; em ``auto`` usa a extensão do arquivo."""
+    if input_format not in INPUT_FORMATS:
+        raise ValueError(f"Formato de entrada desconhecido: {input_format}")
+    if input_format != "auto":
+        return input_format
+    return "jsonl" if Path(path).suffix.lower() in {".jsonl", ".ndjson"} else "text"
+
+
+def iter_records(
+    lines: Iterable[str],
+    input_format: str = "text",
+    field: str = "prompt",
+    first_line: int = 1,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Converte linhas de entrada em registros ``{"line", "id", "prompt"}``.
+
+    Em JSONL cada linha pode ser uma string ou um objeto com o prompt em
+    ``field`` (e, opcionalmente, ``id``). Linhas inválidas geram um registro
+    com ``error`` para que a saída continue alinhada com a entrada.
+    ``first_line`` é o número da primeira linha (para trechos de um arquivo).
+    """
+    for line_number, line in enumerate(lines, start=first_line):
+        text = line.strip()
+        if not text:
+            continue
+
+        if input_format == "text":
+            yield {"line": line_number, "prompt": text}
+            continue
+
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError as exc:
+            yield {"line": line_number, "error": f"JSON inválido: {exc.msg}"}
+            continue
+
+        if isinstance(data, str):
+            yield {"line": line_number, "prompt": data}
+        elif isinstance(data, dict) and isinstance(data.get(field), str):
+            record = {"line": line_number, "prompt": data[field]}
+            if "id" in data:
+                record["id"] = data["id"]
+            yield record
+        else:
+            yield {"line": line_number, "error": f"Campo '{field}' ausente ou inválido"}
+
+
+def classify_records(
+    records: Iterable[Dict[str, Any]],
+    include_trace: bool = False,
+    parser: Optional[Parser] = None,
+    formatter: Optional[Formatter] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Classifica cada registro, mantendo apenas um prompt em memória por vez."""
+    if parser is None or formatter is None:
+        default_parse, default_format = default_parser(include_trace)
+        parser = parser or default_parse
+        formatter = formatter or default_format
+
+    for record in records:
+        if "error" in record:
+            yield record
+            continue
+
+        categorized, trace = parser(record["prompt"])
+        yield _result(record, categorized, trace, formatter, include_trace)
+
+
+def classify_records_by_vocabulary(
+    records: Iterable[Dict[str, Any]],
+    include_trace: bool = False,
+    table: Optional[Any] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Como ``classify_records``, mas em blocos com um vocabulário de tags
+    compartilhado (``vocabulary.TagTable``): cada tag distinta é decidida
+    uma vez, e o resto é busca em tabela.
+    """
+    from promptsections.classifier import format_output
+    from promptsections.vocabulary import classify_corpus
+
+    # Registros lidos e ainda não devolvidos (no máximo um bloco)
+    pending: Deque[Dict[str, Any]] = deque()
+
+    def prompts() -> Iterator[str]:
+        for record in records:
+            pending.append(record)
+            if "error" not in record:
+                yield record["prompt"]
+
+    for categorized, trace in classify_corpus(prompts(), trace=include_trace, table=table):
+        record = pending.popleft()
+        while "error" in record:
+            yield record
+            record = pending.popleft()
+        yield _result(record, categorized, trace, format_output, include_trace)
+    # Erros depois do último prompt válido
+    yield from pending
+
+
+def _result(
+    record: Dict[str, Any],
+    categorized: Dict[str, List[str]],
+    trace: Iterable[Mapping[str, str]],
+    formatter: Formatter,
+    include_trace: bool,
+) -> Dict[str, Any]:
+    result = dict(record)
+    result["categorized"] = categorized
+    result["formatted"] = formatter(categorized)
+    if include_trace:
+        result["trace"] = [dict(item) for item in trace]
+    return result
+
+
+def iter_mapped_lines(path: str, start: int = 0, end: Optional[int] = None) -> Iterator[str]:
+    """
+    Linhas de ``path`` entre os bytes ``start`` e ``end``, lidas via ``mmap``.
+
+    O arquivo não passa por buffers de leitura: cada linha é decodificada
+    direto das páginas mapeadas, e só quando é consumida.
+    """
+    with open(path, "rb") as fh:
+        if fh.seek(0, 2) == 0:
+            # Arquivos vazios não podem ser mapeados
+            return
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            end = len(mapped) if end is None else min(end, len(mapped))
+            mapped.seek(start)
+            readline = mapped.readline
+            while mapped.tell() < end:
+                yield readline().decode("utf-8")
+
+
+def mapped_ranges(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Tuple[int, int, int]]:
+    """
+    Divide ``path`` em trechos de cerca de ``chunk_size`` linhas, sem decodificá-lo.
+
+    Gera ``(início, fim, primeira linha)``; cada trecho termina em uma quebra
+    de linha, e o tamanho médio das linhas é estimado pelo início do arquivo.
+    """
+    with open(path, "rb") as fh:
+        if fh.seek(0, 2) == 0:
+            return
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            size = len(mapped)
+            sample = mapped[:_RANGE_SAMPLE_BYTES]
+            line_bytes = len(sample) / max(1, sample.count(b"\n"))
+            chunk_bytes = max(1, int(chunk_size * line_bytes))
+            start = 0
+            line = 1
+            while start < size:
+                newline = mapped.find(b"\n", min(start + chunk_bytes, size) - 1)
+                end = size if newline < 0 else newline + 1
+                yield start, end, line
+                line += mapped[start:end].count(b"\n")
+                start = end
+
+
+@contextmanager
+def open_text(path: str, mode: str) -> Iterator[TextIO]:
+    if path == "-":
+        yield sys.stdin if "r" in mode else sys.stdout
+        return
+    with open(path, mode, encoding="utf-8") as fh:
+        yield fh
+
+
+def write_results(results: Iterable[Dict[str, Any]], output: TextIO) -> Tuple[int, int]:
+    """Grava resultados em JSONL e retorna (classificados, erros)."""
+    classified = 0
+    errors = 0
+    for result in results:
+        if "error" in result:
+            errors += 1
+        else:
+            classified += 1
+        output.write(json.dumps(result, ensure_ascii=False))
+        output.write("\n")
+    return classified, errors
+
+
+def classify_file(
+    input_path: str,
+    output_path: str,
+    input_format: str = "auto",
+    field: str = "prompt",
+    include_trace: bool = False,
+    workers: int = 1,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    vocabulary: bool = False,
+) -> Tuple[int, int]:
+    """
+    Classifica ``input_path`` linha a linha e grava JSONL em ``output_path``.
+
+    Use ``-`` para ler de stdin ou escrever em stdout. Com ``workers`` maior
+    que 1 a classificação é distribuída entre processos, mantendo a ordem.
+    ``vocabulary`` usa ``classify_records_by_vocabulary`` (em cada processo).
+    Retorna (classificados, erros).
+    """
+    resolved = resolve_format(input_path, input_format)
+    with ExitStack() as stack:
+        target = stack.enter_context(open_text(output_path, "w"))
+        if workers > 1 and input_path != "-":
+            from promptsections.parallel import classify_mapped_parallel
+
+            # Cada worker lê o próprio trecho do arquivo: só posições trafegam entre processos
+            results = classify_mapped_parallel(
+                input_path, resolved, field, include_trace, workers, chunk_size, vocabulary
+            )
+            return write_results(results, target)
+
+        if input_path == "-":
+            source: Iterable[str] = stack.enter_context(open_text(input_path, "r"))
+        else:
+            source = iter_mapped_lines(input_path)
+        records = iter_records(source, resolved, field)
+        if workers > 1:
+            from promptsections.parallel import classify_parallel
+
+            results = classify_parallel(records, include_trace, workers, chunk_size, vocabulary)
+        elif vocabulary:
+            results = classify_records_by_vocabulary(records, include_trace)
+        else:
+            results = classify_records(records, include_trace)
+        return write_results(results, target)
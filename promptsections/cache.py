@@ -0,0 +1,118 @@
+"""Cache de resultados de classificação compartilhado entre sessões."""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+# (categorizado, detalhamento, prompt formatado)
+CachedResult = Tuple[Dict[str, List[str]], List[Dict[str, str]], str]
+
+# Custo aproximado de cada objeto Python guardado, além do texto
+_ITEM_OVERHEAD = 64
+
+
+def config_fingerprint(config: Mapping[str, Any]) -> str:
+    """Hash estável da configuração de palavras-chave."""
+    payload = json.dumps(config, ensure_ascii=False, sort_keys=True)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def rule_hash(tag: str, category: str) -> int:
+    """Hash de uma regra customizada; o conjunto é o XOR dos hashes das regras."""
+    digest = hashlib.blake2b(f"{tag}\0{category}".encode("utf-8"), digest_size=16).digest()
+    return int.from_bytes(digest, "little")
+
+
+def custom_rules_hash(custom_rules: Mapping[str, str]) -> int:
+    """
+    XOR de ``rule_hash`` das regras: independe da ordem e, ao alterar uma
+    regra, é atualizado desfazendo o hash antigo e aplicando o novo.
+    """
+    total = 0
+    for tag, category in custom_rules.items():
+        total ^= rule_hash(tag, category)
+    return total
+
+
+def combine_fingerprint(config_hash: str, rules_hash: int, rule_count: int) -> str:
+    """Versão de um ``RuleSet``: hash da configuração + quantidade e XOR das regras."""
+    payload = f"{config_hash}:{rule_count}:{rules_hash:032x}"
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def estimate_result_size(result: CachedResult) -> int:
+    """Estimativa em bytes de um resultado, usada na política de descarte."""
+    categorized, trace, formatted = result
+    size = len(formatted) + _ITEM_OVERHEAD
+    for tags in categorized.values():
+        size += _ITEM_OVERHEAD + sum(len(tag) + _ITEM_OVERHEAD for tag in tags)
+    for item in trace:
+        size += _ITEM_OVERHEAD + sum(len(value) + _ITEM_OVERHEAD for value in item.values())
+    return size
+
+
+class ResultCache:
+    """
+    Cache LRU, seguro entre threads, limitado pelo tamanho total estimado.
+
+    As chaves combinam o hash do prompt com a versão das regras, de modo que
+    qualquer alteração de regras torna as entradas antigas inalcançáveis; elas
+    saem do cache naturalmente pelo descarte LRU. Os resultados são
+    compartilhados entre sessões e não devem ser modificados por quem os lê.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024) -> None:
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[CachedResult, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(prompt: str, rules_version: str) -> Tuple[str, str]:
+        digest = hashlib.blake2b(prompt.encode("utf-8"), digest_size=16).hexdigest()
+        return digest, rules_version
+
+    def get(self, key: Tuple[str, str]) -> Optional[CachedResult]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Tuple[str, str], result: CachedResult) -> None:
+        size = estimate_result_size(result)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (result, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
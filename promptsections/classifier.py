@@ -0,0 +1,742 @@
+"""Classificação de tags e prompts, independente da interface Streamlit."""
+import json
+import os
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, List, Mapping, Optional, Tuple
+
+from promptsections import profiling
+from promptsections.cache import (
+    combine_fingerprint,
+    config_fingerprint,
+    custom_rules_hash,
+    rule_hash,
+)
+from promptsections.config import (
+    CONFIG_PATH,
+    CUSTOM_RULES_STORAGE_PATH,
+    DEFAULT_CUSTOM_RULES_PATH,
+    REQUIRED_CONFIG_KEYS,
+    RULES_ARTIFACT_PATH,
+    initial_rules_path,
+    load_prompt_config,
+)
+from promptsections.matcher import KeywordMatcher
+from promptsections.rule_index import (
+    PatternRules,
+    RuleLayer,
+    canonical_rules,
+    canonical_tag,
+    is_pattern,
+)
+from promptsections.rules import RuleStore, RulesFileError, load_custom_rules, open_rule_store
+from promptsections.style import StyleIndex, may_have_style
+from promptsections.tokenizer import tag_texts
+from promptsections.trace import TraceRecord, reason_message
+
+CATEGORY_OPTIONS = [
+    "Estilo",
+    "Qualidade",
+    "Background",
+    "Personagem",
+    "Pose",
+    "Roupas",
+    "Restante do Prompt",
+]
+CUSTOM_RULE_CATEGORIES = frozenset(CATEGORY_OPTIONS)
+
+TAG_CACHE_SIZE = int(os.environ.get("PROMPT_SECTIONS_TAG_CACHE_SIZE", "65536"))
+
+# (categoria, motivo, in_character_section após a tag)
+TagDecision = Tuple[str, str, bool]
+# (categoria, código do motivo, detalhe, próximo estado da seção de personagem)
+TagVerdict = Tuple[str, str, str, bool]
+
+
+class CompiledConfig:
+    """Listas de palavras-chave já normalizadas e o matcher construído a partir delas."""
+
+    def __init__(self, config: Mapping[str, List[str]]) -> None:
+        self.config = config
+        self.quality_terms = tuple(term.lower() for term in config["quality_terms"])
+        self.background_keywords = tuple(term.lower() for term in config["background_keywords"])
+        self.character_identifiers = frozenset(
+            identifier.lower() for identifier in config["character_identifiers"]
+        )
+        self.physical_traits = tuple(trait.lower() for trait in config["physical_traits"])
+        self.action_clothing_keywords = tuple(
+            keyword.lower() for keyword in config["action_clothing_keywords"]
+        )
+        self.clothing_keywords = tuple(keyword.lower() for keyword in config["clothing_keywords"])
+        self.pose_keywords = tuple(keyword.lower() for keyword in config["pose_keywords"])
+
+        # Pares autor + estilo, com o índice opcional de artistas conhecidos
+        self.style = StyleIndex(config.get("style_artists", ()))
+
+        # Matcher único: uma passada por tag encontra todas as categorias atingidas
+        self.matcher = KeywordMatcher(
+            {
+                "quality": self.quality_terms,
+                "background": self.background_keywords,
+                "physical": self.physical_traits,
+                "clothing": self.clothing_keywords,
+                "pose": self.pose_keywords,
+                "action": self.action_clothing_keywords,
+            }
+        )
+
+    def to_state(self) -> Tuple[Any, ...]:
+        """Listas normalizadas e tabelas do matcher, só com tipos básicos."""
+        lists = tuple(getattr(self, key) for key in REQUIRED_CONFIG_KEYS)
+        return dict(self.config), lists, self.matcher.to_state()
+
+    @property
+    def fingerprint(self) -> str:
+        """Hash da configuração, calculado uma vez por instância."""
+        fingerprint = self.__dict__.get("_fingerprint")
+        if fingerprint is None:
+            fingerprint = self._fingerprint = config_fingerprint(self.config)
+        return fingerprint
+
+    @classmethod
+    def from_state(cls, state: Tuple[Any, ...]) -> "CompiledConfig":
+        """Recria a configuração compilada de ``to_state`` sem recompilar."""
+        config, lists, matcher_state = state
+        compiled = cls.__new__(cls)
+        compiled.config = config
+        for key, values in zip(REQUIRED_CONFIG_KEYS, lists):
+            setattr(compiled, key, values)
+        compiled.matcher = KeywordMatcher.from_state(matcher_state)
+        compiled.style = StyleIndex(config.get("style_artists", ()))
+        return compiled
+
+
+@lru_cache(maxsize=4)
+def _compile_config_file(path: Path, mtime_ns: int, size: int) -> CompiledConfig:
+    return CompiledConfig(load_prompt_config(path))
+
+
+def compile_config(path: Path = CONFIG_PATH) -> CompiledConfig:
+    """Compila o arquivo de configuração, reaproveitando a versão já compilada se não mudou."""
+    stat = path.stat()
+    return _compile_config_file(path, stat.st_mtime_ns, stat.st_size)
+
+
+class RuleSet:
+    """
+    Conjunto de regras imutável: configuração compilada + regras customizadas.
+
+    Cada instância tem seu próprio cache de decisões por tag; alterar regras
+    significa criar um novo ``RuleSet``, o que descarta o cache antigo.
+    ``custom_rules`` usa as chaves na forma canônica (``canonical_tag``);
+    as que têm ``*`` ficam também em ``patterns``.
+
+    As regras ficam em ``RuleLayer``: ``with_rule_changes`` compartilha a
+    base com o conjunto anterior e atualiza a versão pelo hash das regras
+    alteradas, então uma edição não custa proporcional ao total de regras.
+    """
+
+    def __init__(
+        self,
+        compiled: CompiledConfig,
+        custom_rules_raw: Mapping[str, str],
+        tag_cache_size: int = TAG_CACHE_SIZE,
+        custom_rules: Optional[Mapping[str, str]] = None,
+        version: Optional[str] = None,
+    ) -> None:
+        self.compiled = compiled
+        self.custom_rules_raw = (
+            custom_rules_raw if isinstance(custom_rules_raw, RuleLayer) else RuleLayer(custom_rules_raw)
+        )
+        if custom_rules is None:
+            custom_rules = canonical_rules(self.custom_rules_raw)
+        self.custom_rules = (
+            custom_rules if isinstance(custom_rules, RuleLayer) else RuleLayer(custom_rules)
+        )
+        self._pattern_rules = {
+            key: category for key, category in self.custom_rules.items() if is_pattern(key)
+        }
+        self.patterns = PatternRules(self._pattern_rules)
+        # Grafias de cada chave canônica, na ordem das regras (construídas sob demanda)
+        self._spellings: Optional[RuleLayer] = None
+        # XOR de ``rule_hash`` das regras canônicas (``None`` até ser preciso)
+        self._rules_hash: Optional[int] = None
+        self._version = version
+        self._tag_cache_size = tag_cache_size
+        self.decide_tag = lru_cache(maxsize=tag_cache_size)(self._decide_tag)
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # Em processos spawn o conjunto chega compilado: o matcher não é reconstruído
+        return _restore_rule_set, (
+            self.compiled.to_state(),
+            dict(self.custom_rules_raw),
+            self.version,
+        )
+
+    @property
+    def version(self) -> str:
+        """Hash do conjunto de regras (configuração + regras customizadas)."""
+        if self._version is None:
+            self._version = combine_fingerprint(
+                self.compiled.fingerprint, self.rules_hash, len(self.custom_rules)
+            )
+        return self._version
+
+    @property
+    def rules_hash(self) -> int:
+        if self._rules_hash is None:
+            self._rules_hash = custom_rules_hash(self.custom_rules)
+        return self._rules_hash
+
+    def spellings(self) -> RuleLayer:
+        """Chave canônica -> grafias em ``custom_rules_raw`` (a última define a regra)."""
+        if self._spellings is None:
+            spellings: Dict[str, Tuple[str, ...]] = {}
+            for tag in self.custom_rules_raw:
+                key = canonical_tag(tag)
+                if key:
+                    spellings[key] = spellings.get(key, ()) + (tag,)
+            self._spellings = RuleLayer(spellings)
+        return self._spellings
+
+    def with_custom_rules(self, custom_rules_raw: Mapping[str, str]) -> "RuleSet":
+        """Novo conjunto com outras regras customizadas e a mesma configuração compilada."""
+        return RuleSet(self.compiled, custom_rules_raw)
+
+    def with_rule_changes(self, changes: Mapping[str, Optional[str]]) -> "RuleSet":
+        """Novo conjunto aplicando ``tag -> categoria`` (``None`` remove) sem reconstruir tudo."""
+        raw = self.custom_rules_raw
+        raw_changes = {
+            tag: category
+            for tag, category in changes.items()
+            if ((tag in raw) if category is None else raw.get(tag) != category)
+        }
+        if not raw_changes:
+            return self
+
+        # Grafias afetadas; a chave canônica segue a última grafia que restar
+        spellings = self.spellings()
+        spelling_changes: Dict[str, Optional[Tuple[str, ...]]] = {}
+        for tag, category in raw_changes.items():
+            key = canonical_tag(tag)
+            if not key:
+                continue
+            current = spelling_changes[key] if key in spelling_changes else spellings.get(key)
+            current = current or ()
+            if category is None:
+                current = tuple(spelling for spelling in current if spelling != tag)
+            elif tag not in raw:
+                current += (tag,)
+            spelling_changes[key] = current or None
+
+        new_raw = raw.updated(raw_changes)
+        old_rules = self.custom_rules
+        rule_changes = {
+            key: new_raw[tags[-1]] if tags else None for key, tags in spelling_changes.items()
+        }
+        rule_changes = {
+            key: category for key, category in rule_changes.items() if old_rules.get(key) != category
+        }
+
+        rules = RuleSet.__new__(RuleSet)
+        rules.compiled = self.compiled
+        rules.custom_rules_raw = new_raw
+        rules.custom_rules = old_rules.updated(rule_changes)
+        rules._spellings = spellings.updated(spelling_changes)
+        pattern_changes = {key: category for key, category in rule_changes.items() if is_pattern(key)}
+        if pattern_changes:
+            rules._pattern_rules = {
+                key: category
+                for key, category in {**self._pattern_rules, **pattern_changes}.items()
+                if category is not None
+            }
+            rules.patterns = PatternRules(rules._pattern_rules)
+        else:
+            rules._pattern_rules, rules.patterns = self._pattern_rules, self.patterns
+        rules._rules_hash = None
+        if self._rules_hash is not None:
+            rules_hash = self._rules_hash
+            for key, category in rule_changes.items():
+                previous = old_rules.get(key)
+                if previous is not None:
+                    rules_hash ^= rule_hash(key, previous)
+                if category is not None:
+                    rules_hash ^= rule_hash(key, category)
+            rules._rules_hash = rules_hash
+        rules._version = None
+        rules._tag_cache_size = self._tag_cache_size
+        rules.decide_tag = lru_cache(maxsize=self._tag_cache_size)(rules._decide_tag)
+        return rules
+
+    def changed_tags(self, previous: "RuleSet") -> Optional[FrozenSet[str]]:
+        """
+        Tags (na forma canônica) cuja regra customizada difere de ``previous``.
+
+        ``None`` quando a configuração ou uma regra com ``*`` também mudou e
+        qualquer tag pode ter outra decisão.
+        """
+        if self.compiled is not previous.compiled:
+            return None
+        current, before = self.custom_rules, previous.custom_rules
+        if current.base is before.base:
+            # Mesma base: só as chaves alteradas por cima dela podem diferir
+            candidates = current.delta.keys() | before.delta.keys()
+            changed = frozenset(key for key in candidates if current.get(key) != before.get(key))
+        else:
+            difference = current.items() ^ before.items()
+            changed = frozenset(tag for tag, _ in difference)
+        if any(is_pattern(tag) for tag in changed):
+            return None
+        return changed
+
+    def cache_stats(self) -> Dict[str, int]:
+        info = self.decide_tag.cache_info()
+        return {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "maxsize": info.maxsize or 0,
+        }
+
+    def classify_tag(self, tag: str, in_character_section: bool) -> TagDecision:
+        """Como ``decide_tag``, com o motivo já formatado."""
+        category, reason, detail, next_state = self.decide_tag(tag, in_character_section)
+        return category, reason_message(reason, detail), next_state
+
+    def _decide_tag(self, tag: str, in_character_section: bool) -> TagVerdict:
+        """
+        Decide a categoria de uma tag já normalizada (sem detecção de estilo).
+
+        O resultado depende apenas da tag, do estado da seção de personagem e do
+        conjunto de regras, por isso fica em cache enquanto o conjunto existir.
+        """
+        compiled = self.compiled
+        tag_lower = tag.lower()
+        hits = compiled.matcher.scan(tag_lower)
+
+        # 2. Detectar QUALIDADE
+        matched_quality = hits.get("quality")
+        if matched_quality:
+            return "Qualidade", "quality", matched_quality, in_character_section
+
+        # 3. Detectar BACKGROUND
+        matched_background = hits.get("background")
+        if matched_background:
+            return "Background", "background", matched_background, in_character_section
+
+        # 4. Detectar início de seção PERSONAGEM
+        if tag_lower in compiled.character_identifiers:
+            return "Personagem", "character_identifier", "", True
+
+        # 5. Detectar personagem nomeado (padrão "from [série]")
+        if ' from ' in tag:
+            return "Personagem", "named_character", "", True
+
+        # 6. Se estamos na seção de personagem, classificar entre físico e ação/roupa
+        if in_character_section:
+            # Características físicas vão para PERSONAGEM
+            if "physical" in hits:
+                return "Personagem", "physical_trait", "", True
+
+            # Itens de roupa vão para ROUPAS e encerram a seção
+            if "clothing" in hits:
+                return "Roupas", "clothing", "", False
+
+            # Poses vão para POSE e encerram a seção
+            if "pose" in hits:
+                return "Pose", "pose", "", False
+
+            # Ações terminam a seção de personagem
+            if "action" in hits:
+                return "Restante do Prompt", "action", "", False
+
+            # Tags genéricas na seção de personagem (ex: "medieval barmaid")
+            # Heurística: descrições curtas sem termos de ação vão para personagem
+            if len(tag.split()) <= 3 and not any(char.isdigit() for char in tag):
+                return "Personagem", "short_description", "", True
+
+        # 6.5 Regras customizadas definidas pelo usuário (exatas, depois por padrão)
+        canonical = canonical_tag(tag)
+        custom_category = self.custom_rules.get(canonical)
+        reason, detail = "custom_rule", ""
+        if not custom_category and self.patterns:
+            matched_pattern = self.patterns.match(canonical)
+            if matched_pattern:
+                custom_category, detail = matched_pattern
+                reason = "custom_pattern"
+        if custom_category:
+            normalized_category = custom_category.strip()
+            if normalized_category == "Personagem":
+                in_character_section = True
+            elif normalized_category == "Pose":
+                in_character_section = False
+            elif normalized_category not in CUSTOM_RULE_CATEGORIES:
+                normalized_category = "Restante do Prompt"
+            return normalized_category, reason, detail, in_character_section
+
+        # 6.6 Itens de roupa fora da seção de personagem
+        if "clothing" in hits:
+            return "Roupas", "clothing", "", False
+
+        # 6.7 Poses fora da seção
+        if "pose" in hits:
+            return "Pose", "pose", "", False
+
+        # 7. Tudo que não se encaixou vai para RESTANTE
+        return "Restante do Prompt", "no_rule", "", in_character_section
+
+
+def _restore_rule_set(
+    compiled_state: Tuple[Any, ...], custom_rules_raw: Dict[str, str], version: str
+) -> RuleSet:
+    return RuleSet(CompiledConfig.from_state(compiled_state), custom_rules_raw, version=version)
+
+
+def load_rule_set(
+    config_path: Path = CONFIG_PATH,
+    rules_path: Optional[Path] = None,
+    artifact_path: Optional[Path] = RULES_ARTIFACT_PATH,
+) -> RuleSet:
+    """
+    Monta um conjunto de regras a partir dos arquivos em disco.
+
+    Com ``artifact_path`` (gerado por ``compile-rules``), o que ainda
+    corresponder às fontes é carregado já compilado do artefato.
+    """
+    rules_path = rules_path or initial_rules_path()
+    if artifact_path is not None:
+        from promptsections.artifact import load_artifact_rule_set
+
+        rules = load_artifact_rule_set(artifact_path, config_path, rules_path)
+        if rules is not None:
+            return rules
+    raw_rules, _ = load_custom_rules(rules_path)
+    return RuleSet(compile_config(config_path), raw_rules)
+
+
+# Conjunto ativo, construído sob demanda no primeiro uso
+_ACTIVE_RULES: Optional[RuleSet] = None
+_RULES_LOCK = threading.RLock()
+RULE_SET_SWAPS = 0
+
+
+def get_rule_set() -> RuleSet:
+    """Retorna o conjunto de regras ativo, carregando-o do disco na primeira chamada."""
+    rules = _ACTIVE_RULES
+    if rules is None:
+        with _RULES_LOCK:
+            if _ACTIVE_RULES is None:
+                set_rule_set(load_rule_set())
+            rules = _ACTIVE_RULES
+    return rules
+
+
+def set_rule_set(rules: RuleSet) -> None:
+    """Troca o conjunto ativo; classificações em andamento terminam com o anterior."""
+    global _ACTIVE_RULES, RULE_SET_SWAPS
+    with _RULES_LOCK:
+        _ACTIVE_RULES = rules
+        RULE_SET_SWAPS += 1
+
+
+def update_custom_rules(raw_rules: Mapping[str, str]) -> RuleSet:
+    """Ativa um novo conjunto com ``raw_rules`` como regras customizadas."""
+    with _RULES_LOCK:
+        rules = get_rule_set().with_custom_rules(raw_rules)
+        set_rule_set(rules)
+    return rules
+
+
+RULES_FLUSH_DELAY = float(os.environ.get("PROMPT_SECTIONS_RULES_FLUSH_DELAY", "0"))
+_RULE_STORE: Optional[RuleStore] = None
+
+
+def get_rule_store() -> RuleStore:
+    """Armazenamento persistente das regras customizadas."""
+    global _RULE_STORE
+    if _RULE_STORE is None:
+        with _RULES_LOCK:
+            if _RULE_STORE is None:
+                _RULE_STORE = open_rule_store(
+                    CUSTOM_RULES_STORAGE_PATH,
+                    DEFAULT_CUSTOM_RULES_PATH,
+                    flush_delay=RULES_FLUSH_DELAY,
+                )
+    return _RULE_STORE
+
+
+def activate_rule_changes(changes: Mapping[str, Optional[str]]) -> RuleSet:
+    """Ativa ``tag -> categoria`` (``None`` remove) só em memória, sem gravar no disco."""
+    with _RULES_LOCK:
+        rules = get_rule_set().with_rule_changes(changes)
+        set_rule_set(rules)
+    return rules
+
+
+def apply_rule_changes(changes: Mapping[str, Optional[str]], keep_unsaved: bool = True) -> bool:
+    """
+    Aplica ``tag -> categoria`` (``None`` remove) em memória e no disco.
+
+    Com ``keep_unsaved=False``, alterações que não puderam ser gravadas são
+    desfeitas em memória e não ficam pendentes para uma nova tentativa. Com
+    o arquivo de regras corrompido elas são sempre desfeitas, e o
+    ``RulesFileError`` é repassado.
+    """
+    with _RULES_LOCK:
+        previous = get_rule_set().custom_rules_raw
+        activate_rule_changes(changes)
+    store = get_rule_store()
+
+    def undo() -> None:
+        store.discard(changes)
+        activate_rule_changes({tag: previous.get(tag) for tag in changes})
+
+    try:
+        saved = store.apply(changes)
+    except RulesFileError:
+        undo()
+        raise
+    if not saved and not keep_unsaved:
+        undo()
+    return saved
+
+
+def replace_custom_rules(raw_rules: Mapping[str, str], keep_unsaved: bool = True) -> bool:
+    """Substitui todas as regras customizadas (ex.: importação) e persiste."""
+    with _RULES_LOCK:
+        previous = get_rule_set()
+        rules = update_custom_rules(raw_rules)
+    store = get_rule_store()
+    try:
+        saved = store.replace_all(rules.custom_rules_raw)
+    except RulesFileError:
+        store.discard((), replacement=True)
+        set_rule_set(previous)
+        raise
+    if not saved and not keep_unsaved:
+        store.discard((), replacement=True)
+        set_rule_set(previous)
+    return saved
+
+
+def set_custom_rule(tag: str, category: str, keep_unsaved: bool = True) -> bool:
+    """Atualiza uma regra customizada e persiste no disco. Retorna se foi gravada."""
+    tag_key = tag.strip()
+    if not tag_key:
+        return True
+
+    category_value = category.strip() or "Restante do Prompt"
+    return apply_rule_changes({tag_key: category_value}, keep_unsaved)
+
+
+def delete_custom_rule(tag: str, keep_unsaved: bool = True) -> bool:
+    """Remove uma regra customizada. Retorna se o resultado foi gravado."""
+    tag_key = tag.strip()
+    if not tag_key or tag_key not in get_rule_set().custom_rules_raw:
+        return True
+    return apply_rule_changes({tag_key: None}, keep_unsaved)
+
+
+def list_custom_rules(
+    offset: int = 0, limit: int = 50, search: str = "", rules: Optional[RuleSet] = None
+) -> Tuple[int, List[Tuple[str, str]]]:
+    """
+    Retorna (total, página ordenada) das regras customizadas.
+
+    Com o backend SQLite a página vem direto do índice do banco; no JSON,
+    ou para um ``rules`` que não é o conjunto ativo (ex.: com alterações só
+    de uma sessão), das regras em memória.
+    """
+    store = get_rule_store()
+    if store.indexed and (rules is None or rules is get_rule_set()):
+        store.flush()
+        return store.count(search), store.page(offset, limit, search)
+
+    needle = search.strip().lower()
+    items = sorted((rules or get_rule_set()).custom_rules_raw.items())
+    if needle:
+        items = [item for item in items if needle in item[0].lower()]
+    return len(items), items[offset:offset + limit]
+
+
+def export_custom_rules_json(rules: Optional[RuleSet] = None) -> str:
+    """Regras (as ativas, por padrão) no formato do ``custom_rules.json``."""
+    return json.dumps(
+        dict(sorted((rules or get_rule_set()).custom_rules_raw.items())),
+        indent=2,
+        ensure_ascii=False,
+    )
+
+
+def rules_version() -> str:
+    """Versão (hash) do conjunto de regras ativo."""
+    return get_rule_set().version
+
+
+def tag_cache_stats() -> Dict[str, int]:
+    """Contadores do cache de classificação por tag do conjunto ativo."""
+    stats = get_rule_set().cache_stats()
+    stats["invalidations"] = RULE_SET_SWAPS
+    return stats
+
+
+def detect_style(tags: List[str], index: int) -> tuple[bool, int]:
+    """
+    Detecta se o tag atual é parte de um padrão de estilo.
+    Padrão: autor, autor_style ou autor, autor estilo style
+    Retorna (is_style, próximo_index)
+    """
+    if index >= len(tags) - 1:
+        return False, index + 1
+    if get_rule_set().compiled.style.is_pair(tags[index], tags[index + 1]):
+        return True, index + 2
+    return False, index + 1
+
+
+# Só a heurística, sem artistas conhecidos
+_HEURISTIC_STYLE = StyleIndex()
+
+
+def is_style_pair(author_tag: str, style_tag: str) -> bool:
+    """
+    Verdadeiro se ``style_tag`` contém "style" e alguma palavra (com mais de
+    2 letras) de ``author_tag``. ``parse_prompt`` usa ``compiled.style``,
+    que também consulta os artistas do ``prompt_config.json``.
+    """
+    return _HEURISTIC_STYLE.is_pair(author_tag, style_tag)
+
+
+def is_physical_trait(tag: str) -> bool:
+    """Verifica se o tag é uma característica física permanente."""
+    return get_rule_set().compiled.matcher.matches(tag.lower(), "physical")
+
+
+def is_action_or_clothing(tag: str) -> bool:
+    """Verifica se o tag é uma ação ou pose."""
+    return get_rule_set().compiled.matcher.matches(tag.lower(), "action")
+
+
+def is_clothing_tag(tag: str) -> bool:
+    """Verifica se o tag descreve uma peça de roupa."""
+    return get_rule_set().compiled.matcher.matches(tag.lower(), "clothing")
+
+
+def is_pose_tag(tag: str) -> bool:
+    """Verifica se o tag descreve pose/enquadramento."""
+    return get_rule_set().compiled.matcher.matches(tag.lower(), "pose")
+
+
+def normalize_tag(tag: str) -> str:
+    """Remove ênfases simples do tipo (tag:1.2) mantendo apenas a tag."""
+    stripped = tag.strip()
+    if len(stripped) < 5:
+        return stripped
+    if stripped.startswith("(") and stripped.endswith(")"):
+        inner = stripped[1:-1]
+        if ":" in inner and inner.count(":") == 1:
+            candidate, weight = inner.split(":")
+            candidate = candidate.strip()
+            weight = weight.strip()
+            if candidate and weight.replace(".", "", 1).isdigit():
+                return candidate
+    return stripped
+
+
+def classify_tag(tag: str, in_character_section: bool) -> TagDecision:
+    """Decide a categoria de uma tag normalizada com o conjunto de regras ativo."""
+    return get_rule_set().classify_tag(tag, in_character_section)
+
+
+def parse_prompt(
+    prompt: str, rules: Optional[RuleSet] = None, trace: bool = True
+) -> tuple[Dict[str, List[str]], List[TraceRecord]]:
+    """
+    Parseia o prompt e separa em categorias.
+
+    ``rules`` permite classificar com um conjunto específico; por padrão usa
+    o conjunto ativo. Com ``trace=False`` o detalhamento não é montado e a
+    lista retornada fica vazia.
+    """
+    rules = rules or get_rule_set()
+    decide = rules.decide_tag
+    style_pair = rules.compiled.style.is_pair
+    profiler = profiling.ACTIVE
+    if profiler is not None:
+        decide, style_pair, finish_profile = profiler.wrap(decide, style_pair)
+
+    # Só o texto das tags, já sem ênfases e pesos
+    tags = tag_texts(prompt)
+    total = len(tags)
+    # Sem "style" em nenhuma tag não há par de estilo a procurar
+    check_style = may_have_style(tags)
+
+    background_detected = False
+    categorized: Dict[str, List[str]] = {
+        'Estilo': [],
+        'Qualidade': [],
+        'Background': [],
+        'Personagem': [],
+        'Pose': [],
+        'Roupas': [],
+        'Restante do Prompt': [],
+    }
+
+    classification_details: List[TraceRecord] = []
+    record = classification_details.append if trace else None
+
+    in_character_section = False
+    index = 0
+
+    while index < total:
+        tag = tags[index]
+
+        # 1. Detectar ESTILO (autor + autor_style)
+        if check_style and index + 1 < total and style_pair(tag, tags[index + 1]):
+            following = tags[index + 1]
+            categorized['Estilo'].append(tag)
+            categorized['Estilo'].append(following)
+            if record:
+                record(TraceRecord(tag, "Estilo", "style_author"))
+                record(TraceRecord(following, "Estilo", "style_tag"))
+            index += 2
+            continue
+
+        category, reason, detail, in_character_section = decide(tag, in_character_section)
+        if category == "Background":
+            background_detected = True
+        else:
+            categorized[category].append(tag)
+        if record:
+            record(TraceRecord(tag, category, reason, detail))
+        index += 1
+
+    if background_detected:
+        categorized['Background'] = ['((simple background))']
+
+    if profiler is not None:
+        finish_profile()
+    return categorized, classification_details
+
+
+def format_output(categorized: Dict[str, List[str]]) -> str:
+    """
+    Formata a saída no formato esperado.
+    """
+    output_parts: List[str] = []
+    ordered_sections = [
+        "Estilo",
+        "Qualidade",
+        "Background",
+        "Personagem",
+        "Pose",
+        "Roupas",
+        "Restante do Prompt",
+    ]
+
+    for section in ordered_sections:
+        content = categorized.get(section, [])
+        if content:
+            output_parts.append(', '.join(content))
+
+    return "\n\n".join(output_parts)
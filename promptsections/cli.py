@@ -0,0 +1,304 @@
+"""Interface de linha de comando: ``python -m promptsections <comando>``."""
+import argparse
+import json
+import os
+import sys
+import time
+from contextlib import ExitStack
+from pathlib import Path
+from typing import List, Optional
+
+from promptsections import profiling
+from promptsections.analytics import DEFAULT_CAPACITY, UnmatchedReport
+from promptsections.archive import PromptArchive
+from promptsections.artifact import compile_rules
+from promptsections.batch import (
+    DEFAULT_CHUNK_SIZE,
+    INPUT_FORMATS,
+    classify_file,
+    iter_records,
+    open_text,
+    resolve_format,
+)
+from promptsections.config import ARCHIVE_PATH, CONFIG_PATH, RULES_ARTIFACT_PATH
+from promptsections.server import (
+    DEFAULT_MAX_BATCH,
+    DEFAULT_MAX_DELAY,
+    DEFAULT_MAX_PENDING,
+    run_server,
+)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="promptsections",
+        description="Classifica prompts de Stable Diffusion sem a interface Streamlit.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    classify = subparsers.add_parser(
+        "classify", help="Classifica um arquivo de prompts (texto ou JSONL)."
+    )
+    classify.add_argument("input", help="Arquivo de entrada ('-' para stdin).")
+    classify.add_argument("output", help="Arquivo JSONL de saída ('-' para stdout).")
+    classify.add_argument(
+        "--format",
+        choices=INPUT_FORMATS,
+        default="auto",
+        help="Formato da entrada; 'auto' usa a extensão (.jsonl = JSONL).",
+    )
+    classify.add_argument(
+        "--field", default="prompt", help="Campo com o prompt em entradas JSONL."
+    )
+    classify.add_argument(
+        "--trace", action="store_true", help="Inclui o detalhamento de cada tag."
+    )
+    classify.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Processos paralelos (0 = um por CPU).",
+    )
+    classify.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help="Prompts enviados a cada worker por tarefa.",
+    )
+    classify.add_argument(
+        "--vocabulary",
+        action="store_true",
+        help="Decide cada tag distinta uma vez e classifica por tabela (corpora grandes).",
+    )
+    classify.add_argument(
+        "--stages",
+        action="store_true",
+        help="Mostra contagens e tempos por etapa da classificação (stderr).",
+    )
+    classify.add_argument(
+        "--profile",
+        type=Path,
+        help="Grava um perfil cProfile (pstats) da execução neste arquivo.",
+    )
+
+    serve = subparsers.add_parser(
+        "serve", help="Serviço HTTP de classificação (POST /classify)."
+    )
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument(
+        "--max-batch",
+        type=int,
+        default=DEFAULT_MAX_BATCH,
+        help="Prompts classificados por lote.",
+    )
+    serve.add_argument(
+        "--max-delay-ms",
+        type=float,
+        default=DEFAULT_MAX_DELAY * 1000,
+        help="Espera máxima por outros prompts antes de fechar um lote.",
+    )
+    serve.add_argument(
+        "--max-pending",
+        type=int,
+        default=DEFAULT_MAX_PENDING,
+        help="Prompts na fila antes de responder 503.",
+    )
+    serve.add_argument(
+        "--watch-interval",
+        type=float,
+        default=1.0,
+        help="Segundos entre verificações das regras em disco (0 desativa).",
+    )
+
+    unmatched = subparsers.add_parser(
+        "unmatched", help="Ranking das tags sem regra em um corpus de prompts."
+    )
+    unmatched.add_argument("input", help="Arquivo de entrada ('-' para stdin).")
+    unmatched.add_argument(
+        "output", nargs="?", default="-", help="Relatório JSON ('-' para stdout)."
+    )
+    unmatched.add_argument("--format", choices=INPUT_FORMATS, default="auto")
+    unmatched.add_argument("--field", default="prompt")
+    unmatched.add_argument("--top", type=int, default=100, help="Tags no relatório.")
+    unmatched.add_argument(
+        "--capacity",
+        type=int,
+        default=DEFAULT_CAPACITY,
+        help="Contadores mantidos em memória (precisão x memória).",
+    )
+    unmatched.add_argument(
+        "--rules-template",
+        help="Grava regras atuais + tags do ranking no formato do custom_rules.json.",
+    )
+
+    archive = subparsers.add_parser(
+        "archive", help="Arquivo de prompts classificados (SQLite)."
+    )
+    archive.add_argument(
+        "--path",
+        type=Path,
+        default=ARCHIVE_PATH,
+        help="Arquivo SQLite (padrão: PROMPT_SECTIONS_ARCHIVE_PATH).",
+    )
+    archive_commands = archive.add_subparsers(dest="archive_command", required=True)
+    archive_add = archive_commands.add_parser("add", help="Arquiva os prompts de um arquivo.")
+    archive_add.add_argument("input", help="Arquivo de entrada ('-' para stdin).")
+    archive_add.add_argument("--format", choices=INPUT_FORMATS, default="auto")
+    archive_add.add_argument("--field", default="prompt")
+    archive_reclassify = archive_commands.add_parser(
+        "reclassify", help="Reclassifica os prompts arquivados com as regras atuais."
+    )
+    archive_reclassify.add_argument(
+        "--tag",
+        action="append",
+        default=[],
+        help="Só prompts com esta tag (pode repetir); sem --tag, todos.",
+    )
+
+    compile_rules_parser = subparsers.add_parser(
+        "compile-rules", help="Grava as regras já compiladas em um artefato binário."
+    )
+    compile_rules_parser.add_argument(
+        "output",
+        nargs="?",
+        type=Path,
+        default=RULES_ARTIFACT_PATH,
+        help="Arquivo do artefato (padrão: PROMPT_SECTIONS_RULES_ARTIFACT).",
+    )
+    compile_rules_parser.add_argument(
+        "--config", type=Path, default=CONFIG_PATH, help="prompt_config.json de origem."
+    )
+    compile_rules_parser.add_argument(
+        "--rules", type=Path, help="Regras customizadas de origem (padrão: as ativas)."
+    )
+
+    return parser
+
+
+def run_compile_rules(args: argparse.Namespace) -> int:
+    if args.output is None:
+        print("Informe o arquivo de saída ou PROMPT_SECTIONS_RULES_ARTIFACT.", file=sys.stderr)
+        return 2
+    started = time.perf_counter()
+    meta = compile_rules(args.output, args.config, args.rules)
+    elapsed = time.perf_counter() - started
+    print(
+        f"Artefato {args.output} gravado em {elapsed:.2f}s "
+        f"({args.output.stat().st_size / 1024:.0f} KiB, {meta['custom_rules']} regras "
+        f"customizadas, versão {meta['rules_version']}).",
+        file=sys.stderr,
+    )
+    return 0
+
+
+def run_archive(args: argparse.Namespace) -> int:
+    if args.path is None:
+        print("Informe --path ou PROMPT_SECTIONS_ARCHIVE_PATH.", file=sys.stderr)
+        return 2
+    archive = PromptArchive(args.path)
+    started = time.perf_counter()
+    if args.archive_command == "add":
+        input_format = resolve_format(args.input, args.format)
+        with open_text(args.input, "r") as source:
+            records = iter_records(source, input_format, args.field)
+            prompts = (record["prompt"] for record in records if "error" not in record)
+            count = len(archive.add_many(prompts))
+        action = "arquivados"
+    elif args.tag:
+        count = archive.reclassify_tags(args.tag)
+        action = "reclassificados"
+    else:
+        count = archive.reclassify_all()
+        action = "reclassificados"
+    elapsed = time.perf_counter() - started
+    print(
+        f"{count} prompts {action} em {elapsed:.2f}s ({archive.count()} no arquivo).",
+        file=sys.stderr,
+    )
+    return 0
+
+
+def run_unmatched(args: argparse.Namespace) -> int:
+    started = time.perf_counter()
+    report = UnmatchedReport(args.capacity)
+    input_format = resolve_format(args.input, args.format)
+    with open_text(args.input, "r") as source:
+        records = iter_records(source, input_format, args.field)
+        report.add_prompts(record["prompt"] for record in records if "error" not in record)
+
+    with open_text(args.output, "w") as target:
+        target.write(json.dumps(report.to_dict(args.top), indent=2, ensure_ascii=False) + "\n")
+    if args.rules_template:
+        with open_text(args.rules_template, "w") as target:
+            target.write(report.rules_template(args.top) + "\n")
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"{report.prompts} prompts, {report.counter.total} tags sem regra "
+        f"em {elapsed:.2f}s.",
+        file=sys.stderr,
+    )
+    return 0
+
+
+def run_serve(args: argparse.Namespace) -> int:
+    run_server(
+        host=args.host,
+        port=args.port,
+        max_batch=args.max_batch,
+        max_delay=args.max_delay_ms / 1000,
+        max_pending=args.max_pending,
+        watch_interval=args.watch_interval,
+    )
+    return 0
+
+
+def run_classify(args: argparse.Namespace) -> int:
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    if (args.stages or args.profile) and workers > 1:
+        # Instrumentação e cProfile só enxergam o processo atual
+        print("Perfil ativo: usando --workers 1.", file=sys.stderr)
+        workers = 1
+
+    with ExitStack() as stack:
+        stages = stack.enter_context(profiling.profiled()) if args.stages else None
+        if args.profile:
+            stack.enter_context(profiling.cprofile_to(args.profile))
+        started = time.perf_counter()
+        classified, errors = classify_file(
+            args.input,
+            args.output,
+            input_format=args.format,
+            field=args.field,
+            include_trace=args.trace,
+            workers=workers,
+            chunk_size=args.chunk_size,
+            vocabulary=args.vocabulary,
+        )
+        elapsed = time.perf_counter() - started
+
+    if stages is not None:
+        print(json.dumps(stages.snapshot(), indent=2, ensure_ascii=False), file=sys.stderr)
+    rate = classified / elapsed if elapsed > 0 else 0.0
+    print(
+        f"{classified} prompts classificados, {errors} erros "
+        f"em {elapsed:.2f}s ({rate:.0f} prompts/s, {workers} processo(s)).",
+        file=sys.stderr,
+    )
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.command == "classify":
+        return run_classify(args)
+    if args.command == "serve":
+        return run_serve(args)
+    if args.command == "archive":
+        return run_archive(args)
+    if args.command == "unmatched":
+        return run_unmatched(args)
+    if args.command == "compile-rules":
+        return run_compile_rules(args)
+    return 1
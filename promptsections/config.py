@@ -0,0 +1,61 @@
+"""Caminhos e carregamento da configuração de palavras-chave."""
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+CONFIG_PATH = Path(os.environ.get("PROMPT_SECTIONS_CONFIG_PATH", PROJECT_DIR / "prompt_config.json"))
+
+# Diretórios para regras customizadas (compatível com Streamlit Cloud).
+# Apenas calculados aqui; o diretório é criado ao salvar a primeira regra.
+DEFAULT_CUSTOM_RULES_PATH = PROJECT_DIR / "custom_rules.json"
+DATA_DIR = Path(
+    os.environ.get("PROMPT_SECTIONS_DATA_DIR", Path(tempfile.gettempdir()) / "prompt_sections")
+)
+CUSTOM_RULES_STORAGE_PATH = Path(
+    os.environ.get("PROMPT_SECTIONS_RULES_PATH", DATA_DIR / "custom_rules.json")
+)
+
+# Arquivo de prompts já classificados (opcional; desativado sem a variável)
+ARCHIVE_PATH: Optional[Path] = (
+    Path(os.environ["PROMPT_SECTIONS_ARCHIVE_PATH"])
+    if os.environ.get("PROMPT_SECTIONS_ARCHIVE_PATH")
+    else None
+)
+
+# Regras pré-compiladas por ``compile-rules`` (opcional; desativado sem a variável)
+RULES_ARTIFACT_PATH: Optional[Path] = (
+    Path(os.environ["PROMPT_SECTIONS_RULES_ARTIFACT"])
+    if os.environ.get("PROMPT_SECTIONS_RULES_ARTIFACT")
+    else None
+)
+
+REQUIRED_CONFIG_KEYS = (
+    "quality_terms",
+    "background_keywords",
+    "character_identifiers",
+    "physical_traits",
+    "action_clothing_keywords",
+    "clothing_keywords",
+    "pose_keywords",
+)
+
+
+def load_prompt_config(config_path: Path) -> Dict[str, List[str]]:
+    """Carrega listas de classificação a partir de um arquivo JSON."""
+    with config_path.open(encoding="utf-8") as fh:
+        data = json.load(fh)
+
+    for key in REQUIRED_CONFIG_KEYS:
+        data.setdefault(key, [])
+
+    return data
+
+
+def initial_rules_path() -> Path:
+    """Arquivo de regras usado na carga inicial (persistido ou padrão do repositório)."""
+    if CUSTOM_RULES_STORAGE_PATH.exists():
+        return CUSTOM_RULES_STORAGE_PATH
+    return DEFAULT_CUSTOM_RULES_PATH
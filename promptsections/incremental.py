@@ -0,0 +1,265 @@
+"""Reclassificação incremental de um prompt editado."""
+from typing import Dict, List, Optional
+
+from promptsections import profiling
+from promptsections.classifier import RuleSet, get_rule_set
+from promptsections.rule_index import canonical_tag
+from promptsections.style import may_have_style
+from promptsections.tokenizer import is_top_level, tokenize_prompt
+from promptsections.trace import TraceRecord
+
+SECTIONS = (
+    "Estilo",
+    "Qualidade",
+    "Background",
+    "Personagem",
+    "Pose",
+    "Roupas",
+    "Restante do Prompt",
+)
+
+
+class IncrementalParse:
+    """
+    Resultado de ``parse_prompt`` que guarda o estado de cada tag.
+
+    A seção de personagem só avança para frente e a detecção de estilo olha
+    apenas a tag seguinte, então ao editar o prompt tudo antes da primeira
+    tag alterada (menos o passo que a usava como lookahead) é reaproveitado
+    e só o restante é reclassificado. A tokenização também recomeça da última
+    vírgula fora de grupos antes da edição. As instâncias não são alteradas:
+    ``update`` retorna uma nova.
+    """
+
+    __slots__ = (
+        "rules", "prompt", "tags", "resume_points", "records", "states", "paired", "final_state"
+    )
+
+    def __init__(
+        self,
+        rules: RuleSet,
+        prompt: str,
+        tags: List[str],
+        resume_points: List[int],
+        records: List[TraceRecord],
+        states: bytearray,
+        paired: bytearray,
+        final_state: bool,
+    ) -> None:
+        self.rules = rules
+        self.prompt = prompt
+        # Texto de cada tag, a posição após a vírgula seguinte quando ela está
+        # fora de grupos (senão -1), seu registro, o estado da seção de
+        # personagem antes dela e se ela abre um par de estilo
+        self.tags = tags
+        self.resume_points = resume_points
+        self.records = records
+        self.states = states
+        self.paired = paired
+        self.final_state = final_state
+
+    @classmethod
+    def parse(cls, prompt: str, rules: Optional[RuleSet] = None) -> "IncrementalParse":
+        """Classifica ``prompt`` do início, como ``parse_prompt``."""
+        rules = rules or get_rule_set()
+        tags: List[str] = []
+        resume_points: List[int] = []
+        _tokenize_into(prompt, 0, tags, resume_points)
+        return cls._resume(
+            rules, prompt, tags, resume_points, 0, [], bytearray(), bytearray(), False
+        )
+
+    def update(self, prompt: str, rules: Optional[RuleSet] = None) -> "IncrementalParse":
+        """Classifica a nova versão do prompt reaproveitando o prefixo inalterado."""
+        rules = rules or get_rule_set()
+        if rules is not self.rules:
+            return self.with_rules(rules).update(prompt, rules)
+        if prompt == self.prompt:
+            return self
+
+        # Retoma a tokenização na última vírgula fora de grupos antes da edição
+        old_tags = self.tags
+        unchanged = _common_prefix_length(self.prompt, prompt)
+        kept = len(old_tags)
+        while kept and not 0 <= self.resume_points[kept - 1] <= unchanged:
+            kept -= 1
+        tags = old_tags[:kept]
+        resume_points = self.resume_points[:kept]
+        _tokenize_into(prompt, resume_points[-1] if kept else 0, tags, resume_points)
+
+        common = kept
+        limit = min(len(tags), len(old_tags))
+        while common < limit and tags[common] == old_tags[common]:
+            common += 1
+
+        # Um passo (tag isolada ou par de estilo) só é reaproveitado se ele e a
+        # tag seguinte, usada como lookahead, estão no prefixo comum
+        resume = 0
+        total = len(old_tags)
+        while resume < total and resume + 1 < common:
+            resume += 2 if self.paired[resume] else 1
+        state = self.states[resume] if resume < total else self.final_state
+
+        return self._resume(
+            rules,
+            prompt,
+            tags,
+            resume_points,
+            resume,
+            self.records[:resume],
+            self.states[:resume],
+            self.paired[:resume],
+            bool(state),
+        )
+
+    def with_rules(self, rules: RuleSet) -> "IncrementalParse":
+        """
+        Reclassifica o mesmo prompt com outro conjunto de regras.
+
+        Quando só regras customizadas mudaram, apenas as tags afetadas são
+        decididas de novo, junto com as seguintes enquanto o estado da seção
+        de personagem divergir do anterior; o resto é reaproveitado.
+        """
+        if rules is self.rules:
+            return self
+        changed = rules.changed_tags(self.rules)
+        if changed is None:
+            return IncrementalParse.parse(self.prompt, rules)
+
+        tags, paired = self.tags, self.paired
+        total = len(tags)
+        # Pares de estilo não dependem das regras
+        affected = [
+            index
+            for index, tag in enumerate(tags)
+            if canonical_tag(tag) in changed
+            and not paired[index]
+            and not (index and paired[index - 1])
+        ]
+        old_records, old_states = self.records, self.states
+
+        def state_before(index: int) -> bool:
+            return bool(old_states[index]) if index < total else self.final_state
+
+        if not affected:
+            return IncrementalParse(
+                rules,
+                self.prompt,
+                tags,
+                self.resume_points,
+                old_records,
+                old_states,
+                paired,
+                self.final_state,
+            )
+
+        decide = rules.decide_tag
+        index = affected[0]
+        records = old_records[:index]
+        states = old_states[:index]
+        state = state_before(index)
+        following = 0
+        while index < total:
+            while following < len(affected) and affected[following] < index:
+                following += 1
+            is_affected = following < len(affected) and affected[following] == index
+            if not is_affected and state == old_states[index]:
+                # Estado realinhado: copia tudo até a próxima tag afetada
+                stop = affected[following] if following < len(affected) else total
+                records += old_records[index:stop]
+                states += old_states[index:stop]
+                state = state_before(stop)
+                index = stop
+                continue
+
+            if paired[index]:
+                records += old_records[index:index + 2]
+                states += bytes((state, state))
+                index += 2
+                continue
+
+            states.append(state)
+            category, reason, detail, state = decide(tags[index], state)
+            records.append(TraceRecord(tags[index], category, reason, detail))
+            index += 1
+
+        return IncrementalParse(
+            rules, self.prompt, tags, self.resume_points, records, states, paired, state
+        )
+
+    @classmethod
+    def _resume(
+        cls,
+        rules: RuleSet,
+        prompt: str,
+        tags: List[str],
+        resume_points: List[int],
+        index: int,
+        records: List[TraceRecord],
+        states: bytearray,
+        paired: bytearray,
+        in_character_section: bool,
+    ) -> "IncrementalParse":
+        decide = rules.decide_tag
+        style_pair = rules.compiled.style.is_pair
+        profiler = profiling.ACTIVE
+        if profiler is not None:
+            decide, style_pair, finish_profile = profiler.wrap(decide, style_pair)
+        total = len(tags)
+        check_style = may_have_style(tags[index:])
+        while index < total:
+            tag = tags[index]
+            if check_style and index + 1 < total and style_pair(tag, tags[index + 1]):
+                records.append(TraceRecord(tag, "Estilo", "style_author"))
+                records.append(TraceRecord(tags[index + 1], "Estilo", "style_tag"))
+                states += bytes((in_character_section, in_character_section))
+                paired += b"\x01\x00"
+                index += 2
+                continue
+
+            states.append(in_character_section)
+            paired.append(False)
+            category, reason, detail, in_character_section = decide(tag, in_character_section)
+            records.append(TraceRecord(tag, category, reason, detail))
+            index += 1
+        if profiler is not None:
+            finish_profile()
+        return cls(
+            rules, prompt, tags, resume_points, records, states, paired, in_character_section
+        )
+
+    @property
+    def categorized(self) -> Dict[str, List[str]]:
+        """Categorias no mesmo formato de ``parse_prompt``."""
+        categorized: Dict[str, List[str]] = {section: [] for section in SECTIONS}
+        background_detected = False
+        for record in self.records:
+            if record.categoria == "Background":
+                background_detected = True
+            else:
+                categorized[record.categoria].append(record.tag)
+        if background_detected:
+            categorized["Background"] = ["((simple background))"]
+        return categorized
+
+
+def _tokenize_into(prompt: str, start: int, tags: List[str], resume_points: List[int]) -> None:
+    for token in tokenize_prompt(prompt, start):
+        tags.append(token.text)
+        comma = prompt.find(",", token.end)
+        if comma >= 0 and not prompt[token.end:comma].strip() and is_top_level(prompt, token):
+            resume_points.append(comma + 1)
+        else:
+            resume_points.append(-1)
+
+
+def _common_prefix_length(old: str, new: str) -> int:
+    """Tamanho do prefixo comum, por busca binária com comparações de fatias."""
+    low, high = 0, min(len(old), len(new))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if old[low:middle] == new[low:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
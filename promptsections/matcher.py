@@ -0,0 +1,93 @@
+"""Busca simultânea de palavras-chave (Aho-Corasick) usada pela classificação."""
+from typing import Any, Dict, List, Mapping, Sequence, Tuple
+
+# (grupo, prioridade na lista original, palavra-chave)
+Output = Tuple[str, int, str]
+# Estrutura do autômato só com tipos básicos (serializável com ``marshal``)
+MatcherState = Tuple[Any, ...]
+
+
+class KeywordMatcher:
+    """
+    Autômato Aho-Corasick construído a partir de grupos de palavras-chave.
+
+    Uma única passada sobre o texto encontra todas as palavras contidas nele.
+    Para cada grupo é devolvida a palavra de menor índice na lista original,
+    reproduzindo exatamente ``next(k for k in lista if k in texto)``.
+    """
+
+    __slots__ = ("_goto", "_fail", "_outputs", "_always", "groups")
+
+    def __init__(self, groups: Mapping[str, Sequence[str]]) -> None:
+        self.groups = tuple(groups)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        node_outputs: List[List[Output]] = [[]]
+        always: Dict[str, Tuple[int, str]] = {}
+
+        for group, keywords in groups.items():
+            for priority, keyword in enumerate(keywords):
+                if not keyword:
+                    # Palavra vazia está contida em qualquer texto
+                    always.setdefault(group, (priority, keyword))
+                    continue
+                node = 0
+                for char in keyword:
+                    next_node = self._goto[node].get(char)
+                    if next_node is None:
+                        next_node = len(self._goto)
+                        self._goto[node][char] = next_node
+                        self._goto.append({})
+                        self._fail.append(0)
+                        node_outputs.append([])
+                    node = next_node
+                node_outputs[node].append((group, priority, keyword))
+
+        # Links de falha em largura; saídas herdadas do sufixo mais longo
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                node_outputs[child].extend(node_outputs[self._fail[child]])
+
+        self._outputs: List[Tuple[Output, ...]] = [tuple(outputs) for outputs in node_outputs]
+        self._always = always
+
+    def to_state(self) -> MatcherState:
+        """Tabelas do autômato já construído."""
+        return self.groups, self._goto, self._fail, self._outputs, self._always
+
+    @classmethod
+    def from_state(cls, state: MatcherState) -> "KeywordMatcher":
+        """Recria o matcher a partir de ``to_state``, sem reconstruir o autômato."""
+        matcher = cls.__new__(cls)
+        matcher.groups, matcher._goto, matcher._fail, matcher._outputs, matcher._always = state
+        return matcher
+
+    def scan(self, text: str) -> Dict[str, str]:
+        """Retorna {grupo: palavra-chave de maior prioridade encontrada em ``text``}."""
+        goto = self._goto
+        fail = self._fail
+        outputs = self._outputs
+        best: Dict[str, Tuple[int, str]] = dict(self._always)
+
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for group, priority, keyword in outputs[node]:
+                current = best.get(group)
+                if current is None or priority < current[0]:
+                    best[group] = (priority, keyword)
+
+        return {group: keyword for group, (_, keyword) in best.items()}
+
+    def matches(self, text: str, group: str) -> bool:
+        """Indica se alguma palavra de ``group`` aparece em ``text``."""
+        return group in self.scan(text)
@@ -0,0 +1,148 @@
+"""Classificação paralela em processos, com as regras enviadas uma única vez."""
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from promptsections.batch import (
+    DEFAULT_CHUNK_SIZE,
+    classify_records,
+    classify_records_by_vocabulary,
+    default_parser,
+    iter_mapped_lines,
+    iter_records,
+    mapped_ranges,
+)
+from promptsections.classifier import RuleSet, get_rule_set, set_rule_set
+from promptsections.vocabulary import DEFAULT_MAX_TAGS, TagTable
+
+# Estado de cada processo worker, preenchido pelo initializer
+_WORKER_STATE: Dict[str, Any] = {}
+
+
+def _init_worker(
+    rules: RuleSet,
+    include_trace: bool = True,
+    vocabulary: bool = False,
+    max_tags: int = DEFAULT_MAX_TAGS,
+) -> None:
+    """Prepara o worker: regras compiladas uma vez por processo, não por tarefa."""
+    set_rule_set(rules)
+    _WORKER_STATE["parser"], _WORKER_STATE["formatter"] = default_parser(include_trace)
+    # Vocabulário do worker, mantido entre as tarefas
+    _WORKER_STATE["table"] = TagTable(rules) if vocabulary else None
+    _WORKER_STATE["max_tags"] = max_tags
+
+
+def _classify_chunk(chunk: List[Dict[str, Any]], include_trace: bool) -> List[Dict[str, Any]]:
+    table = _WORKER_STATE["table"]
+    if table is not None:
+        results = list(classify_records_by_vocabulary(chunk, include_trace, table))
+        # Blocos pequenos não chegam ao recomeço de ``classify_corpus``: o limite vale aqui
+        if len(table) > _WORKER_STATE["max_tags"]:
+            _WORKER_STATE["table"] = TagTable(table.rules, table.use_numpy)
+        return results
+    return list(
+        classify_records(
+            chunk,
+            include_trace,
+            parser=_WORKER_STATE["parser"],
+            formatter=_WORKER_STATE["formatter"],
+        )
+    )
+
+
+def _classify_range(
+    path: str,
+    span: Tuple[int, int, int],
+    input_format: str,
+    field: str,
+    include_trace: bool,
+) -> List[Dict[str, Any]]:
+    start, end, first_line = span
+    records = iter_records(iter_mapped_lines(path, start, end), input_format, field, first_line)
+    return _classify_chunk(list(records), include_trace)
+
+
+def _chunks(records: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    iterator = iter(records)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _mp_context() -> multiprocessing.context.BaseContext:
+    # Com fork o RuleSet compilado é herdado; com spawn ele é enviado já compilado
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+
+def classify_parallel(
+    records: Iterable[Dict[str, Any]],
+    include_trace: bool = False,
+    workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    vocabulary: bool = False,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Classifica registros em um pool de processos preservando a ordem da entrada.
+
+    Os registros são agrupados em blocos de ``chunk_size``; no máximo
+    ``2 * workers`` blocos ficam em andamento, o que mantém a memória limitada
+    mesmo para entradas muito grandes.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size deve ser positivo")
+    tasks = ((_classify_chunk, (chunk, include_trace)) for chunk in _chunks(records, chunk_size))
+    return _run_ordered(tasks, include_trace, workers, vocabulary)
+
+
+def classify_mapped_parallel(
+    path: str,
+    input_format: str = "text",
+    field: str = "prompt",
+    include_trace: bool = False,
+    workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    vocabulary: bool = False,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Como ``classify_parallel`` para um arquivo: cada worker mapeia o arquivo
+    (``mmap``) e lê sozinho o trecho que recebeu, então o processo principal
+    não decodifica nem envia prompts, só posições.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size deve ser positivo")
+    tasks = (
+        (_classify_range, (path, span, input_format, field, include_trace))
+        for span in mapped_ranges(path, chunk_size)
+    )
+    return _run_ordered(tasks, include_trace, workers, vocabulary)
+
+
+def _run_ordered(
+    tasks: Iterable[Tuple[Callable[..., List[Dict[str, Any]]], Tuple[Any, ...]]],
+    include_trace: bool,
+    workers: Optional[int],
+    vocabulary: bool,
+) -> Iterator[Dict[str, Any]]:
+    workers = workers or os.cpu_count() or 1
+    max_pending = workers * 2
+    pending: Deque[Future] = deque()
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=_mp_context(),
+        initializer=_init_worker,
+        initargs=(get_rule_set(), include_trace, vocabulary),
+    ) as executor:
+        for function, args in tasks:
+            pending.append(executor.submit(function, *args))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
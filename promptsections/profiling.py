@@ -0,0 +1,191 @@
+"""
+Instrumentação opcional da classificação (``parse_prompt`` e
+``IncrementalParse``), por etapa.
+
+Desativada, custa a leitura de ``ACTIVE`` por prompt. Ativada (``enable`` ou
+``profiled``), conta decisões e acumula tempo por etapa e por lista da
+configuração que decidiu cada tag.
+"""
+import cProfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+# Etapa de ``parse_prompt`` responsável por cada código de motivo
+REASON_STAGES = {
+    "style_author": "Estilo",
+    "style_tag": "Estilo",
+    "quality": "Qualidade",
+    "background": "Background",
+    "character_identifier": "Início de personagem",
+    "named_character": "Início de personagem",
+    "physical_trait": "Seção de personagem",
+    "short_description": "Seção de personagem",
+    "action": "Seção de personagem",
+    "custom_rule": "Regras customizadas",
+    "custom_pattern": "Regras customizadas",
+    "clothing": "Roupas",
+    "pose": "Pose",
+    "no_rule": "Sem regra",
+}
+
+# Lista do prompt_config.json consultada por cada código de motivo
+REASON_LISTS = {
+    "quality": "quality_terms",
+    "background": "background_keywords",
+    "character_identifier": "character_identifiers",
+    "physical_trait": "physical_traits",
+    "action": "action_clothing_keywords",
+    "clothing": "clothing_keywords",
+    "pose": "pose_keywords",
+}
+
+StylePair = Callable[[str, str], bool]
+Decide = Callable[[str, bool], Tuple[str, str, str, bool]]
+
+
+class StageProfiler:
+    """Contadores e tempos acumulados; seguro entre threads."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.prompts = 0
+            self.tags = 0
+            self.total_seconds = 0.0
+            self.style_checks = 0
+            self.style_seconds = 0.0
+            self.stage_hits: Counter = Counter()
+            self.stage_seconds: Counter = Counter()
+            self.list_hits: Counter = Counter()
+            self.keyword_hits: Counter = Counter()
+
+    def wrap(
+        self, decide: Decide, style_pair: StylePair
+    ) -> Tuple[Decide, StylePair, Callable[[], None]]:
+        """
+        Versões cronometradas de ``decide_tag`` e ``is_style_pair`` para um prompt,
+        e a função que consolida os números ao final dele.
+        """
+        clock = time.perf_counter
+        started = clock()
+        stage_hits: Counter = Counter()
+        stage_seconds: Counter = Counter()
+        list_hits: Counter = Counter()
+        keyword_hits: Counter = Counter()
+        style = [0, 0.0]
+
+        def timed_style_pair(author: str, candidate: str) -> bool:
+            mark = clock()
+            result = style_pair(author, candidate)
+            style[0] += 1
+            style[1] += clock() - mark
+            if result:
+                stage_hits["Estilo"] += 2
+            return result
+
+        def timed_decide(tag: str, in_character_section: bool) -> Tuple[str, str, str, bool]:
+            mark = clock()
+            decision = decide(tag, in_character_section)
+            elapsed = clock() - mark
+            reason, detail = decision[1], decision[2]
+            stage = REASON_STAGES.get(reason, reason)
+            stage_hits[stage] += 1
+            stage_seconds[stage] += elapsed
+            config_list = REASON_LISTS.get(reason)
+            if config_list:
+                list_hits[config_list] += 1
+            if detail:
+                keyword_hits[f"{config_list or reason}:{detail}"] += 1
+            return decision
+
+        def finish() -> None:
+            total = clock() - started
+            with self._lock:
+                self.prompts += 1
+                self.tags += sum(stage_hits.values())
+                self.total_seconds += total
+                self.style_checks += style[0]
+                self.style_seconds += style[1]
+                self.stage_hits.update(stage_hits)
+                self.stage_seconds.update(stage_seconds)
+                self.list_hits.update(list_hits)
+                self.keyword_hits.update(keyword_hits)
+
+        return timed_decide, timed_style_pair, finish
+
+    def snapshot(self, top_keywords: int = 20) -> Dict[str, Any]:
+        """Números acumulados, em um dicionário pronto para JSON."""
+        with self._lock:
+            stages = {
+                stage: {
+                    "hits": hits,
+                    "seconds": round(self.stage_seconds.get(stage, 0.0), 6),
+                }
+                for stage, hits in self.stage_hits.most_common()
+            }
+            stages.setdefault("Estilo", {"hits": 0, "seconds": 0.0})
+            stages["Estilo"]["seconds"] = round(self.style_seconds, 6)
+            decided = sum(self.stage_seconds.values()) + self.style_seconds
+            return {
+                "prompts": self.prompts,
+                "tags": self.tags,
+                "total_seconds": round(self.total_seconds, 6),
+                "style_checks": self.style_checks,
+                # Tokenização e o laço do parse, fora das etapas acima
+                "other_seconds": round(max(0.0, self.total_seconds - decided), 6),
+                "stages": stages,
+                "config_lists": dict(self.list_hits.most_common()),
+                "top_keywords": dict(self.keyword_hits.most_common(top_keywords)),
+            }
+
+
+ACTIVE: Optional[StageProfiler] = None
+
+
+def enable(profiler: Optional[StageProfiler] = None) -> StageProfiler:
+    """Ativa a instrumentação em todo o processo e retorna o coletor."""
+    global ACTIVE
+    ACTIVE = profiler or ACTIVE or StageProfiler()
+    return ACTIVE
+
+
+def disable() -> None:
+    global ACTIVE
+    ACTIVE = None
+
+
+@contextmanager
+def profiled(profiler: Optional[StageProfiler] = None) -> Iterator[StageProfiler]:
+    """Instrumenta a classificação dentro do bloco."""
+    previous = ACTIVE
+    collector = enable(profiler or StageProfiler())
+    try:
+        yield collector
+    finally:
+        if previous is None:
+            disable()
+        else:
+            enable(previous)
+
+
+@contextmanager
+def cprofile_to(path: Path) -> Iterator[cProfile.Profile]:
+    """
+    Executa o bloco sob ``cProfile`` e grava as estatísticas (formato pstats,
+    aceito por snakeviz, flameprof e gprof2dot) em ``path``.
+    """
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield profile
+    finally:
+        profile.disable()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        profile.dump_stats(str(path))
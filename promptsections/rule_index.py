@@ -0,0 +1,233 @@
+"""
+Forma canônica das tags e índice das regras customizadas por padrão.
+
+Tags e chaves de regra são comparadas na forma canônica: minúsculas, ``_``
+e ``-`` como espaço, espaços repetidos colapsados e sem ênfase externa
+(``(tag:1.2)``, ``[tag]``). Assim ``long_sleeves``, ``Long Sleeves`` e
+``long-sleeves`` são a mesma regra. Chaves com um único ``*`` são padrões
+(``* hair``, ``blue *``, ``school*uniform``), servidos por tries.
+"""
+import re
+from collections.abc import Mapping as MappingABC
+from typing import Any, Dict, FrozenSet, Iterator, Mapping, Optional, Tuple
+
+WILDCARD = "*"
+_OPENERS = "([{"
+_CLOSERS = ")]}"
+_WEIGHT = re.compile(r":\s*-?\d+(?:\.\d+)?$")
+
+# Nó da trie: caractere -> filho; ``None`` -> o que termina no nó
+TrieNode = Dict[Any, Any]
+# (categoria, padrão canônico)
+PatternEntry = Tuple[str, str]
+
+
+def canonical_tag(tag: str) -> str:
+    """Forma canônica de uma tag ou chave de regra."""
+    text = tag.strip().lower()
+    wrapped = False
+    while len(text) > 1 and text[0] in _OPENERS and text[-1] in _CLOSERS:
+        text = text[1:-1].strip()
+        wrapped = True
+    if wrapped:
+        # Peso só é removido dentro de ênfase: "16:9" continua sendo "16:9"
+        text = _WEIGHT.sub("", text)
+    return " ".join(text.replace("_", " ").replace("-", " ").split())
+
+
+def is_pattern(key: str) -> bool:
+    return key.count(WILDCARD) == 1
+
+
+def canonical_rules(raw_rules: Mapping[str, str]) -> Dict[str, str]:
+    """Regras com chaves canônicas; entre grafias da mesma tag vale a última."""
+    rules: Dict[str, str] = {}
+    for key, category in raw_rules.items():
+        canonical = canonical_tag(key)
+        if canonical:
+            rules[canonical] = category
+    return rules
+
+
+# Marca de chave removida em ``RuleLayer``
+_REMOVED = object()
+
+
+class RuleLayer(MappingABC):
+    """
+    Mapeamento imutável = base compartilhada + alterações por cima.
+
+    ``updated`` cria uma nova camada copiando só as alterações (a base é
+    compartilhada entre as versões), então editar uma regra custa
+    proporcional às alterações acumuladas, não ao total de regras. Quando
+    elas passam de ~4·√n a camada é achatada em uma base nova, o que dilui
+    a cópia completa entre muitas edições. A ordem de iteração é a de um
+    dict com as mesmas operações (atualizar mantém a posição).
+    """
+
+    __slots__ = ("base", "delta", "_moved", "_size")
+
+    def __init__(self, base: Mapping[str, Any] = ()) -> None:
+        self.base: Dict[str, Any] = dict(base)
+        self.delta: Dict[str, Any] = {}
+        # Chaves da base removidas e incluídas de novo: passam para o fim
+        self._moved: FrozenSet[str] = frozenset()
+        self._size = len(self.base)
+
+    @classmethod
+    def _layer(
+        cls, base: Dict[str, Any], delta: Dict[str, Any], moved: FrozenSet[str], size: int
+    ) -> "RuleLayer":
+        layer = cls.__new__(cls)
+        layer.base, layer.delta, layer._moved, layer._size = base, delta, moved, size
+        return layer
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.delta.get(key, self)
+        if value is self:
+            return self.base[key]
+        if value is _REMOVED:
+            raise KeyError(key)
+        return value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self.delta.get(key, self)
+        if value is self:
+            return self.base.get(key, default)
+        return default if value is _REMOVED else value
+
+    def __contains__(self, key: object) -> bool:
+        value = self.delta.get(key, self)
+        if value is self:
+            return key in self.base
+        return value is not _REMOVED
+
+    def __iter__(self) -> Iterator[str]:
+        delta, base, moved = self.delta, self.base, self._moved
+        if not delta:
+            yield from base
+            return
+        for key in base:
+            if delta.get(key) is not _REMOVED and key not in moved:
+                yield key
+        for key, value in delta.items():
+            if value is not _REMOVED and (key not in base or key in moved):
+                yield key
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __reduce__(self):
+        return RuleLayer, (dict(self),)
+
+    def updated(self, changes: Mapping[str, Any]) -> "RuleLayer":
+        """Nova camada com ``changes`` aplicadas (``None`` remove a chave)."""
+        base = self.base
+        delta = dict(self.delta)
+        moved = self._moved
+        size = self._size
+        for key, value in changes.items():
+            present = key in self
+            if value is None:
+                if present:
+                    size -= 1
+                    if key in base:
+                        delta[key] = _REMOVED
+                    else:
+                        del delta[key]
+            elif present:
+                delta[key] = value
+            else:
+                # Como num dict, uma chave nova (ou removida antes) vai para o fim
+                size += 1
+                if key in base:
+                    delta.pop(key, None)
+                    moved = moved | {key}
+                delta[key] = value
+        layer = RuleLayer._layer(base, delta, moved, size)
+        if len(delta) > max(64, 4 * int(size ** 0.5)):
+            return RuleLayer._layer(dict(layer), {}, frozenset(), size)
+        return layer
+
+
+def _insert(root: TrieNode, path: str) -> TrieNode:
+    node = root
+    for char in path:
+        node = node.setdefault(char, {})
+    return node
+
+
+def _longest_suffix(
+    suffixes: TrieNode, canonical: str, limit: int
+) -> Optional[Tuple[int, PatternEntry]]:
+    """(tamanho, regra) do sufixo mais longo de ``canonical``, com até ``limit`` caracteres."""
+    found: Optional[Tuple[int, PatternEntry]] = None
+    node: Optional[TrieNode] = suffixes
+    depth = 0
+    while node is not None:
+        entry = node.get(None)
+        if entry is not None:
+            found = depth, entry
+        if depth == limit:
+            break
+        depth += 1
+        node = node.get(canonical[-depth])
+    return found
+
+
+class PatternRules:
+    """
+    Regras com ``*`` em uma trie do prefixo; cada nó guarda, em ``None``, a
+    trie dos sufixos (invertidos) dos padrões com aquele prefixo. A busca
+    desce pelo começo da tag e, nos nós com padrões, sobe pelo fim dela:
+    o custo depende só do tamanho da tag, não do número de regras.
+
+    Vale o padrão com mais caracteres fixos; em empate, o de prefixo (entre
+    estes, o de prefixo mais curto).
+    """
+
+    __slots__ = ("_root", "count")
+
+    def __init__(self, rules: Mapping[str, str]) -> None:
+        self._root: TrieNode = {}
+        self.count = 0
+        for key, category in rules.items():
+            if not is_pattern(key):
+                continue
+            prefix, suffix = key.split(WILDCARD)
+            suffixes = _insert(self._root, prefix).setdefault(None, {})
+            _insert(suffixes, suffix[::-1])[None] = (category, key)
+            self.count += 1
+
+    def __len__(self) -> int:
+        return self.count
+
+    def match(self, canonical: str) -> Optional[PatternEntry]:
+        """(categoria, padrão) do melhor padrão para a tag canônica, ou ``None``."""
+        if not self.count:
+            return None
+        best: Optional[PatternEntry] = None
+        best_fixed = -1
+        size = len(canonical)
+
+        # Padrões com prefixo; prefixo e sufixo não podem se sobrepor na tag
+        node: Optional[TrieNode] = self._root.get(canonical[0]) if size else None
+        depth = 1
+        while node is not None:
+            suffixes = node.get(None)
+            if suffixes is not None:
+                found = _longest_suffix(suffixes, canonical, size - depth)
+                if found is not None and depth + found[0] > best_fixed:
+                    best, best_fixed = found[1], depth + found[0]
+            if depth == size:
+                break
+            node = node.get(canonical[depth])
+            depth += 1
+
+        # Só sufixo (``* hair``, ``*``): perdem os empates
+        suffixes = self._root.get(None)
+        if suffixes is not None:
+            found = _longest_suffix(suffixes, canonical, size)
+            if found is not None and found[0] > best_fixed:
+                best = found[1]
+        return best
@@ -0,0 +1,357 @@
+"""Leitura e gravação do arquivo JSON de regras customizadas."""
+import atexit
+import json
+import os
+import sys
+import tempfile
+import threading
+import weakref
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
+# Avisados de cada gravação do JSON feita por este processo (referências fracas)
+_WRITE_LISTENERS: List["weakref.WeakMethod"] = []
+
+
+class RulesFileError(ValueError):
+    """O arquivo de regras existe, mas não é um JSON de regras legível."""
+
+
+def is_sqlite_path(path: Path) -> bool:
+    """Arquivos com extensão de banco SQLite usam o backend SQLite."""
+    return path.suffix.lower() in SQLITE_SUFFIXES
+
+
+def load_custom_rules(path: Path) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """Carrega regras customizadas e retorna (raw, normalizado)."""
+    if not path.exists():
+        return {}, {}
+
+    if is_sqlite_path(path):
+        from promptsections.rules_sqlite import SQLiteRuleStore
+
+        return normalize_rules_dict(SQLiteRuleStore(path).load())
+
+    try:
+        with path.open(encoding="utf-8") as fh:
+            data = json.load(fh)
+    except (json.JSONDecodeError, OSError):
+        return {}, {}
+
+    if not isinstance(data, dict):
+        return {}, {}
+
+    return normalize_rules_dict(data)
+
+
+def read_rules_file(path: Path) -> Dict[str, str]:
+    """
+    Como ``load_custom_rules``, mas sem engolir erros: um arquivo existente e
+    corrompido levanta ``RulesFileError`` em vez de virar ``{}``.
+    """
+    if not path.exists():
+        return {}
+    if is_sqlite_path(path):
+        import sqlite3
+
+        from promptsections.rules_sqlite import SQLiteRuleStore
+
+        try:
+            return SQLiteRuleStore(path).load()
+        except sqlite3.DatabaseError as exc:
+            raise RulesFileError(f"{path}: banco de regras ilegível ({exc})") from exc
+    try:
+        with path.open(encoding="utf-8") as fh:
+            data = json.load(fh)
+    except json.JSONDecodeError as exc:
+        raise RulesFileError(f"{path}: JSON inválido ({exc})") from exc
+    if not isinstance(data, dict):
+        raise RulesFileError(f"{path}: o JSON deve ser um objeto tag -> categoria")
+    return normalize_rules_dict(data)[0]
+
+
+def normalize_rules_dict(data: Dict[str, str]) -> Tuple[Dict[str, str], Dict[str, str]]:
+    raw_rules: Dict[str, str] = {}
+    normalized_rules: Dict[str, str] = {}
+
+    for key, value in data.items():
+        if not isinstance(key, str) or not isinstance(value, str):
+            continue
+        key_clean = key.strip()
+        category_clean = value.strip()
+        if not key_clean or not category_clean:
+            continue
+        raw_rules[key_clean] = category_clean
+        normalized_rules[key_clean.lower()] = category_clean
+
+    return raw_rules, normalized_rules
+
+
+def _write_atomic(path: Path, rules: Mapping[str, str]) -> None:
+    """Grava em arquivo temporário e renomeia: leitores nunca veem um JSON parcial."""
+    serialized = json.dumps(dict(sorted(rules.items())), indent=2, ensure_ascii=False)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            fh.write(serialized)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+
+
+def add_write_listener(method: Callable[[Path, Mapping[str, str]], None]) -> None:
+    """
+    Chama o método ``method(path, regras)`` após cada gravação de um
+    ``RuleStore`` deste processo, com o arquivo ainda travado. Não mantém o
+    objeto vivo: a referência é fraca.
+    """
+    _WRITE_LISTENERS.append(weakref.WeakMethod(method))
+
+
+def _notify_write(path: Path, rules: Mapping[str, str]) -> None:
+    for reference in list(_WRITE_LISTENERS):
+        method = reference()
+        if method is not None:
+            method(path, rules)
+            continue
+        try:
+            _WRITE_LISTENERS.remove(reference)
+        except ValueError:
+            pass
+
+
+def save_custom_rules(path: Path, rules: Dict[str, str]) -> bool:
+    if is_sqlite_path(path):
+        from promptsections.rules_sqlite import SQLiteRuleStore
+
+        return SQLiteRuleStore(path).replace_all(rules)
+    try:
+        _write_atomic(path, rules)
+        return True
+    except OSError:
+        return False
+
+
+def open_rule_store(
+    path: Path, fallback_path: Optional[Path] = None, flush_delay: float = 0.0
+) -> "RuleStore":
+    """Cria o armazenamento adequado à extensão de ``path`` (JSON ou SQLite)."""
+    if is_sqlite_path(path):
+        from promptsections.rules_sqlite import SQLiteRuleStore
+
+        return SQLiteRuleStore(path, fallback_path, flush_delay)
+    return RuleStore(path, fallback_path, flush_delay)
+
+
+@contextmanager
+def _file_lock(path: Path) -> Iterator[None]:
+    """Lock exclusivo entre processos, feito em um arquivo ``.lock`` ao lado das regras."""
+    lock_path = path.with_name(path.name + ".lock")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "a+b") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        else:
+            fh.seek(0)
+            msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+            else:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class RuleStore:
+    """
+    Persistência incremental das regras customizadas.
+
+    Alterações (``tag -> categoria``; ``None`` remove) são acumuladas e
+    gravadas de uma vez por ``flush``. Cada gravação relê o arquivo sob um
+    lock entre processos, aplica apenas as alterações pendentes e troca o
+    arquivo atomicamente, de modo que edições concorrentes de outras sessões
+    ou processos não se perdem. Com ``flush_delay`` > 0, rajadas de edições
+    viram uma única gravação.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        fallback_path: Optional[Path] = None,
+        flush_delay: float = 0.0,
+    ) -> None:
+        self.path = path
+        self.fallback_path = fallback_path
+        self.flush_delay = flush_delay
+        self.writes = 0
+        self._pending: Dict[str, Optional[str]] = {}
+        self._replace_all: Optional[Dict[str, str]] = None
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+        self._timer: Optional[threading.Timer] = None
+        self.last_flush_ok = True
+        if flush_delay > 0:
+            # Alterações ainda no timer seriam perdidas ao encerrar o processo
+            atexit.register(self._flush_at_exit)
+
+    def _read_current(self) -> Dict[str, str]:
+        if self.path.exists():
+            return load_custom_rules(self.path)[0]
+        if self.fallback_path is not None:
+            return load_custom_rules(self.fallback_path)[0]
+        return {}
+
+    # Backends com índice próprio respondem count/page sem carregar tudo
+    indexed = False
+
+    def load(self) -> Dict[str, str]:
+        """Regras atualmente persistidas (sem as alterações pendentes)."""
+        return self._read_current()
+
+    def count(self, search: str = "") -> int:
+        return len(self.page(0, None, search))
+
+    def page(
+        self, offset: int = 0, limit: Optional[int] = 50, search: str = ""
+    ) -> List[Tuple[str, str]]:
+        """Fatia ordenada das regras persistidas, filtrada por ``search`` na tag."""
+        needle = search.strip().lower()
+        items = sorted(self._read_current().items())
+        if needle:
+            items = [item for item in items if needle in item[0].lower()]
+        end = None if limit is None else offset + limit
+        return items[offset:end]
+
+    def apply(self, changes: Mapping[str, Optional[str]]) -> bool:
+        """
+        Registra alterações. Retorna se já estão (ou serão) persistidas; em
+        lote ou com atraso, reflete o resultado da última gravação.
+        """
+        with self._lock:
+            self._pending.update(changes)
+            if self._batch_depth:
+                return self.last_flush_ok
+            if self.flush_delay > 0:
+                self._schedule_flush()
+                return self.last_flush_ok
+        return self.flush()
+
+    def replace_all(self, rules: Mapping[str, str]) -> bool:
+        """Substitui todas as regras (ex.: importação de arquivo)."""
+        with self._lock:
+            self._pending.clear()
+            self._replace_all = dict(rules)
+            if self._batch_depth:
+                return self.last_flush_ok
+        return self.flush()
+
+    def discard(self, tags: Iterable[str], replacement: bool = False) -> None:
+        """Desiste de gravar as alterações pendentes de ``tags`` (e da substituição total)."""
+        with self._lock:
+            for tag in tags:
+                self._pending.pop(tag, None)
+            if replacement:
+                self._replace_all = None
+
+    @contextmanager
+    def batch(self) -> Iterator["RuleStore"]:
+        """Agrupa várias alterações em uma única gravação ao final do bloco."""
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                done = self._batch_depth == 0
+            if done:
+                self.flush()
+
+    def _flush_at_exit(self) -> None:
+        try:
+            saved = self.flush()
+        except RulesFileError as exc:
+            print(f"Regras customizadas não gravadas: {exc}", file=sys.stderr)
+            return
+        if not saved:
+            print(
+                f"Regras customizadas não gravadas em {self.path}: "
+                f"{len(self._pending)} alterações pendentes perdidas.",
+                file=sys.stderr,
+            )
+
+    def _schedule_flush(self) -> None:
+        if self._timer is not None:
+            return
+        self._timer = threading.Timer(self.flush_delay, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def flush(self) -> bool:
+        """Grava alterações pendentes; retorna se a gravação teve sucesso."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._pending and self._replace_all is None:
+                return self.last_flush_ok
+            pending = self._pending
+            replace_all = self._replace_all
+            self._pending = {}
+            self._replace_all = None
+
+            try:
+                self._write(pending, replace_all)
+            except (RulesFileError, *self.write_errors) as exc:
+                # Disco somente leitura ou arquivo corrompido: devolve as alterações
+                # para uma próxima tentativa, sem sobrescrever o arquivo
+                if replace_all is not None and self._replace_all is None:
+                    self._replace_all = replace_all
+                self._pending = {**pending, **self._pending}
+                self.last_flush_ok = False
+                if isinstance(exc, RulesFileError):
+                    raise
+                return False
+
+            self.writes += 1
+            self.last_flush_ok = True
+            return True
+
+    write_errors: Tuple[type, ...] = (OSError,)
+
+    def _write(
+        self, pending: Dict[str, Optional[str]], replace_all: Optional[Dict[str, str]]
+    ) -> None:
+        with _file_lock(self.path):
+            if replace_all is not None:
+                rules = replace_all
+            elif self.path.exists() or self.fallback_path is None:
+                rules = read_rules_file(self.path)
+            else:
+                rules = read_rules_file(self.fallback_path)
+            for tag, category in pending.items():
+                if category is None:
+                    rules.pop(tag, None)
+                else:
+                    rules[tag] = category
+            _write_atomic(self.path, rules)
+            _notify_write(self.path, rules)
@@ -0,0 +1,127 @@
+"""Armazenamento de regras customizadas em SQLite, para conjuntos muito grandes."""
+import json
+import sqlite3
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple
+
+from promptsections.rules import RuleStore, load_custom_rules, normalize_rules_dict
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS custom_rules (
+    tag TEXT PRIMARY KEY,
+    tag_lower TEXT NOT NULL,
+    category TEXT NOT NULL
+);
+-- Índice das versões anteriores: a busca por trecho (LIKE '%...%') não o usa
+DROP INDEX IF EXISTS idx_custom_rules_tag_lower;
+"""
+
+
+class SQLiteRuleStore(RuleStore):
+    """
+    Regras em um arquivo SQLite local, ordenadas pela chave primária (a tag).
+
+    Alterações pontuais viram ``INSERT ... ON CONFLICT``/``DELETE`` em uma
+    transação, sem regravar o conjunto inteiro; o próprio SQLite cuida do
+    lock entre processos. Na criação do banco as regras de ``fallback_path``
+    (JSON) são importadas.
+    """
+
+    write_errors = (OSError, sqlite3.Error)
+    indexed = True
+
+    def __init__(
+        self,
+        path: Path,
+        fallback_path: Optional[Path] = None,
+        flush_delay: float = 0.0,
+    ) -> None:
+        super().__init__(path, fallback_path, flush_delay)
+        created = not path.exists()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+        if created and fallback_path is not None and fallback_path.exists():
+            self.replace_all(load_custom_rules(fallback_path)[0])
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # Uma conexão por operação: seguro entre threads do Streamlit
+        with closing(sqlite3.connect(self.path, timeout=30)) as conn:
+            with conn:
+                yield conn
+
+    def _read_current(self) -> Dict[str, str]:
+        with self._connect() as conn:
+            return dict(conn.execute("SELECT tag, category FROM custom_rules"))
+
+    def _write(
+        self, pending: Dict[str, Optional[str]], replace_all: Optional[Dict[str, str]]
+    ) -> None:
+        with self._connect() as conn:
+            if replace_all is not None:
+                conn.execute("DELETE FROM custom_rules")
+                conn.executemany(
+                    "INSERT INTO custom_rules (tag, tag_lower, category) VALUES (?, ?, ?)",
+                    ((tag, tag.lower(), category) for tag, category in replace_all.items()),
+                )
+            deleted = [(tag,) for tag, category in pending.items() if category is None]
+            upserted = [
+                (tag, tag.lower(), category)
+                for tag, category in pending.items()
+                if category is not None
+            ]
+            conn.executemany("DELETE FROM custom_rules WHERE tag = ?", deleted)
+            conn.executemany(
+                "INSERT INTO custom_rules (tag, tag_lower, category) VALUES (?, ?, ?) "
+                "ON CONFLICT (tag) DO UPDATE SET category = excluded.category",
+                upserted,
+            )
+
+    def count(self, search: str = "") -> int:
+        with self._connect() as conn:
+            if search.strip():
+                row = conn.execute(
+                    "SELECT COUNT(*) FROM custom_rules WHERE tag_lower LIKE ? ESCAPE '\\'",
+                    (_like_pattern(search),),
+                ).fetchone()
+            else:
+                row = conn.execute("SELECT COUNT(*) FROM custom_rules").fetchone()
+        return row[0]
+
+    def page(
+        self, offset: int = 0, limit: Optional[int] = 50, search: str = ""
+    ) -> List[Tuple[str, str]]:
+        limit = -1 if limit is None else limit
+        with self._connect() as conn:
+            if search.strip():
+                rows = conn.execute(
+                    "SELECT tag, category FROM custom_rules WHERE tag_lower LIKE ? ESCAPE '\\' "
+                    "ORDER BY tag LIMIT ? OFFSET ?",
+                    (_like_pattern(search), limit, offset),
+                )
+            else:
+                rows = conn.execute(
+                    "SELECT tag, category FROM custom_rules ORDER BY tag LIMIT ? OFFSET ?",
+                    (limit, offset),
+                )
+            return list(rows)
+
+    def import_json(self, data: Mapping[str, str], replace: bool = False) -> int:
+        """Importa um objeto ``{tag: categoria}`` no formato do ``custom_rules.json``."""
+        raw_rules, _ = normalize_rules_dict(dict(data))
+        if replace:
+            self.replace_all(raw_rules)
+        else:
+            self.apply(raw_rules)
+        return len(raw_rules)
+
+    def export_json(self) -> str:
+        """Exporta as regras no mesmo formato do ``custom_rules.json``."""
+        return json.dumps(dict(sorted(self.load().items())), indent=2, ensure_ascii=False)
+
+
+def _like_pattern(search: str) -> str:
+    escaped = search.strip().lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
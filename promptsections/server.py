@@ -0,0 +1,381 @@
+"""
+Serviço HTTP assíncrono de classificação: ``python -m promptsections serve``.
+
+Só biblioteca padrão (asyncio). Rotas:
+
+- ``POST /classify`` com ``{"prompt": "...", "trace": false}`` ou
+  ``{"prompts": ["...", ...]}``; responde ``categorized``/``formatted``
+  (e ``trace`` quando pedido) para cada prompt.
+- ``GET /health`` com a versão das regras e os contadores do serviço.
+
+Requisições concorrentes são agrupadas em lotes classificados de uma vez
+em uma thread dedicada, com o conjunto de regras compilado compartilhado.
+Quando a fila enche a resposta é ``503`` com ``Retry-After``; uma lista
+maior do que a fila inteira recebe ``413``.
+"""
+import asyncio
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from promptsections.classifier import format_output, get_rule_set, parse_prompt
+
+DEFAULT_MAX_BATCH = 64
+DEFAULT_MAX_DELAY = 0.002
+DEFAULT_MAX_PENDING = 4096
+MAX_BODY_BYTES = 1024 * 1024
+MAX_HEADER_BYTES = 64 * 1024
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    503: "Service Unavailable",
+}
+
+Job = Tuple[str, bool, "asyncio.Future[Dict[str, Any]]"]
+
+
+class Overloaded(Exception):
+    """A fila de classificação está cheia."""
+
+
+class BatchTooLarge(Exception):
+    """A lista tem mais prompts do que cabem na fila, mesmo vazia."""
+
+
+def classify_batch(items: Sequence[Tuple[str, bool]]) -> List[Dict[str, Any]]:
+    """Classifica um lote com um único conjunto de regras; prompts repetidos saem uma vez."""
+    rules = get_rule_set()
+    version = rules.version
+    computed: Dict[Tuple[str, bool], Dict[str, Any]] = {}
+    results = []
+    for prompt, include_trace in items:
+        key = (prompt, include_trace)
+        result = computed.get(key)
+        if result is None:
+            categorized, trace = parse_prompt(prompt, rules=rules, trace=include_trace)
+            result = {
+                "categorized": categorized,
+                "formatted": format_output(categorized),
+                "rules_version": version,
+            }
+            if include_trace:
+                result["trace"] = [dict(item) for item in trace]
+            computed[key] = result
+        results.append(result)
+    return results
+
+
+class BatchClassifier:
+    """
+    Junta os prompts que chegam enquanto um lote é classificado.
+
+    O primeiro prompt espera no máximo ``max_delay`` segundos por outros; com
+    o classificador ocupado, os que chegam no meio tempo formam o próximo
+    lote (até ``max_batch``). A fila tem no máximo ``max_pending`` prompts.
+    """
+
+    def __init__(
+        self,
+        max_batch: int = DEFAULT_MAX_BATCH,
+        max_delay: float = DEFAULT_MAX_DELAY,
+        max_pending: int = DEFAULT_MAX_PENDING,
+    ) -> None:
+        self.max_batch = max(1, max_batch)
+        self.max_delay = max(0.0, max_delay)
+        self.max_pending = max(1, max_pending)
+        self.batches = 0
+        self.classified = 0
+        self.rejected = 0
+        self._queue: Optional["asyncio.Queue[Job]"] = None
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def start(self) -> None:
+        """Inicia o consumidor no loop atual."""
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue(self.max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prompt-classifier")
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def submit(self, prompt: str, include_trace: bool = False) -> "asyncio.Future[Dict[str, Any]]":
+        """Enfileira um prompt; levanta ``Overloaded`` se a fila estiver cheia."""
+        if self._queue is None:
+            raise RuntimeError("BatchClassifier.start() não foi chamado")
+        future: "asyncio.Future[Dict[str, Any]]" = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((prompt, include_trace, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise Overloaded from None
+        return future
+
+    def submit_many(
+        self, prompts: Sequence[str], include_trace: bool = False
+    ) -> List["asyncio.Future[Dict[str, Any]]"]:
+        """
+        Enfileira todos os prompts ou nenhum: levanta ``BatchTooLarge`` se a
+        lista passa de ``max_pending`` e ``Overloaded`` se não cabe na fila agora.
+        """
+        if self._queue is None:
+            raise RuntimeError("BatchClassifier.start() não foi chamado")
+        if len(prompts) > self.max_pending:
+            raise BatchTooLarge
+        if len(prompts) > self.max_pending - self._queue.qsize():
+            self.rejected += len(prompts)
+            raise Overloaded
+        # Sem ``await`` entre a conferência e os envios: a vaga não é tomada no meio
+        return [self.submit(prompt, include_trace) for prompt in prompts]
+
+    async def classify(self, prompt: str, include_trace: bool = False) -> Dict[str, Any]:
+        return await self.submit(prompt, include_trace)
+
+    async def _collect(self) -> List[Job]:
+        queue = self._queue
+        assert queue is not None
+        batch = [await queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_delay
+        while len(batch) < self.max_batch:
+            if not queue.empty():
+                batch.append(queue.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [job for job in await self._collect() if not job[2].done()]
+            if not batch:
+                continue
+            items = [(prompt, include_trace) for prompt, include_trace, _ in batch]
+            try:
+                results = await loop.run_in_executor(self._executor, classify_batch, items)
+            except Exception as exc:
+                # Repassado a quem pediu; o serviço continua
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+            self.batches += 1
+            self.classified += len(batch)
+            for (_, _, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+class ClassificationServer:
+    """Servidor HTTP/1.1 mínimo (com keep-alive) em cima de ``asyncio.start_server``."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8765,
+        classifier: Optional[BatchClassifier] = None,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.classifier = classifier or BatchClassifier()
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        # Compila as regras antes da primeira requisição
+        get_rule_set()
+        self.classifier.start()
+        self._server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port, limit=MAX_HEADER_BYTES
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        assert self._server is not None
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        await self.classifier.stop()
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                method, path, version, headers = _parse_head(head)
+                keep_alive = _keep_alive(version, headers)
+
+                status, payload, extra = 400, {"error": "Requisição inválida"}, {}
+                length = headers.get("content-length", "0")
+                if not method or not length.isdigit():
+                    keep_alive = False
+                elif int(length) > MAX_BODY_BYTES:
+                    status, payload = 413, {"error": "Corpo da requisição grande demais"}
+                    keep_alive = False
+                else:
+                    try:
+                        body = await reader.readexactly(int(length))
+                    except (asyncio.IncompleteReadError, ConnectionError):
+                        break
+                    status, payload, extra = await self._route(method, path, body)
+
+                writer.write(_response(status, payload, keep_alive, extra))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _route(
+        self, method: str, path: str, body: bytes
+    ) -> Tuple[int, Any, Dict[str, str]]:
+        path = path.split("?", 1)[0]
+        if path == "/health":
+            if method != "GET":
+                return 405, {"error": "Use GET"}, {"Allow": "GET"}
+            return 200, self.health(), {}
+        if path != "/classify":
+            return 404, {"error": "Rota desconhecida"}, {}
+        if method != "POST":
+            return 405, {"error": "Use POST"}, {"Allow": "POST"}
+
+        try:
+            data = json.loads(body.decode("utf-8"))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            return 400, {"error": "JSON inválido"}, {}
+        if not isinstance(data, dict):
+            return 400, {"error": "Envie um objeto JSON"}, {}
+        include_trace = bool(data.get("trace", False))
+        prompt = data.get("prompt")
+        prompts = data.get("prompts")
+
+        try:
+            if isinstance(prompt, str):
+                return 200, await self.classifier.classify(prompt, include_trace), {}
+            if isinstance(prompts, list) and all(isinstance(item, str) for item in prompts):
+                futures = self.classifier.submit_many(prompts, include_trace)
+                return 200, {"results": list(await asyncio.gather(*futures))}, {}
+        except Overloaded:
+            return 503, {"error": "Serviço sobrecarregado"}, {"Retry-After": "1"}
+        except BatchTooLarge:
+            limit = self.classifier.max_pending
+            return 413, {"error": f"No máximo {limit} prompts por requisição"}, {}
+        return 400, {"error": "Campo 'prompt' (texto) ou 'prompts' (lista) ausente"}, {}
+
+    def health(self) -> Dict[str, Any]:
+        classifier = self.classifier
+        return {
+            "status": "ok",
+            "rules_version": get_rule_set().version,
+            "pending": classifier.pending,
+            "batches": classifier.batches,
+            "classified": classifier.classified,
+            "rejected": classifier.rejected,
+        }
+
+
+def _parse_head(head: bytes) -> Tuple[str, str, str, Dict[str, str]]:
+    lines = head.decode("latin-1").split("\r\n")
+    parts = lines[0].split()
+    if len(parts) != 3:
+        return "", "", "", {}
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    return parts[0].upper(), parts[1], parts[2].upper(), headers
+
+
+def _keep_alive(version: str, headers: Dict[str, str]) -> bool:
+    connection = headers.get("connection", "").lower()
+    if version == "HTTP/1.0":
+        return connection == "keep-alive"
+    return connection != "close"
+
+
+def _response(status: int, payload: Any, keep_alive: bool, extra: Dict[str, str]) -> bytes:
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    headers = [
+        f"HTTP/1.1 {status} {_REASONS.get(status, '')}",
+        "Content-Type: application/json; charset=utf-8",
+        f"Content-Length: {len(body)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    headers += [f"{name}: {value}" for name, value in extra.items()]
+    return ("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + body
+
+
+def run_server(
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    max_batch: int = DEFAULT_MAX_BATCH,
+    max_delay: float = DEFAULT_MAX_DELAY,
+    max_pending: int = DEFAULT_MAX_PENDING,
+    watch_interval: float = 1.0,
+) -> None:
+    """Executa o serviço até Ctrl+C, recarregando regras alteradas em disco."""
+    from promptsections.watcher import RulesWatcher
+
+    server = ClassificationServer(host, port, BatchClassifier(max_batch, max_delay, max_pending))
+    watcher = RulesWatcher(min_interval=watch_interval) if watch_interval > 0 else None
+
+    async def main() -> None:
+        await server.start()
+        if watcher is not None:
+            watcher.start()
+        print(f"Servindo em http://{server.host}:{server.port}", file=sys.stderr)
+        try:
+            await server.serve_forever()
+        finally:
+            await server.stop()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if watcher is not None:
+            watcher.stop()
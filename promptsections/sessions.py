@@ -0,0 +1,139 @@
+"""Estado por sessão do app com memória limitada e descarte de sessões ociosas."""
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, Tuple
+
+from promptsections.classifier import RuleSet
+
+# Alterações de regras de uma sessão: tag -> categoria (``None`` remove)
+RuleOverlay = Dict[str, Optional[str]]
+
+# Conjuntos derivados (ativo + overlay) mantidos, compartilhados por sessões com o mesmo overlay
+OVERLAY_RULE_SETS = 16
+
+
+class SessionStore:
+    """
+    Objetos de trabalho das sessões (ex.: a análise incremental do prompt),
+    guardados fora do ``st.session_state``, que fica só com o id da sessão.
+
+    Sessões sem acesso há mais de ``idle_seconds`` são descartadas, e acima
+    de ``max_sessions`` sai a usada há mais tempo. Quem perde o estado apenas
+    recomeça do zero: nada aqui é a única cópia de um dado.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 256,
+        idle_seconds: float = 1800.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self._clock = clock
+        # id -> (último acesso, valor), do acesso mais antigo ao mais recente
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    @staticmethod
+    def new_id() -> str:
+        return secrets.token_hex(8)
+
+    def get(self, session_id: str) -> Any:
+        """Valor da sessão (``None`` se nunca gravado ou já descartado)."""
+        with self._lock:
+            now = self._clock()
+            self._evict(now)
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return None
+            self._entries[session_id] = (now, entry[1])
+            self._entries.move_to_end(session_id)
+            return entry[1]
+
+    def put(self, session_id: str, value: Any) -> None:
+        with self._lock:
+            now = self._clock()
+            self._entries[session_id] = (now, value)
+            self._entries.move_to_end(session_id)
+            self._evict(now)
+
+    def discard(self, session_id: str) -> None:
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+    def _evict(self, now: float) -> None:
+        entries = self._entries
+        while entries:
+            oldest_id, (last_seen, _) = next(iter(entries.items()))
+            if len(entries) <= self.max_sessions and now - last_seen <= self.idle_seconds:
+                break
+            del entries[oldest_id]
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "sessions": len(self._entries),
+                "max_sessions": self.max_sessions,
+                "evictions": self.evictions,
+            }
+
+
+def overlay_changes(
+    overlay: Optional[RuleOverlay], changes: Mapping[str, Optional[str]]
+) -> RuleOverlay:
+    """Novo overlay com ``changes`` por cima de ``overlay`` (o original não é alterado)."""
+    merged = dict(overlay or {})
+    merged.update(changes)
+    return merged
+
+
+def forget_changes(overlay: Optional[RuleOverlay], tags: Iterable[str]) -> RuleOverlay:
+    """Novo overlay sem ``tags`` (ex.: alterações que acabaram gravadas)."""
+    remaining = dict(overlay or {})
+    for tag in tags:
+        remaining.pop(tag, None)
+    return remaining
+
+
+def replacement_changes(rules: RuleSet, raw_rules: Mapping[str, str]) -> RuleOverlay:
+    """Alterações que levam as regras de ``rules`` a ``raw_rules`` (ex.: importação)."""
+    current = rules.custom_rules_raw
+    changes: RuleOverlay = {tag: None for tag in current if tag not in raw_rules}
+    changes.update(
+        (tag, category) for tag, category in raw_rules.items() if current.get(tag) != category
+    )
+    return changes
+
+
+def pending_changes(overlay: Optional[RuleOverlay], rules: RuleSet) -> RuleOverlay:
+    """Parte do overlay que ``rules`` ainda não reflete (ex.: após recarga do disco)."""
+    if not overlay:
+        return {}
+    current = rules.custom_rules_raw
+    return {tag: category for tag, category in overlay.items() if current.get(tag) != category}
+
+
+@lru_cache(maxsize=OVERLAY_RULE_SETS)
+def _overlay_rule_set(base: RuleSet, changes: Tuple[Tuple[str, Optional[str]], ...]) -> RuleSet:
+    return base.with_rule_changes(dict(changes))
+
+
+def session_rule_set(overlay: Optional[RuleOverlay], base: RuleSet) -> RuleSet:
+    """
+    Regras vistas por uma sessão: ``base`` (o conjunto ativo, compartilhado)
+    com o overlay dela por cima. Sem alterações pendentes é o próprio
+    ``base``; o conjunto ativo do processo nunca é trocado.
+    """
+    pending = pending_changes(overlay, base)
+    if not pending:
+        return base
+    return _overlay_rule_set(base, tuple(sorted(pending.items(), key=lambda item: item[0])))
@@ -0,0 +1,87 @@
+"""Detecção de pares autor + estilo (``autor, autor style``)."""
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+
+STYLE_CACHE_SIZE = 16384
+# Sufixos que formam a tag de estilo de um artista conhecido (``_style`` e
+# ``-style`` viram " style" na normalização)
+STYLE_SUFFIXES = (" style", " art style")
+
+
+def normalize_artist(name: str) -> str:
+    """Nome em minúsculas, com ``_``/``-`` como espaço e sem espaços repetidos."""
+    return " ".join(name.lower().replace("_", " ").replace("-", " ").split())
+
+
+def _strip_by(artist: str) -> str:
+    return artist[3:] if artist.startswith("by ") else artist
+
+
+def _author_key(author_tag: str) -> Tuple[str, Tuple[str, ...]]:
+    """(nome normalizado sem "by ", palavras do autor com mais de 2 letras)."""
+    artist = normalize_artist(author_tag)
+    words = tuple(word for word in artist.split() if len(word) > 2)
+    return _strip_by(artist), words
+
+
+def _candidate_key(style_tag: str) -> str:
+    """A tag normalizada como os nomes se contém "style"; vazia se não pode ser um estilo."""
+    return normalize_artist(style_tag) if "style" in style_tag.lower() else ""
+
+
+class StyleIndex:
+    """
+    Decide se uma tag é o estilo do autor que a precede.
+
+    Vale a heurística original: a tag contém "style" e alguma palavra do
+    autor com mais de 2 letras. Com ``artists`` (chave opcional
+    ``style_artists`` do ``prompt_config.json``: lista de nomes, ou nome →
+    tags de estilo extras) os pares de artistas conhecidos também são
+    reconhecidos por busca exata, inclusive nomes curtos e estilos que não
+    repetem o nome. Autor e tag são normalizados uma vez e ficam em cache.
+    """
+
+    def __init__(self, artists: Any = ()) -> None:
+        if isinstance(artists, dict):
+            entries = list(artists.items())
+        else:
+            entries = [(name, ()) for name in artists]
+
+        # tag de estilo exata -> artistas que a usam
+        known: Dict[str, List[str]] = {}
+        for name, aliases in entries:
+            if not isinstance(name, str):
+                continue
+            artist = _strip_by(normalize_artist(name))
+            if not artist:
+                continue
+            if isinstance(aliases, str):
+                aliases = [aliases]
+            styles = [artist + suffix for suffix in STYLE_SUFFIXES]
+            styles += [normalize_artist(alias) for alias in aliases if isinstance(alias, str)]
+            for style in styles:
+                artists_for_style = known.setdefault(style, [])
+                if artist not in artists_for_style:
+                    artists_for_style.append(artist)
+        self.style_tags: Dict[str, Tuple[str, ...]] = {
+            style: tuple(names) for style, names in known.items()
+        }
+        self._author = lru_cache(maxsize=STYLE_CACHE_SIZE)(_author_key)
+        self._candidate = lru_cache(maxsize=STYLE_CACHE_SIZE)(_candidate_key)
+
+    def __len__(self) -> int:
+        return len(self.style_tags)
+
+    def is_pair(self, author_tag: str, style_tag: str) -> bool:
+        candidate = self._candidate(style_tag)
+        if not candidate:
+            return False
+        artist, words = self._author(author_tag)
+        if artist in self.style_tags.get(candidate, ()):
+            return True
+        return any(word in candidate for word in words)
+
+
+def may_have_style(tags: List[str]) -> bool:
+    """Falso quando nenhuma tag contém "style", o que dispensa a verificação por par."""
+    return "style" in ",".join(tags).lower()
@@ -0,0 +1,226 @@
+"""Tokenização de prompts em uma única passada, com a sintaxe de pesos do Stable Diffusion."""
+import re
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+# Multiplicador de cada tipo de ênfase (convenções A1111/NovelAI)
+EMPHASIS_MULTIPLIERS = {"(": 1.1, "[": 1 / 1.1, "{": 1.05}
+_CLOSERS = {"(": ")", "[": "]", "{": "}"}
+_SPECIAL = re.compile(r"[\\,()\[\]{}]")
+_EMPHASIS_OR_ESCAPE = re.compile(r"[\\()\[\]{}]")
+_EXPLICIT_WEIGHT = re.compile(r":\s*([+-]?(?:\d+\.?\d*|\.\d+))\s*$")
+
+
+class PromptToken(NamedTuple):
+    """
+    Uma tag do prompt, já sem ênfases, com o peso efetivo.
+
+    ``start``/``end`` delimitam o trecho bruto entre vírgulas (sem espaços
+    nas pontas), isto é, ``prompt[start:end]`` inclui parênteses e peso.
+    """
+
+    text: str
+    start: int
+    end: int
+    depth: int
+    weight: float
+
+
+class _Group:
+    __slots__ = ("closer", "multiplier", "closed")
+
+    def __init__(self, opener: str) -> None:
+        self.closer = _CLOSERS[opener]
+        self.multiplier = EMPHASIS_MULTIPLIERS[opener]
+        self.closed = False
+
+
+class _PendingToken:
+    __slots__ = ("parts", "start", "end", "groups", "boundary")
+
+    def __init__(self) -> None:
+        self.parts: List[str] = []
+        self.start = -1
+        self.end = -1
+        self.groups: List[_Group] = []
+        # Profundidade em que um grupo do token acabou de fechar (só espaços depois)
+        self.boundary: Optional[int] = None
+
+    def add(self, text: str, stack: List[_Group]) -> None:
+        if not self.parts and text.isspace():
+            return
+        if not text.isspace():
+            self.boundary = None
+        self.parts.append(text)
+        for group in stack:
+            if group not in self.groups:
+                self.groups.append(group)
+
+    def close(self, prompt: str, start: int, end: int) -> "_PendingToken":
+        while start < end and prompt[start].isspace():
+            start += 1
+        while end > start and prompt[end - 1].isspace():
+            end -= 1
+        self.start = start
+        self.end = end
+        return self
+
+    def ready(self) -> bool:
+        return all(group.closed for group in self.groups)
+
+    def build(self) -> Optional[PromptToken]:
+        text = "".join(self.parts).strip()
+        if not text:
+            return None
+        weight = 1.0
+        for group in self.groups:
+            weight *= group.multiplier
+        return PromptToken(text, self.start, self.end, len(self.groups), round(weight, 4))
+
+
+def tokenize_prompt(prompt: str, start: int = 0) -> Iterator[PromptToken]:
+    """
+    Gera as tags de ``prompt`` sob demanda, em tempo linear.
+
+    Vírgulas separam tags, exceto quando escapadas (``\\,``). Parênteses,
+    colchetes e chaves aninhados definem o peso (``(x)`` = 1.1, ``[x]`` =
+    1/1.1, ``{x}`` = 1.05, ``(x:1.3)`` = 1.3) e são removidos do texto, assim
+    como vírgulas dentro de um grupo separam tags que herdam o peso do grupo.
+    Grupos vizinhos no mesmo nível (``((a)(b))``) também são tags separadas.
+    Caracteres escapados (``\\(``) e fechamentos sem abertura ficam no texto.
+    Tags dentro de um grupo só são emitidas quando o grupo fecha, pois o peso
+    explícito aparece no final.
+
+    ``start`` permite continuar de uma vírgula fora de qualquer grupo (veja
+    ``is_top_level``); as posições continuam relativas a ``prompt``.
+    """
+    if _EMPHASIS_OR_ESCAPE.search(prompt, start) is None:
+        # Caso comum: só vírgulas, sem necessidade de acompanhar grupos
+        yield from _tokenize_plain(prompt, start)
+        return
+
+    stack: List[_Group] = []
+    finished: List[_PendingToken] = []
+    current = _PendingToken()
+    position = segment_start = start
+    length = len(prompt)
+
+    def flush_ready() -> Iterator[PromptToken]:
+        emitted = 0
+        for pending in finished:
+            if not pending.ready():
+                break
+            emitted += 1
+            token = pending.build()
+            if token is not None:
+                yield token
+        if emitted:
+            del finished[:emitted]
+
+    while position < length:
+        match = _SPECIAL.search(prompt, position)
+        if not stack and not current.parts and (match is None or match.group() == ","):
+            # Tag sem ênfase no nível externo: emitida direto, sem acompanhar grupos
+            end = length if match is None else match.start()
+            token = _plain_token(prompt, segment_start, end)
+            if token is not None:
+                yield token
+            position = segment_start = end + 1
+            continue
+        if match is None:
+            current.add(prompt[position:], stack)
+            break
+
+        index = match.start()
+        if index > position:
+            current.add(prompt[position:index], stack)
+        char = prompt[index]
+
+        if char == "\\":
+            # Mantém o escape no texto para que a tag continue válida no prompt
+            current.add(prompt[index:index + 2], stack)
+            position = index + 2
+            continue
+
+        if char == ",":
+            finished.append(current.close(prompt, segment_start, index))
+            current = _PendingToken()
+            segment_start = index + 1
+            if not stack:
+                yield from flush_ready()
+        elif char in _CLOSERS:
+            if current.boundary == len(stack):
+                # Grupo logo após outro do mesmo nível: começa outra tag
+                finished.append(current.close(prompt, segment_start, index))
+                current = _PendingToken()
+                segment_start = index
+                if not stack:
+                    yield from flush_ready()
+            stack.append(_Group(char))
+        elif stack and char == stack[-1].closer:
+            group = stack.pop()
+            if char == ")" and current.parts:
+                weight, trimmed = _split_explicit_weight(current.parts[-1])
+                if weight is not None:
+                    group.multiplier = weight
+                    current.parts[-1] = trimmed
+            group.closed = True
+            if current.parts:
+                current.boundary = len(stack)
+            if not stack:
+                yield from flush_ready()
+        else:
+            # Fechamento sem abertura correspondente: literal
+            current.add(char, stack)
+        position = index + 1
+
+    # Grupos não fechados valem com o multiplicador padrão
+    for group in stack:
+        group.closed = True
+    finished.append(current.close(prompt, segment_start, length))
+    yield from flush_ready()
+
+
+def tag_texts(prompt: str) -> List[str]:
+    """
+    Só o texto das tags de ``prompt``, como em ``tokenize_prompt``.
+
+    Sem ênfases ou escapes nenhum ``PromptToken`` é montado: as tags saem
+    direto de ``str.split``, o que basta para classificar.
+    """
+    if _EMPHASIS_OR_ESCAPE.search(prompt) is None:
+        return [text for text in map(str.strip, prompt.split(",")) if text]
+    return [token.text for token in tokenize_prompt(prompt)]
+
+
+def is_top_level(prompt: str, token: PromptToken) -> bool:
+    """
+    Verdadeiro se a vírgula após ``token`` fica fora de qualquer grupo.
+
+    Vale para tags sem ênfase cujo trecho não abre grupos; nesse caso tudo
+    até essa vírgula já está decidido e a tokenização pode recomeçar dali.
+    """
+    return token.depth == 0 and _EMPHASIS_OR_ESCAPE.search(prompt, token.start, token.end) is None
+
+
+def _tokenize_plain(prompt: str, start: int = 0) -> Iterator[PromptToken]:
+    for segment in prompt[start:].split(","):
+        text = segment.strip()
+        if text:
+            offset = start + segment.index(text[0])
+            yield PromptToken(text, offset, offset + len(text), 0, 1.0)
+        start += len(segment) + 1
+
+
+def _plain_token(prompt: str, start: int, end: int) -> Optional[PromptToken]:
+    text = prompt[start:end].strip()
+    if not text:
+        return None
+    offset = prompt.index(text[0], start)
+    return PromptToken(text, offset, offset + len(text), 0, 1.0)
+
+
+def _split_explicit_weight(text: str) -> Tuple[Optional[float], str]:
+    match = _EXPLICIT_WEIGHT.search(text)
+    if match is None:
+        return None, text
+    return float(match.group(1)), text[:match.start()]
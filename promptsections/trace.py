@@ -0,0 +1,96 @@
+"""Registros compactos do detalhamento da classificação (uma entrada por tag)."""
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+# Códigos de motivo -> mensagem exibida; ``{detail}`` recebe a palavra-chave encontrada
+REASON_MESSAGES: Dict[str, str] = {
+    "style_author": "Autor detectado em sequência de estilo",
+    "style_tag": "Tag identificada como estilo",
+    "quality": "Indicador de qualidade ({detail})",
+    "background": "Cenário detectado ({detail})",
+    "character_identifier": "Identificador de personagem",
+    "named_character": "Personagem nomeado detectado",
+    "physical_trait": "Característica física permanente",
+    "clothing": "Item de vestuário detectado",
+    "pose": "Pose detectada",
+    "action": "Ação/pose detectada",
+    "short_description": "Descrição curta atribuída ao personagem",
+    "custom_rule": "Regra customizada",
+    "custom_pattern": "Regra customizada por padrão ({detail})",
+    "no_rule": "Sem regra aplicada",
+}
+
+TRACE_KEYS = ("tag", "categoria", "motivo")
+
+
+def reason_message(reason: str, detail: str = "") -> str:
+    """Mensagem legível de um código de motivo."""
+    template = REASON_MESSAGES[reason]
+    return template.format(detail=detail) if detail else template
+
+
+class TraceRecord(Mapping):
+    """
+    Decisão tomada para uma tag, com ``__slots__`` em vez de um dict por tag.
+
+    Guarda só o código do motivo; a mensagem é montada quando lida. Continua
+    se comportando como ``{"tag", "categoria", "motivo"}`` (``item["tag"]``,
+    ``dict(item)``, comparação com dicts), então a interface não muda.
+    """
+
+    __slots__ = ("tag", "categoria", "reason", "detail")
+
+    def __init__(self, tag: str, categoria: str, reason: str, detail: str = "") -> None:
+        self.tag = tag
+        self.categoria = categoria
+        self.reason = reason
+        self.detail = detail
+
+    @property
+    def motivo(self) -> str:
+        return reason_message(self.reason, self.detail)
+
+    def __getitem__(self, key: str) -> str:
+        if key not in TRACE_KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(TRACE_KEYS)
+
+    def __len__(self) -> int:
+        return len(TRACE_KEYS)
+
+    def __reduce__(self):
+        return TraceRecord, (self.tag, self.categoria, self.reason, self.detail)
+
+    def __repr__(self) -> str:
+        return f"TraceRecord({self.tag!r}, {self.categoria!r}, {self.reason!r}, {self.detail!r})"
+
+    def as_dict(self) -> Dict[str, str]:
+        return {"tag": self.tag, "categoria": self.categoria, "motivo": self.motivo}
+
+
+def page_trace(
+    trace: Sequence[Mapping],
+    offset: int = 0,
+    limit: int = 50,
+    search: str = "",
+    category: str = "",
+) -> Tuple[int, List[Mapping]]:
+    """
+    Retorna (total filtrado, página) do detalhamento, na ordem do prompt.
+
+    ``search`` filtra por trecho da tag (sem diferenciar maiúsculas) e
+    ``category`` pela categoria exata; vazios não filtram.
+    """
+    needle = search.strip().lower()
+    if not needle and not category:
+        return len(trace), list(trace[offset:offset + limit])
+    matches = [
+        item
+        for item in trace
+        if (not category or item["categoria"] == category)
+        and (not needle or needle in item["tag"].lower())
+    ]
+    return len(matches), matches[offset:offset + limit]
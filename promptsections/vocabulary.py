@@ -0,0 +1,308 @@
+"""
+Classificação de corpora por vocabulário: cada tag distinta é decidida uma vez.
+
+As tags viram ids inteiros e cada id guarda a decisão para os dois estados da
+seção de personagem. O estado antes de cada tag sai da transição que a tag
+anterior provoca (manter, ligar, desligar ou inverter), então um bloco de
+prompts inteiro é resolvido com buscas em tabela. Com NumPy instalado esse
+cálculo é vetorizado; sem ele, o mesmo algoritmo roda em Python puro.
+"""
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from promptsections.classifier import (
+    CATEGORY_OPTIONS,
+    RuleSet,
+    TagVerdict,
+    get_rule_set,
+)
+from promptsections.tokenizer import tag_texts
+from promptsections.trace import TraceRecord
+
+try:
+    import numpy as np
+except ImportError:  # NumPy é opcional
+    np = None
+
+DEFAULT_BLOCK_SIZE = 4096
+DEFAULT_MAX_TAGS = 1_000_000
+
+# Transição do estado da seção de personagem provocada por uma tag
+KEEP, CLEAR, SET, FLIP = range(4)
+CATEGORY_CODES = {category: code for code, category in enumerate(CATEGORY_OPTIONS)}
+_STYLE_CODE = CATEGORY_CODES["Estilo"]
+_BACKGROUND_CODE = CATEGORY_CODES["Background"]
+_SLOTS = len(CATEGORY_OPTIONS)
+
+ParseResult = Tuple[Dict[str, List[str]], List[TraceRecord]]
+
+
+def _transition(off: TagVerdict, on: TagVerdict) -> int:
+    after_off, after_on = off[3], on[3]
+    if after_off == after_on:
+        return SET if after_on else CLEAR
+    return KEEP if after_on else FLIP
+
+
+class TagTable:
+    """
+    Vocabulário de tags distintas com a decisão de cada uma por estado.
+
+    ``verdicts[id]`` é ``(decisão fora da seção, decisão dentro da seção)``;
+    ``transitions[id]`` resume como a tag muda o estado. Pares de estilo são
+    verificados só quando a segunda tag contém "style", uma vez por par de ids.
+    """
+
+    def __init__(self, rules: Optional[RuleSet] = None, use_numpy: Optional[bool] = None) -> None:
+        self.rules = rules or get_rule_set()
+        self.use_numpy = np is not None if use_numpy is None else use_numpy and np is not None
+        self.ids: Dict[str, int] = {}
+        self.texts: List[str] = []
+        self.verdicts: List[Tuple[TagVerdict, TagVerdict]] = []
+        self.transitions: List[int] = []
+        self.codes: List[Tuple[int, int]] = []
+        self.style_candidates: List[bool] = []
+        self._pairs: Dict[Tuple[int, int], bool] = {}
+        # Cópias em NumPy das listas acima, com folga para crescer sem recopiar tudo
+        self._arrays: Dict[str, "np.ndarray"] = {}
+        self._synced = 0
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def tag_id(self, tag: str) -> int:
+        """Id de ``tag``, decidindo-a na primeira vez em que aparece."""
+        tag_id = self.ids.get(tag)
+        if tag_id is None:
+            tag_id = self.ids[tag] = len(self.texts)
+            decide = self.rules.decide_tag
+            off, on = decide(tag, False), decide(tag, True)
+            self.texts.append(tag)
+            self.verdicts.append((off, on))
+            self.transitions.append(_transition(off, on))
+            self.codes.append((CATEGORY_CODES[off[0]], CATEGORY_CODES[on[0]]))
+            self.style_candidates.append("style" in tag.lower())
+        return tag_id
+
+    def classify_many(self, prompts: Sequence[str], trace: bool = False) -> List[ParseResult]:
+        """Mesmo resultado de ``parse_prompt`` para cada prompt, em uma passada pelo bloco."""
+        ids: List[int] = []
+        starts: List[int] = []
+        get = self.ids.get
+        for prompt in prompts:
+            tags = tag_texts(prompt)
+            encoded = [get(tag, -1) for tag in tags]
+            if -1 in encoded:
+                encoded = [self.tag_id(tag) for tag in tags]
+            starts.append(len(ids))
+            ids.extend(encoded)
+        bounds = starts[1:] + [len(ids)]
+
+        if self.use_numpy and ids:
+            return self._classify_numpy(ids, starts, bounds, trace)
+
+        candidates = self.style_candidates
+        first = set(starts)
+        style = self._style_roles(
+            ids,
+            [
+                position
+                for position, tag_id in enumerate(ids)
+                if candidates[tag_id] and position not in first
+            ],
+        )
+        states = self._states_python(ids, starts, bounds, style)
+        return [
+            self._assemble(ids, states, style, start, end, trace)
+            for start, end in zip(starts, bounds)
+        ]
+
+    def _classify_numpy(
+        self, ids: List[int], starts: List[int], bounds: List[int], trace: bool
+    ) -> List[ParseResult]:
+        arrays = self._numpy_tables()
+        size = len(ids)
+        tag_ids = np.fromiter(ids, dtype=np.int64, count=size)
+        # Prompts vazios no fim do bloco começam depois da última posição
+        first = np.asarray(starts, dtype=np.int64)
+        first = first[first < size]
+
+        is_candidate = arrays["candidates"][tag_ids]
+        is_candidate[first] = False
+        style = self._style_roles(ids, np.flatnonzero(is_candidate).tolist())
+        states = self._states_numpy(tag_ids, arrays["transitions"], first, style)
+        if trace:
+            state_list = states.tolist()
+            return [
+                self._assemble(ids, state_list, style, start, end, trace)
+                for start, end in zip(starts, bounds)
+            ]
+
+        # Categoria de cada ocorrência; as tags são agrupadas por (prompt, categoria)
+        # com uma ordenação estável, e cada lista do resultado vira uma fatia
+        codes = arrays["codes"][tag_ids, states.astype(np.int64)]
+        if style:
+            codes[np.fromiter(style, dtype=np.int64, count=len(style))] = _STYLE_CODE
+        lengths = np.asarray(bounds, dtype=np.int64) - np.asarray(starts, dtype=np.int64)
+        keys = np.repeat(np.arange(len(starts), dtype=np.int64) * _SLOTS, lengths) + codes
+        order = np.argsort(keys, kind="stable")
+        ordered = arrays["texts"][tag_ids[order]].tolist()
+        offsets = np.zeros(len(starts) * _SLOTS + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys, minlength=len(starts) * _SLOTS), out=offsets[1:])
+        offsets_list = offsets.tolist()
+
+        results: List[ParseResult] = []
+        for base in range(0, len(starts) * _SLOTS, _SLOTS):
+            categorized = {
+                category: ordered[offsets_list[base + code]:offsets_list[base + code + 1]]
+                for code, category in enumerate(CATEGORY_OPTIONS)
+            }
+            if categorized["Background"]:
+                categorized["Background"] = ["((simple background))"]
+            results.append((categorized, []))
+        return results
+
+    def _style_roles(self, ids: List[int], candidates: List[int]) -> Dict[int, str]:
+        """
+        Posições em pares autor + estilo, escolhidos da esquerda para a direita.
+
+        ``candidates`` são as posições (fora do início de um prompt) cuja tag
+        contém "style"; o par é com a tag anterior, se ela não já foi usada.
+        """
+        pairs = self._pairs
+        texts = self.texts
+        is_pair = self.rules.compiled.style.is_pair
+        roles: Dict[int, str] = {}
+        taken = -1
+        for position in candidates:
+            if position - 1 == taken:
+                continue
+            key = (ids[position - 1], ids[position])
+            matched = pairs.get(key)
+            if matched is None:
+                matched = pairs[key] = is_pair(texts[key[0]], texts[key[1]])
+            if matched:
+                roles[position - 1] = "style_author"
+                roles[position] = "style_tag"
+                taken = position
+        return roles
+
+    def _states_python(
+        self, ids: List[int], starts: List[int], bounds: List[int], style: Dict[int, str]
+    ) -> List[bool]:
+        verdicts = self.verdicts
+        states = [False] * len(ids)
+        for start, end in zip(starts, bounds):
+            state = False
+            for position in range(start, end):
+                states[position] = state
+                if position not in style:
+                    state = verdicts[ids[position]][state][3]
+        return states
+
+    @staticmethod
+    def _states_numpy(
+        tag_ids: "np.ndarray", transitions: "np.ndarray", first: "np.ndarray", style: Dict[int, str]
+    ) -> "np.ndarray":
+        size = len(tag_ids)
+        # Transição que leva ao estado *antes* de cada posição: a da tag anterior,
+        # ou "desligar" no início de cada prompt
+        incoming = np.empty(size, dtype=np.int8)
+        incoming[0] = CLEAR
+        incoming[1:] = transitions[tag_ids[:-1]]
+        if style:
+            following = np.fromiter(style, dtype=np.int64, count=len(style)) + 1
+            incoming[following[following < size]] = KEEP
+        incoming[first] = CLEAR
+
+        # Estado = valor da última transição fixa, invertido a cada FLIP desde então
+        fixed = (incoming == CLEAR) | (incoming == SET)
+        last_fixed = np.maximum.accumulate(np.where(fixed, np.arange(size), 0))
+        flips = np.cumsum(incoming == FLIP)
+        parity = ((flips - flips[last_fixed]) & 1).astype(bool)
+        return (incoming[last_fixed] == SET) ^ parity
+
+    def _numpy_tables(self) -> Dict[str, "np.ndarray"]:
+        """Tabelas em NumPy, estendidas só com as tags novas desde a última chamada."""
+        total = len(self.texts)
+        arrays = self._arrays
+        if not arrays or len(arrays["transitions"]) < total:
+            capacity = max(1024, 2 * total)
+            grown = {
+                "transitions": np.zeros(capacity, dtype=np.int8),
+                "candidates": np.zeros(capacity, dtype=bool),
+                "codes": np.zeros((capacity, 2), dtype=np.int8),
+                "texts": np.empty(capacity, dtype=object),
+            }
+            for name, array in arrays.items():
+                grown[name][:self._synced] = array[:self._synced]
+            arrays = self._arrays = grown
+        synced = self._synced
+        if synced < total:
+            arrays["transitions"][synced:total] = self.transitions[synced:]
+            arrays["candidates"][synced:total] = self.style_candidates[synced:]
+            arrays["codes"][synced:total] = self.codes[synced:]
+            arrays["texts"][synced:total] = self.texts[synced:]
+            self._synced = total
+        return arrays
+
+    def _assemble(
+        self,
+        ids: List[int],
+        states: List[bool],
+        style: Dict[int, str],
+        start: int,
+        end: int,
+        trace: bool,
+    ) -> ParseResult:
+        categorized: Dict[str, List[str]] = {category: [] for category in CATEGORY_OPTIONS}
+        details: List[TraceRecord] = []
+        texts = self.texts
+        verdicts = self.verdicts
+        background_detected = False
+        for position in range(start, end):
+            tag = texts[ids[position]]
+            role = style.get(position) if style else None
+            if role is not None:
+                categorized["Estilo"].append(tag)
+                if trace:
+                    details.append(TraceRecord(tag, "Estilo", role))
+                continue
+            category, reason, detail, _ = verdicts[ids[position]][states[position]]
+            if category == "Background":
+                background_detected = True
+            else:
+                categorized[category].append(tag)
+            if trace:
+                details.append(TraceRecord(tag, category, reason, detail))
+        if background_detected:
+            categorized["Background"] = ["((simple background))"]
+        return categorized, details
+
+
+def classify_corpus(
+    prompts: Iterable[str],
+    rules: Optional[RuleSet] = None,
+    trace: bool = False,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    table: Optional[TagTable] = None,
+    max_tags: int = DEFAULT_MAX_TAGS,
+) -> Iterator[ParseResult]:
+    """
+    Classifica ``prompts`` em blocos de ``block_size`` com um vocabulário
+    compartilhado; gera o mesmo que ``parse_prompt`` para cada um, na ordem.
+
+    Passando de ``max_tags`` tags distintas, o vocabulário recomeça vazio,
+    o que limita a memória em corpora com cauda longa de tags.
+    """
+    if table is None:
+        table = TagTable(rules)
+    block: List[str] = []
+    for prompt in prompts:
+        block.append(prompt)
+        if len(block) >= block_size:
+            yield from table.classify_many(block, trace)
+            block = []
+            if len(table) > max_tags:
+                table = TagTable(table.rules, table.use_numpy)
+    if block:
+        yield from table.classify_many(block, trace)
@@ -0,0 +1,137 @@
+"""Recarga automática da configuração e das regras customizadas alteradas em disco."""
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Mapping, Optional, Tuple
+
+from promptsections import classifier
+from promptsections.config import CONFIG_PATH, CUSTOM_RULES_STORAGE_PATH, DEFAULT_CUSTOM_RULES_PATH
+from promptsections.rules import add_write_listener, read_rules_file
+
+# (mtime_ns, tamanho, inode) ou None quando o arquivo não existe
+FileSignature = Optional[Tuple[int, int, int]]
+
+
+def file_signature(path: Path) -> FileSignature:
+    """Assinatura barata de um arquivo, obtida só com ``stat``."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+class RulesWatcher:
+    """
+    Observa os arquivos de regras por ``stat`` e troca o ``RuleSet`` ativo quando mudam.
+
+    Enquanto as assinaturas não mudam nada é lido. Quando mudam, o novo
+    conjunto é montado fora de qualquer lock e ativado com uma única troca de
+    referência: classificações em andamento terminam com o conjunto anterior.
+    Gravações do próprio processo que o conjunto ativo já reflete não
+    provocam recarga.
+    """
+
+    def __init__(
+        self,
+        config_path: Path = CONFIG_PATH,
+        rules_path: Path = CUSTOM_RULES_STORAGE_PATH,
+        default_rules_path: Path = DEFAULT_CUSTOM_RULES_PATH,
+        min_interval: float = 1.0,
+    ) -> None:
+        self.config_path = config_path
+        self.rules_path = rules_path
+        self.default_rules_path = default_rules_path
+        self.min_interval = min_interval
+        self.reloads = 0
+        self._signature = self._current_signature()
+        self._last_check = time.monotonic()
+        self._check_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        add_write_listener(self._own_write)
+
+    def _current_signature(self) -> Tuple[FileSignature, ...]:
+        return (
+            file_signature(self.config_path),
+            file_signature(self.rules_path),
+            file_signature(self.default_rules_path),
+        )
+
+    def _active_rules_path(self) -> Path:
+        return self.rules_path if self.rules_path.exists() else self.default_rules_path
+
+    def _own_write(self, path: Path, rules: Mapping[str, str]) -> None:
+        """Registra a assinatura da gravação deste processo (arquivo ainda travado)."""
+        if path != self.rules_path or rules != classifier.get_rule_set().custom_rules_raw:
+            # Outro arquivo, ou a gravação juntou edições de outro processo: a
+            # próxima verificação recarrega normalmente
+            return
+        written = file_signature(path)
+        paths = (self.config_path, self.rules_path, self.default_rules_path)
+        with self._check_lock:
+            self._signature = tuple(
+                written if watched == path else signature
+                for watched, signature in zip(paths, self._signature)
+            )
+
+    def check(self) -> bool:
+        """Verifica os arquivos agora; retorna True se o conjunto ativo foi trocado."""
+        # Outra thread já está verificando: não há por que esperar por ela
+        if not self._check_lock.acquire(blocking=False):
+            return False
+        try:
+            self._last_check = time.monotonic()
+            signature = self._current_signature()
+            if signature == self._signature:
+                return False
+
+            active = classifier.get_rule_set()
+            try:
+                # Leitura estrita: um JSON pela metade não pode virar "nenhuma regra"
+                raw_rules = read_rules_file(self._active_rules_path())
+                if signature[0] == self._signature[0]:
+                    compiled = active.compiled
+                else:
+                    compiled = classifier.compile_config(self.config_path)
+            except (OSError, ValueError):
+                # Arquivo em escrita ou inválido: mantém o conjunto atual e tenta de novo
+                return False
+            self._signature = signature
+
+            if compiled is active.compiled and raw_rules == active.custom_rules_raw:
+                # Normalmente a própria gravação deste processo
+                return False
+
+            classifier.set_rule_set(classifier.RuleSet(compiled, raw_rules))
+            self.reloads += 1
+            return True
+        finally:
+            self._check_lock.release()
+
+    def maybe_reload(self) -> bool:
+        """Como ``check``, mas no máximo uma vez a cada ``min_interval`` segundos."""
+        if time.monotonic() - self._last_check < self.min_interval:
+            return False
+        return self.check()
+
+    def start(self, interval: Optional[float] = None) -> None:
+        """Verifica periodicamente em uma thread daemon."""
+        if self._thread is not None:
+            return
+        period = interval if interval is not None else self.min_interval
+        self._stop.clear()
+
+        def run() -> None:
+            while not self._stop.wait(period):
+                self.check()
+
+        self._thread = threading.Thread(target=run, name="prompt-rules-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,66 @@
+import json
+import random
+
+from promptsections.analytics import SpaceSaving, UnmatchedReport, unmatched_tags
+from promptsections.classifier import parse_prompt
+from promptsections.cli import main
+
+
+def test_unmatched_tags_are_unique_and_ordered():
+    _, trace = parse_prompt("masterpiece, tsinne, space pirate, tsinne, beach")
+
+    assert unmatched_tags(trace) == ["tsinne", "space pirate"]
+
+
+def test_space_saving_is_exact_below_capacity():
+    counter = SpaceSaving(capacity=10)
+    for item in ["a", "b", "a", "c", "a", "b"]:
+        counter.add(item)
+
+    assert counter.top(2) == [("a", 3, 0), ("b", 2, 0)]
+    assert counter.total == 6
+
+
+def test_space_saving_keeps_heavy_hitters_with_bounded_memory():
+    rng = random.Random(3)
+    counter = SpaceSaving(capacity=50)
+    stream = [f"raro {rng.randrange(100000)}" for _ in range(20000)]
+    stream += ["frequente"] * 3000 + ["comum"] * 1500
+    rng.shuffle(stream)
+    for item in stream:
+        counter.add(item)
+
+    top = counter.top(2)
+    assert [item for item, _, _ in top] == ["frequente", "comum"]
+    for item, estimate, error in top:
+        true_count = stream.count(item)
+        assert true_count <= estimate <= true_count + error
+    assert len(counter) <= 100
+
+
+def test_unmatched_cli_writes_report_and_rules_template(tmp_path):
+    source = tmp_path / "prompts.txt"
+    source.write_text("tsinne, masterpiece\nTsinne, space pirate\nspace pirate, tsinne\n", encoding="utf-8")
+    report_path = tmp_path / "report.json"
+    template_path = tmp_path / "rules.json"
+
+    assert main(
+        ["unmatched", str(source), str(report_path), "--top", "1", "--rules-template", str(template_path)]
+    ) == 0
+
+    report = json.loads(report_path.read_text(encoding="utf-8"))
+    assert report["prompts"] == 3
+    assert report["top"] == [{"tag": "tsinne", "count": 3, "error": 0}]
+    assert json.loads(template_path.read_text(encoding="utf-8"))["tsinne"] == "Restante do Prompt"
+
+
+def test_report_accumulates_prompts_incrementally():
+    report = UnmatchedReport().add_prompts(["space pirate", "space pirate, tsinne"])
+
+    assert report.to_dict()["top"][0] == {"tag": "space pirate", "count": 2, "error": 0}
+
+
+def test_report_counts_spellings_of_a_tag_together():
+    report = UnmatchedReport().add_prompts(["space_pirate, Space Pirate", "(space-pirate:1.2)"])
+
+    assert report.to_dict()["top"] == [{"tag": "space pirate", "count": 3, "error": 0}]
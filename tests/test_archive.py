@@ -0,0 +1,44 @@
+from promptsections.archive import PromptArchive
+from promptsections.classifier import get_rule_set
+from promptsections.cli import main
+
+
+def test_archive_indexes_tags_and_deduplicates_prompts(tmp_path):
+    archive = PromptArchive(tmp_path / "archive.sqlite")
+
+    first, second = archive.add_many(["1girl, Space Pirate, beach", "masterpiece, (space pirate:1.2)"])
+
+    assert archive.add("1girl, Space Pirate, beach") == first
+    assert archive.count() == 2
+    assert archive.prompts_with_tags(["SPACE PIRATE"]) == [first, second]
+    assert archive.prompts_with_tags(["beach"]) == [first]
+    assert archive.get(second)["formatted"] == "masterpiece\n\nspace pirate"
+
+
+def test_rule_change_rewrites_only_prompts_with_the_tag(tmp_path):
+    rules = get_rule_set()
+    archive = PromptArchive(tmp_path / "archive.sqlite")
+    pirate, other = archive.add_many(["masterpiece, space pirate", "masterpiece, beach"], rules)
+    untouched = archive.get(other)
+
+    changed = rules.with_rule_changes({"Space Pirate": "Pose"})
+    assert archive.reclassify_changes(rules, changed) == 1
+
+    assert archive.get(pirate)["categorized"]["Pose"] == ["space pirate"]
+    assert archive.get(pirate)["rules_version"] == changed.version
+    assert archive.get(other) == untouched
+    assert archive.remove(other) is True
+    assert archive.prompts_with_tags(["beach"]) == []
+
+
+def test_archive_cli_adds_and_reclassifies(tmp_path, capsys):
+    source = tmp_path / "prompts.txt"
+    source.write_text("1girl, bikini\nmasterpiece\n", encoding="utf-8")
+    path = tmp_path / "archive.sqlite"
+
+    assert main(["archive", "--path", str(path), "add", str(source)]) == 0
+    assert main(["archive", "--path", str(path), "reclassify", "--tag", "bikini"]) == 0
+
+    output = capsys.readouterr().err
+    assert "2 prompts arquivados" in output
+    assert "1 prompts reclassificados" in output
@@ -0,0 +1,96 @@
+import json
+import os
+import pickle
+
+import pytest
+
+from promptsections.artifact import compile_rules, read_artifact
+from promptsections.classifier import load_rule_set, parse_prompt
+from promptsections.cli import main
+
+PROMPT = "masterpiece, 1girl, red hair, bikini, standing, beach, oekaki"
+
+
+@pytest.fixture
+def sources(tmp_path):
+    config_path = tmp_path / "prompt_config.json"
+    config_path.write_text(
+        json.dumps({"quality_terms": ["masterpiece"], "clothing_keywords": ["bikini"]}),
+        encoding="utf-8",
+    )
+    rules_path = tmp_path / "custom_rules.json"
+    rules_path.write_text(json.dumps({"Oekaki": "Estilo"}), encoding="utf-8")
+    return config_path, rules_path, tmp_path / "rules.psrules"
+
+
+def rewrite(path, content):
+    stat = os.stat(path)
+    path.write_text(content, encoding="utf-8")
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_artifact_rule_set_matches_sources(sources):
+    config_path, rules_path, artifact_path = sources
+    meta = compile_rules(artifact_path, config_path, rules_path)
+
+    rules = load_rule_set(config_path, rules_path, artifact_path)
+    rebuilt = load_rule_set(config_path, rules_path, artifact_path=None)
+
+    assert rules.compiled is read_artifact(artifact_path).compiled
+    assert rules.version == rebuilt.version == meta["rules_version"]
+    assert parse_prompt(PROMPT, rules=rules) == parse_prompt(PROMPT, rules=rebuilt)
+    assert parse_prompt(PROMPT, rules=rules)[0]["Estilo"] == ["oekaki"]
+
+
+def test_changed_custom_rules_reuse_compiled_config(sources):
+    config_path, rules_path, artifact_path = sources
+    compile_rules(artifact_path, config_path, rules_path)
+    before = load_rule_set(config_path, rules_path, artifact_path)
+
+    rewrite(rules_path, json.dumps({"oekaki": "Pose"}))
+    after = load_rule_set(config_path, rules_path, artifact_path)
+
+    assert after.compiled is before.compiled
+    assert after.changed_tags(before) == {"oekaki"}
+    assert parse_prompt("oekaki", rules=after)[0]["Pose"] == ["oekaki"]
+
+
+def test_changed_config_falls_back_to_rebuild(sources):
+    config_path, rules_path, artifact_path = sources
+    compile_rules(artifact_path, config_path, rules_path)
+
+    rewrite(config_path, json.dumps({"quality_terms": ["best quality"]}))
+    rules = load_rule_set(config_path, rules_path, artifact_path)
+
+    assert rules.compiled is not read_artifact(artifact_path).compiled
+    assert parse_prompt("best quality", rules=rules)[0]["Qualidade"] == ["best quality"]
+
+
+def test_invalid_artifact_is_ignored(sources):
+    config_path, rules_path, artifact_path = sources
+    artifact_path.write_bytes(b"PSRULES\x00corrompido")
+
+    assert read_artifact(artifact_path) is None
+    assert read_artifact(artifact_path.with_name("ausente.psrules")) is None
+    rules = load_rule_set(config_path, rules_path, artifact_path)
+    assert parse_prompt("masterpiece", rules=rules)[0]["Qualidade"] == ["masterpiece"]
+
+
+def test_pickled_rule_set_is_restored_compiled(sources):
+    config_path, rules_path, _ = sources
+    rules = load_rule_set(config_path, rules_path, artifact_path=None)
+
+    restored = pickle.loads(pickle.dumps(rules))
+
+    assert restored.version == rules.version
+    assert parse_prompt(PROMPT, rules=restored) == parse_prompt(PROMPT, rules=rules)
+
+
+def test_compile_rules_cli(sources):
+    config_path, rules_path, artifact_path = sources
+
+    assert main(
+        ["compile-rules", str(artifact_path), "--config", str(config_path), "--rules", str(rules_path)]
+    ) == 0
+
+    assert read_artifact(artifact_path).meta["custom_rules"] == 1
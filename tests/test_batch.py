@@ -0,0 +1,127 @@
+import json
+
+from promptsections import batch, parallel
+from promptsections.classifier import get_rule_set, set_rule_set
+from promptsections.cli import main
+
+
+def test_iter_records_reads_jsonl_strings_objects_and_errors():
+    lines = [
+        '"1girl, solo"\n',
+        '{"id": 7, "prompt": "masterpiece"}\n',
+        "\n",
+        "{not json\n",
+        '{"text": "sem campo"}\n',
+    ]
+    records = list(batch.iter_records(lines, "jsonl"))
+
+    assert records[0] == {"line": 1, "prompt": "1girl, solo"}
+    assert records[1] == {"line": 2, "prompt": "masterpiece", "id": 7}
+    assert records[2]["line"] == 4 and "error" in records[2]
+    assert records[3]["line"] == 5 and "error" in records[3]
+
+
+def test_classify_file_streams_text_input_to_jsonl(tmp_path):
+    source = tmp_path / "captions.txt"
+    source.write_text("1girl, masterpiece\n\nthighhighs, boots\n", encoding="utf-8")
+    target = tmp_path / "out.jsonl"
+
+    classified, errors = batch.classify_file(str(source), str(target), include_trace=True)
+
+    assert (classified, errors) == (2, 0)
+    results = [json.loads(line) for line in target.read_text(encoding="utf-8").splitlines()]
+    assert [result["line"] for result in results] == [1, 3]
+    assert results[0]["categorized"]["Qualidade"] == ["masterpiece"]
+    assert results[1]["formatted"] == "thighhighs, boots"
+    assert results[1]["trace"][0]["categoria"] == "Roupas"
+
+
+def test_cli_classify_jsonl(tmp_path):
+    source = tmp_path / "prompts.jsonl"
+    source.write_text('{"id": "a", "caption": "1girl, outdoors"}\n', encoding="utf-8")
+    target = tmp_path / "out.jsonl"
+
+    exit_code = main(["classify", str(source), str(target), "--field", "caption"])
+
+    assert exit_code == 0
+    result = json.loads(target.read_text(encoding="utf-8"))
+    assert result["id"] == "a"
+    assert result["categorized"]["Background"] == ["((simple background))"]
+    assert "trace" not in result
+
+
+def test_parallel_classification_preserves_input_order(tmp_path):
+    prompts = [f"1girl, tag{index}, masterpiece" for index in range(50)]
+    source = tmp_path / "prompts.txt"
+    source.write_text("\n".join(prompts), encoding="utf-8")
+    serial = tmp_path / "serial.jsonl"
+    parallel = tmp_path / "parallel.jsonl"
+
+    batch.classify_file(str(source), str(serial))
+    classified, _ = batch.classify_file(str(source), str(parallel), workers=2, chunk_size=7)
+
+    assert classified == 50
+    assert parallel.read_text(encoding="utf-8") == serial.read_text(encoding="utf-8")
+
+
+def test_worker_vocabulary_is_reset_past_max_tags():
+    rules = get_rule_set()
+    parallel._init_worker(rules, include_trace=False, vocabulary=True, max_tags=20)
+    try:
+        first_table = parallel._WORKER_STATE["table"]
+        sizes = []
+        for chunk_index in range(10):
+            chunk = [{"prompt": f"tag{chunk_index}_{index}, masterpiece"} for index in range(8)]
+            results = parallel._classify_chunk(chunk, include_trace=False)
+            assert len(results) == 8
+            sizes.append(len(parallel._WORKER_STATE["table"]))
+    finally:
+        set_rule_set(rules)
+        parallel._WORKER_STATE.clear()
+
+    assert max(sizes) <= 20
+    assert first_table is not None and len(first_table) > 20
+
+
+def test_mapped_ranges_split_file_on_line_boundaries(tmp_path):
+    source = tmp_path / "prompts.txt"
+    lines = [f"tag{index}, masterpiece" for index in range(40)]
+    lines[5] = ""
+    source.write_text("\n".join(lines), encoding="utf-8")
+
+    ranges = list(batch.mapped_ranges(str(source), chunk_size=6))
+    chunks = [list(batch.iter_mapped_lines(str(source), start, end)) for start, end, _ in ranges]
+
+    assert len(ranges) > 1
+    assert [first_line for _, _, first_line in ranges] == [
+        1 + sum(len(chunk) for chunk in chunks[:index]) for index in range(len(chunks))
+    ]
+    assert [line.rstrip("\n") for chunk in chunks for line in chunk] == lines
+
+
+def test_empty_file_has_no_mapped_lines(tmp_path):
+    empty = tmp_path / "vazio.txt"
+    empty.write_text("", encoding="utf-8")
+
+    assert list(batch.mapped_ranges(str(empty))) == []
+    assert list(batch.iter_mapped_lines(str(empty))) == []
+    assert batch.classify_file(str(empty), str(tmp_path / "out.jsonl")) == (0, 0)
+
+
+def test_parallel_jsonl_keeps_line_numbers_and_errors(tmp_path):
+    lines = [f'{{"id": {index}, "prompt": "1girl, tag{index}"}}' for index in range(30)]
+    lines[12] = "{not json"
+    lines[20] = ""
+    source = tmp_path / "prompts.jsonl"
+    source.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    serial = tmp_path / "serial.jsonl"
+    parallel = tmp_path / "parallel.jsonl"
+
+    batch.classify_file(str(source), str(serial))
+    classified, errors = batch.classify_file(str(source), str(parallel), workers=2, chunk_size=4)
+
+    assert (classified, errors) == (28, 1)
+    assert parallel.read_text(encoding="utf-8") == serial.read_text(encoding="utf-8")
+    results = [json.loads(line) for line in parallel.read_text(encoding="utf-8").splitlines()]
+    assert results[12]["line"] == 13 and "error" in results[12]
+    assert results[-1]["line"] == 30
@@ -0,0 +1,27 @@
+import json
+
+from benchmarks import run
+
+
+def test_synthetic_prompts_are_reproducible_and_weighted():
+    config = run.synthetic_config(5)
+    rules = run.synthetic_rules(10)
+    first = run.synthetic_prompts(20, 8, config, rules, emphasis_ratio=0.5, seed=3)
+
+    assert first == run.synthetic_prompts(20, 8, config, rules, emphasis_ratio=0.5, seed=3)
+    assert all(len(prompt.split(", ")) == 8 for prompt in first)
+    assert any(":1." in prompt or ":0.8)" in prompt for prompt in first)
+
+
+def test_benchmark_run_writes_comparable_report(tmp_path, capsys):
+    output = tmp_path / "bench.json"
+    args = ["--prompts", "20", "--tags", "5", "--keywords", "0", "--rules", "10"]
+
+    assert run.main(args + ["--output", str(output)]) == 0
+    report = json.loads(output.read_text(encoding="utf-8"))
+    names = {result["benchmark"] for result in report["results"]}
+    assert {"parse_prompt", "normalize_tag", "detect_style", "format_output", "custom_rule_save"} <= names
+    assert all("p99_us" in result for result in report["results"] if result["ops"] > 1)
+
+    assert run.main(args + ["--output", str(tmp_path / "novo.json"), "--compare", str(output)]) == 0
+    assert "vs base" in capsys.readouterr().out
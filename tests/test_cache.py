@@ -0,0 +1,45 @@
+from promptsections.cache import ResultCache, estimate_result_size
+from promptsections.classifier import get_rule_set
+
+
+def make_result(tag):
+    categorized = {"Personagem": [tag]}
+    trace = [{"tag": tag, "categoria": "Personagem", "motivo": "Identificador de personagem"}]
+    return categorized, trace, tag
+
+
+def test_result_cache_hits_misses_and_rule_version_keys():
+    cache = ResultCache()
+    key = cache.make_key("1girl", "v1")
+
+    assert cache.get(key) is None
+    cache.put(key, make_result("1girl"))
+    assert cache.get(key) == make_result("1girl")
+    assert cache.get(cache.make_key("1girl", "v2")) is None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 1)
+
+
+def test_result_cache_evicts_least_recently_used_by_size():
+    entry_size = estimate_result_size(make_result("a"))
+    cache = ResultCache(max_bytes=entry_size * 2)
+    keys = [cache.make_key(tag, "v") for tag in "abc"]
+
+    cache.put(keys[0], make_result("a"))
+    cache.put(keys[1], make_result("b"))
+    cache.get(keys[0])
+    cache.put(keys[2], make_result("c"))
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] <= cache.max_bytes
+
+
+def test_rules_version_changes_with_rules_only():
+    rules = get_rule_set()
+    base = rules.with_custom_rules({"oekaki": "Estilo", "cyberpunk": "Personagem"}).version
+
+    assert base == rules.with_custom_rules({"cyberpunk": "Personagem", "oekaki": "Estilo"}).version
+    assert base != rules.with_custom_rules({"oekaki": "Qualidade", "cyberpunk": "Personagem"}).version
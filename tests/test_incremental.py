@@ -0,0 +1,89 @@
+import random
+
+from promptsections.classifier import get_rule_set, parse_prompt
+from promptsections.incremental import IncrementalParse
+
+WORDS = [
+    "1girl",
+    "solo",
+    "blonde hair",
+    "blue eyes",
+    "bikini",
+    "arm up",
+    "masterpiece",
+    "beach",
+    "tsinne",
+    "reiq",
+    "reiq style",
+    "(bra:1.4)",
+    "medieval knight",
+    "Zero Two from Darling",
+]
+
+
+def test_update_matches_full_parse_after_random_edits():
+    rng = random.Random(7)
+    for _ in range(300):
+        tags = [rng.choice(WORDS) for _ in range(rng.randint(0, 15))]
+        parsed = IncrementalParse.parse(", ".join(tags))
+        for _ in range(3):
+            roll = rng.random()
+            if tags and roll < 0.4:
+                tags[rng.randrange(len(tags))] = rng.choice(WORDS)
+            elif roll < 0.7:
+                tags.insert(rng.randint(0, len(tags)), rng.choice(WORDS))
+            elif tags:
+                del tags[rng.randrange(len(tags))]
+            prompt = ", ".join(tags)
+            parsed = parsed.update(prompt)
+            categorized, trace = parse_prompt(prompt)
+            assert parsed.categorized == categorized
+            assert parsed.records == trace
+
+
+def test_update_reuses_records_before_the_edit():
+    rules = get_rule_set()
+    parsed = IncrementalParse.parse("1girl, blonde hair, bikini, reiq, reiq style, beach", rules)
+
+    edited = parsed.update("1girl, blonde hair, bikini, reiq, reiq style, city", rules)
+
+    assert edited.records[:5] == parsed.records[:5]
+    assert all(new is old for new, old in zip(edited.records[:5], parsed.records[:5]))
+    assert edited.records[5]["tag"] == "city"
+    assert parsed.update("1girl, blonde hair, bikini, reiq, reiq style, beach", rules) is parsed
+
+
+def test_update_after_character_edits_inside_groups():
+    rng = random.Random(11)
+    alphabet = "ab (),[]{}\\:1.2 ,"
+    for _ in range(500):
+        prompt = "1girl, solo, (blonde hair, blue eyes:1.2), bikini, reiq, reiq style, \\(x\\)"
+        parsed = IncrementalParse.parse(prompt)
+        for _ in range(4):
+            start = rng.randint(0, len(prompt))
+            end = min(len(prompt), start + rng.randint(0, 3))
+            inserted = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 3)))
+            prompt = prompt[:start] + inserted + prompt[end:]
+            parsed = parsed.update(prompt)
+            fresh = IncrementalParse.parse(prompt)
+            assert parsed.tags == fresh.tags
+            assert parsed.records == fresh.records
+            assert parsed.categorized == parse_prompt(prompt)[0]
+
+
+def test_with_rules_recomputes_only_affected_tags():
+    rules = get_rule_set()
+    prompt = "1girl, blonde hair, space pirate, bikini, arm up, space pirate, beach"
+    parsed = IncrementalParse.parse(prompt, rules)
+
+    changed = rules.with_rule_changes({"Space Pirate": "Pose"})
+    updated = parsed.with_rules(changed)
+
+    categorized, trace = parse_prompt(prompt, rules=changed)
+    assert updated.categorized == categorized
+    assert updated.records == trace
+    # Antes da primeira tag afetada nada é refeito
+    assert all(new is old for new, old in zip(updated.records[:2], parsed.records[:2]))
+    assert updated.records[5]["motivo"] == "Regra customizada"
+    assert changed.changed_tags(rules) == frozenset({"space pirate"})
+    assert parsed.with_rules(rules) is parsed
@@ -0,0 +1,45 @@
+from promptsections.classifier import get_rule_set
+from promptsections.matcher import KeywordMatcher
+
+
+def test_scan_returns_first_keyword_by_list_order():
+    matcher = KeywordMatcher({"cores": ["hair", "long hair", "air"]})
+
+    assert matcher.scan("long hair") == {"cores": "hair"}
+    assert matcher.scan("chair") == {"cores": "hair"}
+    assert matcher.scan("fair") == {"cores": "air"}
+    assert matcher.scan("bald") == {}
+
+
+def test_scan_matches_overlapping_groups_in_one_pass():
+    matcher = KeywordMatcher({"a": ["she", "he"], "b": ["hers", "his"]})
+
+    assert matcher.scan("ushers") == {"a": "she", "b": "hers"}
+
+
+def test_scan_agrees_with_linear_search_over_config():
+    compiled = get_rule_set().compiled
+    groups = {
+        "quality": compiled.quality_terms,
+        "background": compiled.background_keywords,
+        "physical": compiled.physical_traits,
+        "clothing": compiled.clothing_keywords,
+        "pose": compiled.pose_keywords,
+        "action": compiled.action_clothing_keywords,
+    }
+    samples = [
+        "blurry background",
+        "long hair with highlights",
+        "arm behind head",
+        "highleg leotard with flames on it",
+        "looking at viewer",
+        "masterpiece",
+        "tsinne",
+    ]
+    for sample in samples:
+        expected = {
+            group: next(keyword for keyword in keywords if keyword in sample)
+            for group, keywords in groups.items()
+            if any(keyword in sample for keyword in keywords)
+        }
+        assert compiled.matcher.scan(sample) == expected
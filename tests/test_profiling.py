@@ -0,0 +1,77 @@
+import json
+import pstats
+
+from promptsections import profiling
+from promptsections.classifier import get_rule_set, parse_prompt
+from promptsections.cli import main
+from promptsections.incremental import IncrementalParse
+
+PROMPT = "masterpiece, greg rutkowski, rutkowski style, 1girl, red hair, bikini, standing, beach, tsinne"
+
+
+def test_profiling_does_not_change_results():
+    expected = parse_prompt(PROMPT)
+
+    with profiling.profiled() as profiler:
+        assert parse_prompt(PROMPT) == expected
+
+    assert profiling.ACTIVE is None
+    assert profiler.prompts == 1
+
+
+def test_stages_and_config_lists_are_counted():
+    with profiling.profiled() as profiler:
+        parse_prompt(PROMPT)
+        IncrementalParse.parse(PROMPT)
+
+    snapshot = profiler.snapshot()
+    assert snapshot["prompts"] == 2
+    assert snapshot["tags"] == 18
+    assert snapshot["stages"]["Qualidade"]["hits"] == 2
+    assert snapshot["stages"]["Estilo"]["hits"] == 4
+    assert snapshot["stages"]["Sem regra"]["hits"] == 2
+    assert snapshot["config_lists"]["clothing_keywords"] == 2
+    assert snapshot["top_keywords"]["background_keywords:beach"] == 2
+
+    profiler.reset()
+    assert profiler.snapshot()["prompts"] == 0
+
+
+def test_custom_rules_and_patterns_share_a_stage():
+    rules = get_rule_set().with_custom_rules({"tsinne": "Pose", "* gloves": "Roupas"})
+
+    with profiling.profiled() as profiler:
+        parse_prompt("masterpiece, tsinne, white gloves", rules=rules)
+
+    snapshot = profiler.snapshot()
+    assert snapshot["stages"]["Regras customizadas"]["hits"] == 2
+    assert snapshot["top_keywords"]["custom_pattern:* gloves"] == 1
+
+
+def test_nested_profiled_restores_previous_collector():
+    outer = profiling.enable()
+    try:
+        with profiling.profiled() as inner:
+            parse_prompt("masterpiece")
+        assert profiling.ACTIVE is outer
+        assert inner.prompts == 1
+    finally:
+        profiling.disable()
+
+
+def test_classify_cli_writes_stages_and_pstats(tmp_path, capsys):
+    source = tmp_path / "prompts.txt"
+    source.write_text(f"{PROMPT}\nmasterpiece, beach\n", encoding="utf-8")
+    profile_path = tmp_path / "run.pstats"
+
+    assert main(
+        [
+            "classify", str(source), str(tmp_path / "out.jsonl"),
+            "--workers", "2", "--stages", "--profile", str(profile_path),
+        ]
+    ) == 0
+
+    err = capsys.readouterr().err
+    snapshot = json.loads(err[err.index("{"):err.rindex("}") + 1])
+    assert snapshot["prompts"] == 2
+    assert any("parse_prompt" in name for _, _, name in pstats.Stats(str(profile_path)).stats)
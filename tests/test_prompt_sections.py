@@ -1,24 +1,33 @@
+import os
+import pickle
+import subprocess
+import sys
+from pathlib import Path
+
 import app
+from promptsections import classifier
+
+ROOT = Path(__file__).resolve().parent.parent
 
 
 def test_detect_style_pair():
     tags = ["melkor", "melkor_bt_style", "extra"]
-    is_style, next_index = app.detect_style(tags, 0)
+    is_style, next_index = classifier.detect_style(tags, 0)
 
     assert is_style is True
     assert next_index == 2
 
 
 def test_is_physical_trait_matches_hair():
-    assert app.is_physical_trait("long hair with highlights")
-    assert not app.is_physical_trait("arm raised")
+    assert classifier.is_physical_trait("long hair with highlights")
+    assert not classifier.is_physical_trait("arm raised")
 
 
 def test_parse_prompt_separates_categories_and_trace():
     prompt = (
         "1girl, solo, blush, bikini, masterpiece, best quality, tsinne, 3d, outdoors"
     )
-    categorized, trace = app.parse_prompt(prompt)
+    categorized, trace = classifier.parse_prompt(prompt)
 
     assert categorized["Qualidade"] == ["masterpiece", "best quality"]
     assert categorized["Background"] == ["((simple background))"]
@@ -33,29 +42,89 @@ def test_parse_prompt_separates_categories_and_trace():
 
 
 def test_custom_rule_moves_tag_to_personagem():
-    original_rules = app.CUSTOM_RULES.copy()
+    original_rules = classifier.get_rule_set()
     try:
-        app.CUSTOM_RULES = {"cyberpunk": "Personagem"}
-        categorized, _ = app.parse_prompt("cyberpunk")
+        classifier.update_custom_rules({"cyberpunk": "Personagem"})
+        categorized, _ = classifier.parse_prompt("cyberpunk")
         assert categorized["Personagem"] == ["cyberpunk"]
     finally:
-        app.CUSTOM_RULES = original_rules
+        classifier.set_rule_set(original_rules)
 
 
 def test_clothing_tag_detected_outside_character_section():
-    categorized, _ = app.parse_prompt("thighhighs, boots")
+    categorized, _ = classifier.parse_prompt("thighhighs, boots")
     assert "thighhighs" in categorized["Roupas"]
     assert "boots" in categorized["Roupas"]
 
 
 def test_emphasis_tags_are_normalized():
-    categorized, trace = app.parse_prompt("(bra:1.4), 1girl")
+    categorized, trace = classifier.parse_prompt("(bra:1.4), 1girl")
     assert "bra" in categorized["Restante do Prompt"]
     assert "1girl" in categorized["Personagem"]
     assert any(item["tag"] == "bra" for item in trace)
 
 
 def test_pose_tags_are_separated():
-    categorized, _ = app.parse_prompt("looking at viewer, standing, 1girl")
+    categorized, _ = classifier.parse_prompt("looking at viewer, standing, 1girl")
     assert "looking at viewer" in categorized["Pose"]
     assert "standing" in categorized["Pose"]
+
+
+def test_tag_cache_reuses_decisions_and_invalidates_on_rule_change():
+    original_rules = classifier.get_rule_set()
+    try:
+        classifier.update_custom_rules({})
+        classifier.parse_prompt("vaporwave, vaporwave")
+        stats = classifier.tag_cache_stats()
+        assert stats["misses"] == 1
+        assert stats["hits"] == 1
+
+        classifier.update_custom_rules({"Vaporwave": "Estilo"})
+        assert classifier.tag_cache_stats()["size"] == 0
+        categorized, _ = classifier.parse_prompt("vaporwave")
+        assert categorized["Estilo"] == ["vaporwave"]
+    finally:
+        classifier.set_rule_set(original_rules)
+
+
+def test_tag_cache_key_includes_character_section_state():
+    first, _ = classifier.parse_prompt("space pirate")
+    second, _ = classifier.parse_prompt("1girl, space pirate")
+    assert first["Restante do Prompt"] == ["space pirate"]
+    assert second["Personagem"] == ["1girl", "space pirate"]
+
+
+def test_classify_prompt_cached_reuses_result_until_rules_change():
+    original_rules = classifier.get_rule_set()
+    try:
+        classifier.update_custom_rules({})
+        first = app.classify_prompt_cached("synthwave, 1girl")
+        assert app.classify_prompt_cached("synthwave, 1girl") is first
+
+        classifier.update_custom_rules({"synthwave": "Estilo"})
+        categorized, _, formatted = app.classify_prompt_cached("synthwave, 1girl")
+        assert categorized["Estilo"] == ["synthwave"]
+        assert formatted == "synthwave\n\n1girl"
+    finally:
+        classifier.set_rule_set(original_rules)
+
+
+def test_importing_core_does_not_load_streamlit_or_touch_disk(tmp_path):
+    data_dir = tmp_path / "data"
+    code = (
+        "import sys, promptsections\n"
+        "assert 'streamlit' not in sys.modules\n"
+        "assert promptsections.classifier._ACTIVE_RULES is None\n"
+    )
+    env = dict(os.environ, PROMPT_SECTIONS_DATA_DIR=str(data_dir))
+    subprocess.run([sys.executable, "-c", code], check=True, env=env, cwd=ROOT)
+    assert not data_dir.exists()
+
+
+def test_rule_set_survives_pickling_for_spawned_workers():
+    rules = classifier.get_rule_set().with_custom_rules({"cyberpunk": "Personagem"})
+    restored = pickle.loads(pickle.dumps(rules))
+
+    assert restored.version == rules.version
+    categorized, _ = classifier.parse_prompt("cyberpunk", rules=restored)
+    assert categorized["Personagem"] == ["cyberpunk"]
@@ -0,0 +1,96 @@
+import sqlite3
+
+from promptsections.archive import PromptArchive
+from promptsections.classifier import get_rule_set, parse_prompt
+from promptsections.incremental import IncrementalParse
+from promptsections.rule_index import PatternRules, RuleLayer, canonical_rules, canonical_tag
+
+
+def test_canonical_tag_folds_spellings_and_emphasis():
+    for spelling in ["long_sleeves", " Long  Sleeves ", "long-sleeves", "((long sleeves:1.2))", "[Long_Sleeves]"]:
+        assert canonical_tag(spelling) == "long sleeves"
+    assert canonical_tag("16:9") == "16:9"
+    assert canonical_rules({"Long_Sleeves": "Pose", "long sleeves": "Roupas", " ": "Pose"}) == {
+        "long sleeves": "Roupas"
+    }
+
+
+def test_pattern_rules_prefer_the_most_specific_pattern():
+    patterns = PatternRules(
+        {"* hair": "Personagem", "blue *": "Roupas", "blue * hair": "Pose", "*": "Estilo", "a*b*c": "Pose"}
+    )
+
+    assert len(patterns) == 4
+    assert patterns.match("red hair") == ("Personagem", "* hair")
+    assert patterns.match("blue eyes") == ("Roupas", "blue *")
+    assert patterns.match("blue long hair") == ("Pose", "blue * hair")
+    assert patterns.match("abc") == ("Estilo", "*")
+    assert PatternRules({"ab*ba": "Pose"}).match("aba") is None
+    assert PatternRules({"ab*c": "Roupas", "a*bc": "Pose", "*abc": "Estilo"}).match("abc") == ("Pose", "a*bc")
+    assert PatternRules({}).match("red hair") is None
+
+
+def test_parse_prompt_applies_canonical_and_pattern_rules():
+    rules = get_rule_set().with_custom_rules({"Space_Pirate": "Pose", "* gloves": "Roupas"})
+
+    categorized, trace = parse_prompt("space-pirate, (Space Pirate:1.1), white_gloves", rules=rules)
+
+    assert categorized["Pose"] == ["space-pirate", "Space Pirate"]
+    assert categorized["Roupas"] == ["white_gloves"]
+    assert trace[2]["motivo"] == "Regra customizada por padrão (* gloves)"
+
+
+def test_pattern_changes_invalidate_every_tag():
+    rules = get_rule_set()
+    exact = rules.with_rule_changes({"Space-Pirate": "Pose"})
+    pattern = exact.with_rule_changes({"space *": "Roupas"})
+
+    assert exact.changed_tags(rules) == frozenset({"space pirate"})
+    assert pattern.changed_tags(exact) is None
+
+    prompt = "masterpiece, space_pirate, space suit"
+    parsed = IncrementalParse.parse(prompt, rules)
+    for new_rules in (exact, pattern):
+        parsed = parsed.with_rules(new_rules)
+        assert parsed.records == parse_prompt(prompt, rules=new_rules)[1]
+
+
+def test_rule_layer_behaves_like_a_dict():
+    base = RuleLayer({"a": 1, "b": 2, "c": 3})
+    layer = base.updated({"b": None, "d": 4}).updated({"a": 5, "b": 6, "ghost": None})
+
+    assert dict(base) == {"a": 1, "b": 2, "c": 3}
+    assert layer.base is base.base
+    assert list(layer.items()) == [("a", 5), ("c", 3), ("d", 4), ("b", 6)]
+    assert len(layer) == 4 and "ghost" not in layer and layer.get("ghost") is None
+
+    for index in range(200):
+        layer = layer.updated({f"k{index}": index})
+    assert len(layer.delta) <= 64 and layer.base is not base.base and len(layer) == 204
+
+
+def test_rule_changes_match_a_rebuilt_rule_set():
+    base = get_rule_set().with_custom_rules({"Space_Pirate": "Pose", "space pirate": "Roupas", "* hair": "Pose"})
+    rules = base.with_rule_changes({"space pirate": None, "* hair": "Estilo", "oekaki": "Estilo"})
+    rebuilt = base.with_custom_rules(rules.custom_rules_raw)
+
+    assert base.version and rules.custom_rules == rebuilt.custom_rules
+    assert rules.custom_rules["space pirate"] == "Pose"
+    assert rules.version == rebuilt.version != base.version
+    assert rules.patterns.match("red hair") == ("Estilo", "* hair")
+    assert rules.with_rule_changes({"oekaki": "Estilo"}) is rules
+
+
+def test_archive_reindexes_old_lowercase_index(tmp_path):
+    path = tmp_path / "archive.sqlite"
+    archive = PromptArchive(path)
+    (prompt_id,) = archive.add_many(["masterpiece, Space_Pirate"])
+    assert archive.prompts_with_tags(["space-pirate"]) == [prompt_id]
+
+    # Arquivo da versão anterior: índice só em minúsculas
+    with sqlite3.connect(path) as conn:
+        conn.execute("UPDATE prompt_tags SET tag_lower = 'space_pirate' WHERE tag_lower = 'space pirate'")
+        conn.execute("PRAGMA user_version = 0")
+    conn.close()
+
+    assert PromptArchive(path).prompts_with_tags(["Space Pirate"]) == [prompt_id]
@@ -0,0 +1,82 @@
+import json
+import sqlite3
+
+from promptsections import classifier
+from promptsections.rules import load_custom_rules, open_rule_store, save_custom_rules
+from promptsections.rules_sqlite import SQLiteRuleStore
+
+
+def test_sqlite_store_point_updates(tmp_path):
+    store = SQLiteRuleStore(tmp_path / "rules.sqlite")
+
+    store.apply({"Long Sleeves": "Roupas", "oekaki": "Estilo"})
+    store.apply({"oekaki": None})
+
+    assert store.writes == 2
+    assert store.load() == {"Long Sleeves": "Roupas"}
+
+
+def test_sqlite_store_drops_the_unused_lowercase_index(tmp_path):
+    path = tmp_path / "rules.sqlite"
+    with sqlite3.connect(path) as conn:
+        conn.executescript(
+            "CREATE TABLE custom_rules (tag TEXT PRIMARY KEY, tag_lower TEXT NOT NULL, category TEXT NOT NULL);"
+            "CREATE INDEX idx_custom_rules_tag_lower ON custom_rules (tag_lower);"
+        )
+    conn.close()
+
+    SQLiteRuleStore(path).apply({"oekaki": "Estilo"})
+
+    with sqlite3.connect(path) as conn:
+        indexes = conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL").fetchall()
+    conn.close()
+    assert indexes == []
+
+
+def test_sqlite_store_paginates_and_filters(tmp_path):
+    store = SQLiteRuleStore(tmp_path / "rules.db")
+    with store.batch():
+        for index in range(30):
+            store.apply({f"tag_{index:02d}": "Pose"})
+        store.apply({"100%": "Estilo"})
+
+    assert store.writes == 1
+    assert store.count() == 31
+    assert store.page(0, 3) == [("100%", "Estilo"), ("tag_00", "Pose"), ("tag_01", "Pose")]
+    assert [tag for tag, _ in store.page(0, 5, search="_2")][:2] == ["tag_20", "tag_21"]
+    assert store.count(search="%") == 1
+
+
+def test_sqlite_json_import_export_roundtrip(tmp_path):
+    fallback = tmp_path / "custom_rules.json"
+    fallback.write_text(json.dumps({"oekaki": "Estilo"}), encoding="utf-8")
+    store = open_rule_store(tmp_path / "rules.sqlite", fallback)
+
+    assert isinstance(store, SQLiteRuleStore)
+    assert store.load() == {"oekaki": "Estilo"}
+    assert store.import_json({" Purple Hair ": "Personagem", "invalido": 3}) == 1
+    assert json.loads(store.export_json()) == {"Purple Hair": "Personagem", "oekaki": "Estilo"}
+
+
+def test_load_and_save_custom_rules_dispatch_on_extension(tmp_path):
+    path = tmp_path / "rules.sqlite3"
+
+    assert save_custom_rules(path, {"Oekaki": "Estilo"}) is True
+    raw, normalized = load_custom_rules(path)
+
+    assert raw == {"Oekaki": "Estilo"}
+    assert normalized == {"oekaki": "Estilo"}
+
+
+def test_list_custom_rules_uses_sqlite_pages(tmp_path, monkeypatch):
+    original_rules = classifier.get_rule_set()
+    monkeypatch.setattr(classifier, "_RULE_STORE", SQLiteRuleStore(tmp_path / "rules.sqlite"))
+    try:
+        classifier.set_custom_rule("cyberpunk", "Personagem")
+        classifier.set_custom_rule("oekaki", "Estilo")
+
+        total, items = classifier.list_custom_rules(0, 1)
+        assert total == 2
+        assert items == [("cyberpunk", "Personagem")]
+    finally:
+        classifier.set_rule_set(original_rules)
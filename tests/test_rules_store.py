@@ -0,0 +1,145 @@
+import json
+import threading
+
+import pytest
+
+from promptsections import classifier
+from promptsections.rules import RuleStore, RulesFileError, load_custom_rules
+
+
+def read_rules(path):
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def test_store_merges_edits_from_other_writers(tmp_path):
+    path = tmp_path / "custom_rules.json"
+    first = RuleStore(path)
+    second = RuleStore(path)
+
+    first.apply({"oekaki": "Estilo"})
+    second.apply({"cyberpunk": "Personagem"})
+    first.apply({"oekaki": None})
+
+    assert read_rules(path) == {"cyberpunk": "Personagem"}
+    assert [item.name for item in tmp_path.iterdir() if item.suffix == ".tmp"] == []
+
+
+def test_store_starts_from_fallback_rules(tmp_path):
+    fallback = tmp_path / "default.json"
+    fallback.write_text(json.dumps({"oekaki": "Estilo"}), encoding="utf-8")
+    path = tmp_path / "data" / "custom_rules.json"
+
+    RuleStore(path, fallback).apply({"cyberpunk": "Personagem"})
+
+    assert read_rules(path) == {"cyberpunk": "Personagem", "oekaki": "Estilo"}
+
+
+def test_batch_coalesces_edits_into_one_write(tmp_path):
+    path = tmp_path / "custom_rules.json"
+    store = RuleStore(path)
+
+    with store.batch():
+        for index in range(100):
+            store.apply({f"tag{index}": "Pose"})
+
+    assert store.writes == 1
+    assert len(load_custom_rules(path)[0]) == 100
+
+
+def test_corrupt_rules_file_is_not_overwritten(tmp_path):
+    path = tmp_path / "custom_rules.json"
+    path.write_text("{corrompido", encoding="utf-8")
+    store = RuleStore(path)
+
+    with pytest.raises(RulesFileError):
+        store.apply({"oekaki": "Estilo"})
+
+    assert path.read_text(encoding="utf-8") == "{corrompido"
+    assert store.last_flush_ok is False
+    path.write_text(json.dumps({"cyberpunk": "Personagem"}), encoding="utf-8")
+    assert store.flush() is True
+    assert read_rules(path) == {"cyberpunk": "Personagem", "oekaki": "Estilo"}
+
+
+def test_delayed_edits_are_flushed_at_exit(tmp_path):
+    path = tmp_path / "custom_rules.json"
+    store = RuleStore(path, flush_delay=3600)
+
+    assert store.apply({"oekaki": "Estilo"}) is True
+    assert not path.exists()
+
+    store._flush_at_exit()
+    assert read_rules(path) == {"oekaki": "Estilo"}
+
+
+def test_concurrent_threads_do_not_lose_updates(tmp_path):
+    path = tmp_path / "custom_rules.json"
+    stores = [RuleStore(path) for _ in range(4)]
+
+    def worker(store, offset):
+        for index in range(25):
+            store.apply({f"tag{offset}-{index}": "Roupas"})
+
+    threads = [threading.Thread(target=worker, args=(store, n)) for n, store in enumerate(stores)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(read_rules(path)) == 100
+
+
+def test_set_and_delete_custom_rule_use_store(tmp_path, monkeypatch):
+    original_rules = classifier.get_rule_set()
+    path = tmp_path / "custom_rules.json"
+    monkeypatch.setattr(classifier, "_RULE_STORE", RuleStore(path))
+    try:
+        assert classifier.set_custom_rule(" Cyberpunk ", "Personagem") is True
+        assert read_rules(path)["Cyberpunk"] == "Personagem"
+        categorized, _ = classifier.parse_prompt("cyberpunk")
+        assert categorized["Personagem"] == ["cyberpunk"]
+
+        assert classifier.delete_custom_rule("Cyberpunk") is True
+        assert "Cyberpunk" not in read_rules(path)
+        assert "cyberpunk" not in classifier.get_rule_set().custom_rules
+    finally:
+        classifier.set_rule_set(original_rules)
+
+
+def test_unsaved_changes_can_be_rolled_back(tmp_path, monkeypatch):
+    original_rules = classifier.get_rule_set()
+    store = RuleStore(tmp_path / "custom_rules.json")
+
+    def read_only(pending, replace_all):
+        raise OSError("somente leitura")
+
+    monkeypatch.setattr(store, "_write", read_only)
+    monkeypatch.setattr(classifier, "_RULE_STORE", store)
+    try:
+        assert classifier.set_custom_rule("cyberpunk", "Pose", keep_unsaved=False) is False
+        assert classifier.get_rule_set().custom_rules_raw == original_rules.custom_rules_raw
+        before_import = classifier.get_rule_set()
+        assert classifier.replace_custom_rules({"x": "Pose"}, keep_unsaved=False) is False
+        assert classifier.get_rule_set() is before_import
+        assert store._pending == {} and store._replace_all is None
+
+        assert classifier.set_custom_rule("cyberpunk", "Pose") is False
+        assert classifier.get_rule_set().custom_rules_raw["cyberpunk"] == "Pose"
+    finally:
+        classifier.set_rule_set(original_rules)
+
+
+def test_edit_is_undone_when_rules_file_is_corrupt(tmp_path, monkeypatch):
+    original_rules = classifier.get_rule_set()
+    path = tmp_path / "custom_rules.json"
+    path.write_text('{"oekaki": "Est', encoding="utf-8")
+    store = RuleStore(path)
+    monkeypatch.setattr(classifier, "_RULE_STORE", store)
+    try:
+        with pytest.raises(RulesFileError):
+            classifier.set_custom_rule("cyberpunk", "Pose")
+        assert classifier.get_rule_set().custom_rules_raw == original_rules.custom_rules_raw
+        assert store._pending == {}
+        assert path.read_text(encoding="utf-8") == '{"oekaki": "Est'
+    finally:
+        classifier.set_rule_set(original_rules)
@@ -0,0 +1,122 @@
+import asyncio
+import json
+
+import pytest
+
+from promptsections.server import BatchClassifier, BatchTooLarge, ClassificationServer, Overloaded
+
+
+async def _request(port, method, path, payload=None, raw=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = raw if raw is not None else json.dumps(payload or {}).encode("utf-8")
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: test\r\nConnection: close\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1")
+        + body
+    )
+    await writer.drain()
+    data = await reader.read()
+    writer.close()
+    head, _, body = data.partition(b"\r\n\r\n")
+    status = int(head.split()[1])
+    return status, json.loads(body)
+
+
+def _with_server(scenario, **classifier_options):
+    async def main():
+        server = ClassificationServer(port=0, classifier=BatchClassifier(**classifier_options))
+        await server.start()
+        try:
+            return await scenario(server)
+        finally:
+            await server.stop()
+
+    return asyncio.run(main())
+
+
+def test_concurrent_requests_are_batched():
+    async def scenario(server):
+        prompts = [f"1girl, bikini, tag {index}" for index in range(20)]
+        responses = await asyncio.gather(
+            *(_request(server.port, "POST", "/classify", {"prompt": prompt}) for prompt in prompts)
+        )
+        return server, responses
+
+    server, responses = _with_server(scenario, max_delay=0.05)
+
+    assert all(status == 200 for status, _ in responses)
+    assert responses[0][1]["categorized"]["Roupas"] == ["bikini"]
+    assert "trace" not in responses[0][1]
+    assert server.classifier.classified == 20
+    assert server.classifier.batches < 20
+
+
+def test_classify_many_prompts_with_trace_and_health():
+    async def scenario(server):
+        many = await _request(
+            server.port, "POST", "/classify", {"prompts": ["masterpiece", "beach"], "trace": True}
+        )
+        health = await _request(server.port, "GET", "/health")
+        return many, health
+
+    (status, body), (health_status, health) = _with_server(scenario)
+
+    assert status == 200
+    assert [item["formatted"] for item in body["results"]] == ["masterpiece", "((simple background))"]
+    assert body["results"][0]["trace"][0]["categoria"] == "Qualidade"
+    assert health_status == 200
+    assert health["classified"] == 2
+
+
+def test_invalid_requests_get_client_errors():
+    async def scenario(server):
+        return [
+            await _request(server.port, "POST", "/classify", raw=b"{not json"),
+            await _request(server.port, "POST", "/classify", {"prompt": 3}),
+            await _request(server.port, "GET", "/classify"),
+            await _request(server.port, "GET", "/nada"),
+        ]
+
+    statuses = [status for status, _ in _with_server(scenario)]
+
+    assert statuses == [400, 400, 405, 404]
+
+
+def test_full_queue_rejects_new_prompts():
+    async def scenario():
+        classifier = BatchClassifier(max_pending=2)
+        # Fila sem consumidor, para enchê-la de forma determinística
+        classifier._queue = asyncio.Queue(classifier.max_pending)
+        classifier.submit("a")
+        classifier.submit("b")
+        with pytest.raises(Overloaded):
+            classifier.submit("c")
+        return classifier.rejected
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_prompt_lists_are_queued_whole_or_not_at_all():
+    async def scenario():
+        classifier = BatchClassifier(max_pending=3)
+        classifier._queue = asyncio.Queue(classifier.max_pending)
+        classifier.submit("a")
+        with pytest.raises(Overloaded):
+            classifier.submit_many(["b", "c", "d"])
+        pending = classifier.pending
+        with pytest.raises(BatchTooLarge):
+            classifier.submit_many(["b", "c", "d", "e"])
+        futures = classifier.submit_many(["b", "c"])
+        return pending, len(futures), classifier.pending
+
+    assert asyncio.run(scenario()) == (1, 2, 3)
+
+
+def test_prompt_list_longer_than_the_queue_is_too_large():
+    async def scenario(server):
+        return await _request(server.port, "POST", "/classify", {"prompts": ["a", "b", "c"]})
+
+    status, body = _with_server(scenario, max_pending=2)
+
+    assert status == 413
+    assert "2 prompts" in body["error"]
@@ -0,0 +1,78 @@
+from promptsections.classifier import get_rule_set
+from promptsections.sessions import (
+    SessionStore,
+    forget_changes,
+    overlay_changes,
+    pending_changes,
+    replacement_changes,
+    session_rule_set,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_idle_sessions_are_discarded():
+    clock = FakeClock()
+    store = SessionStore(idle_seconds=60, clock=clock)
+    store.put("a", "parse-a")
+    clock.now = 50
+    store.put("b", "parse-b")
+
+    clock.now = 100
+    assert store.get("a") is None
+    assert store.get("b") == "parse-b"
+    assert store.stats() == {"sessions": 1, "max_sessions": 256, "evictions": 1}
+
+
+def test_least_recently_used_session_leaves_past_the_limit():
+    store = SessionStore(max_sessions=2, clock=FakeClock())
+    store.put("a", 1)
+    store.put("b", 2)
+    store.get("a")
+    store.put("c", 3)
+
+    assert store.get("b") is None
+    assert (store.get("a"), store.get("c")) == (1, 3)
+    store.discard("a")
+    assert len(store) == 1
+
+
+def test_overlay_keeps_only_changes_not_yet_active():
+    rules = get_rule_set().with_custom_rules({"oekaki": "Estilo", "tsinne": "Estilo"})
+    overlay = overlay_changes(None, {"oekaki": "Pose"})
+    merged = overlay_changes(overlay, {"tsinne": None, "ghost": None})
+
+    assert overlay == {"oekaki": "Pose"}
+    assert pending_changes(merged, rules) == {"oekaki": "Pose", "tsinne": None}
+    assert pending_changes(merged, rules.with_rule_changes(merged)) == {}
+    assert pending_changes(None, rules) == {}
+
+
+def test_replacement_changes_rebuild_the_imported_rules():
+    rules = get_rule_set().with_custom_rules({"oekaki": "Estilo", "tsinne": "Estilo"})
+    imported = {"tsinne": "Estilo", "bikini": "Roupas"}
+
+    changes = replacement_changes(rules, imported)
+
+    assert changes == {"oekaki": None, "bikini": "Roupas"}
+    assert rules.with_rule_changes(changes).custom_rules_raw == imported
+
+
+def test_session_rule_set_leaves_the_active_set_alone():
+    base = get_rule_set().with_custom_rules({"oekaki": "Estilo"})
+    overlay = {"oekaki": "Pose", "tsinne": "Personagem"}
+
+    local = session_rule_set(overlay, base)
+
+    assert local is not base
+    assert local.custom_rules_raw == {"oekaki": "Pose", "tsinne": "Personagem"}
+    assert base.custom_rules_raw == {"oekaki": "Estilo"}
+    assert session_rule_set(dict(overlay), base) is local
+    assert session_rule_set({"oekaki": "Estilo"}, base) is base
+    assert forget_changes(overlay, ["oekaki"]) == {"tsinne": "Personagem"}
@@ -0,0 +1,58 @@
+import json
+import pickle
+
+from promptsections.classifier import is_style_pair, load_rule_set, parse_prompt
+from promptsections.style import StyleIndex, may_have_style
+
+
+def test_heuristic_pairs_need_style_and_an_author_word():
+    assert is_style_pair("greg_rutkowski", " Rutkowski Style ")
+    assert is_style_pair("by wlop", "wlop-ish style")
+    assert not is_style_pair("greg rutkowski", "rutkowski")
+    assert not is_style_pair("ke", "ke style")
+    assert not is_style_pair("1girl", "anime style")
+
+
+def test_known_artists_match_exactly():
+    index = StyleIndex({"ke": [], "Greg Rutkowski": ["epic fantasy style"], "wlop": "soft glow style"})
+
+    # 2 sufixos por artista, mais os estilos extras
+    assert len(index) == 8
+    assert index.is_pair("ke", "ke style")
+    assert index.is_pair("KE", "ke_style")
+    assert index.is_pair("by greg rutkowski", "Epic Fantasy Style")
+    assert index.is_pair("wlop", "soft glow style")
+    assert not index.is_pair("1girl", "epic fantasy style")
+    assert not index.is_pair("ke", "soft glow style")
+
+
+def test_known_artists_match_any_spelling_of_the_name():
+    index = StyleIndex(["ab cd", "by xy", "e_f"])
+
+    assert index.is_pair("ab_cd", "ab_cd_style")
+    assert index.is_pair("ab cd", "Ab-Cd  Style")
+    assert index.is_pair("by xy", "xy_style")
+    assert index.is_pair("xy", "xy art style")
+    assert index.is_pair("e-f", "e f style")
+    assert not index.is_pair("ab", "ab cd style")
+
+
+def test_may_have_style_skips_prompts_without_style():
+    assert not may_have_style(["1girl", "red hair"])
+    assert may_have_style(["1girl", "Oil STYLE"])
+
+
+def test_config_style_artists_feed_parse_prompt(tmp_path):
+    config_path = tmp_path / "prompt_config.json"
+    config_path.write_text(
+        json.dumps({"style_artists": {"ke": [], "mika pikazo": ["neon pop style"]}}),
+        encoding="utf-8",
+    )
+    rules = load_rule_set(config_path, tmp_path / "custom_rules.json", artifact_path=None)
+
+    categorized, _ = parse_prompt("ke, ke style, mika pikazo, neon pop style, ai, ai style", rules=rules)
+
+    assert categorized["Estilo"] == ["ke", "ke style", "mika pikazo", "neon pop style"]
+    assert categorized["Restante do Prompt"] == ["ai", "ai style"]
+    restored = pickle.loads(pickle.dumps(rules))
+    assert restored.compiled.style.is_pair("ke", "ke style")
@@ -0,0 +1,109 @@
+from promptsections.classifier import parse_prompt
+from promptsections.tokenizer import PromptToken, is_top_level, tag_texts, tokenize_prompt
+
+
+def _texts(prompt):
+    return [token.text for token in tokenize_prompt(prompt)]
+
+
+def _weights(prompt):
+    return {token.text: token.weight for token in tokenize_prompt(prompt)}
+
+
+def test_plain_tags_keep_raw_spans():
+    prompt = " 1girl ,,  (bra:1.4), solo "
+    tokens = list(tokenize_prompt(prompt))
+
+    assert tokens == [
+        PromptToken("1girl", 1, 6, 0, 1.0),
+        PromptToken("bra", 11, 20, 1, 1.4),
+        PromptToken("solo", 22, 26, 0, 1.0),
+    ]
+    assert [prompt[token.start:token.end] for token in tokens] == ["1girl", "(bra:1.4)", "solo"]
+
+
+def test_prompt_without_emphasis_has_the_same_spans():
+    prompt = " 1girl ,,  red hair, solo "
+
+    assert [(token.text, token.start, token.end) for token in tokenize_prompt(prompt)] == [
+        ("1girl", 1, 6),
+        ("red hair", 11, 19),
+        ("solo", 21, 25),
+    ]
+    assert all(token.depth == 0 and token.weight == 1.0 for token in tokenize_prompt(prompt))
+
+
+def test_tag_texts_match_token_texts():
+    for prompt in (" 1girl ,,  red hair, solo ", "1girl, (red hair:1.2), [solo], a\\, b", "", " , "):
+        assert tag_texts(prompt) == _texts(prompt)
+
+
+def test_nested_and_alternative_emphasis_weights():
+    weights = _weights("((simple background)), [blurry], {detailed}, [[(mixed)]]")
+
+    assert weights["simple background"] == 1.21
+    assert weights["blurry"] == round(1 / 1.1, 4)
+    assert weights["detailed"] == 1.05
+    assert weights["mixed"] == round(1.1 / 1.1 / 1.1, 4)
+
+
+def test_explicit_weight_applies_to_the_whole_group():
+    tokens = list(tokenize_prompt("(red hair, blue eyes:1.3), (x:.5), ((y:2))"))
+
+    assert [(token.text, token.depth, token.weight) for token in tokens] == [
+        ("red hair", 1, 1.3),
+        ("blue eyes", 1, 1.3),
+        ("x", 1, 0.5),
+        ("y", 2, 2.2),
+    ]
+
+
+def test_adjacent_groups_are_separate_tags():
+    tokens = list(tokenize_prompt("((a)(b)), ((c) (d):1.2), (e (f))"))
+
+    assert [(token.text, token.depth, token.weight) for token in tokens] == [
+        ("a", 2, 1.21),
+        ("b", 2, 1.21),
+        ("c", 2, 1.32),
+        ("d", 2, 1.32),
+        ("e f", 2, 1.21),
+    ]
+    assert _texts("(a)(b), x(y)") == ["a", "b", "xy"]
+
+
+def test_escaped_characters_stay_in_the_tag():
+    assert _texts(r"kaguya \(oshi no ko\), a\,b, c") == [r"kaguya \(oshi no ko\)", r"a\,b", "c"]
+
+
+def test_unbalanced_brackets_do_not_lose_tags():
+    assert _texts("a)b, (unclosed, x") == ["a)b", "unclosed", "x"]
+    assert _weights("(unclosed, x")["x"] == 1.1
+    assert _texts("<lora:foo:0.8>, tag:1.2") == ["<lora:foo:0.8>", "tag:1.2"]
+
+
+def test_tokenizing_from_a_top_level_comma():
+    prompt = "(a, b:1.2), plain, (c), d"
+    tokens = list(tokenize_prompt(prompt))
+
+    assert [is_top_level(prompt, token) for token in tokens] == [False, False, True, False, True]
+    resumed = list(tokenize_prompt(prompt, prompt.index(",", tokens[2].end) + 1))
+    assert resumed == tokens[3:]
+
+
+def test_tokens_are_generated_lazily():
+    tokens = tokenize_prompt("a, b, (c, d), e")
+
+    assert next(tokens).text == "a"
+    assert next(tokens).text == "b"
+    assert [token.text for token in tokens] == ["c", "d", "e"]
+
+
+def test_parse_prompt_classifies_tags_without_emphasis():
+    categorized, trace = parse_prompt(
+        "1girl, ((Zero Two from Darling in the Franxx)), (masterpiece:1.2), (reiq, reiq style)"
+    )
+
+    assert categorized["Personagem"] == ["1girl", "Zero Two from Darling in the Franxx"]
+    assert categorized["Qualidade"] == ["masterpiece"]
+    assert categorized["Estilo"] == ["reiq", "reiq style"]
+    assert [item["tag"] for item in trace][-2:] == ["reiq", "reiq style"]
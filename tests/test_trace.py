@@ -0,0 +1,58 @@
+import pickle
+
+from promptsections.classifier import get_rule_set, parse_prompt
+from promptsections.trace import TraceRecord, page_trace
+
+
+def test_trace_record_behaves_like_the_old_dict():
+    item = TraceRecord("masterpiece", "Qualidade", "quality", "masterpiece")
+
+    assert item["motivo"] == "Indicador de qualidade (masterpiece)"
+    assert dict(item) == {
+        "tag": "masterpiece",
+        "categoria": "Qualidade",
+        "motivo": "Indicador de qualidade (masterpiece)",
+    }
+    assert item == item.as_dict()
+    assert pickle.loads(pickle.dumps(item)) == item
+    assert not hasattr(item, "__dict__")
+
+
+def test_parse_prompt_without_trace_keeps_categories():
+    prompt = "1girl, blonde hair, bikini, masterpiece, beach"
+
+    categorized, trace = parse_prompt(prompt)
+    untraced, empty = parse_prompt(prompt, trace=False)
+
+    assert untraced == categorized
+    assert empty == []
+    assert [item.reason for item in trace] == [
+        "character_identifier",
+        "physical_trait",
+        "clothing",
+        "quality",
+        "background",
+    ]
+
+
+def test_rule_set_classify_tag_formats_the_reason():
+    rules = get_rule_set()
+
+    assert rules.classify_tag("masterpiece", False) == (
+        "Qualidade",
+        "Indicador de qualidade (masterpiece)",
+        False,
+    )
+    assert rules.decide_tag("masterpiece", False) == ("Qualidade", "quality", "masterpiece", False)
+
+
+def test_page_trace_filters_by_tag_and_category():
+    _, trace = parse_prompt("1girl, red hair, blue hair, bikini, masterpiece, beach")
+
+    assert page_trace(trace, 1, 2) == (6, trace[1:3])
+    total, page = page_trace(trace, 0, 1, search="HAIR")
+    assert total == 2
+    assert [item["tag"] for item in page] == ["red hair"]
+    total, page = page_trace(trace, 0, 10, category="Qualidade")
+    assert (total, [item["tag"] for item in page]) == (1, ["masterpiece"])
+    assert page_trace([item.as_dict() for item in trace], 0, 10, "bik", "Roupas")[0] == 1
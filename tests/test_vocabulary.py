@@ -0,0 +1,87 @@
+import random
+
+import pytest
+
+from promptsections import batch
+from promptsections.classifier import get_rule_set, parse_prompt
+from promptsections.vocabulary import FLIP, TagTable, classify_corpus, np
+
+WORDS = [
+    "1girl", "solo", "masterpiece", "greg rutkowski", "rutkowski style", "oil style", "red hair",
+    "bikini", "beach", "standing", "smile", "tsinne", "(red hair:1.2)", "[solo]",
+    "medieval barmaid", "zero two from darling in the franxx", "",
+]
+NUMPY = [False] + ([True] if np is not None else [])
+
+
+@pytest.fixture
+def rules():
+    # "bikini" vira Personagem fora da seção e Roupas dentro dela: inverte o estado
+    return get_rule_set().with_rule_changes(
+        {"bikini": "Personagem", "smile": "Pose", "tsinne": "Personagem"}
+    )
+
+
+def _corpus(seed, count=400):
+    rng = random.Random(seed)
+    return [", ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 14))) for _ in range(count)]
+
+
+@pytest.mark.parametrize("use_numpy", NUMPY)
+@pytest.mark.parametrize("trace", [False, True])
+def test_corpus_matches_parse_prompt(rules, use_numpy, trace):
+    prompts = _corpus(7)
+    table = TagTable(rules, use_numpy=use_numpy)
+
+    results = list(classify_corpus(prompts, trace=trace, block_size=37, table=table))
+
+    assert results == [parse_prompt(prompt, rules=rules, trace=trace) for prompt in prompts]
+    assert len(table) <= len(WORDS)
+    assert table.transitions[table.ids["bikini"]] == FLIP
+
+
+def test_style_pairs_are_greedy_and_stay_inside_a_prompt(rules):
+    prompts = ["greg rutkowski, rutkowski style, rutkowski style", "greg rutkowski", "rutkowski style"]
+
+    results = list(classify_corpus(prompts, rules=rules))
+
+    assert results[0][0]["Estilo"] == ["greg rutkowski", "rutkowski style"]
+    assert results[2][0]["Estilo"] == []
+    assert results == [parse_prompt(prompt, rules=rules, trace=False) for prompt in prompts]
+
+
+def test_vocabulary_restarts_past_max_tags(rules):
+    prompts = [f"tag{index}, 1girl" for index in range(50)]
+
+    results = list(classify_corpus(prompts, rules=rules, block_size=10, max_tags=15))
+
+    assert results == [parse_prompt(prompt, rules=rules, trace=False) for prompt in prompts]
+
+
+def test_records_keep_errors_in_order():
+    records = [
+        {"line": 1, "error": "x"},
+        {"line": 2, "prompt": "1girl, bikini"},
+        {"line": 3, "error": "y"},
+        {"line": 4, "prompt": "masterpiece"},
+        {"line": 5, "error": "z"},
+    ]
+
+    results = list(batch.classify_records_by_vocabulary(records, include_trace=True))
+
+    assert [result["line"] for result in results] == [1, 2, 3, 4, 5]
+    assert results[1]["categorized"]["Roupas"] == ["bikini"]
+    assert results[3]["trace"][0]["categoria"] == "Qualidade"
+    assert results == list(batch.classify_records(records, include_trace=True))
+
+
+def test_classify_file_with_vocabulary(tmp_path):
+    source = tmp_path / "prompts.txt"
+    source.write_text("\n".join(_corpus(3, 60)), encoding="utf-8")
+    plain = tmp_path / "plain.jsonl"
+    by_vocabulary = tmp_path / "vocabulary.jsonl"
+
+    batch.classify_file(str(source), str(plain))
+    batch.classify_file(str(source), str(by_vocabulary), vocabulary=True)
+
+    assert by_vocabulary.read_text(encoding="utf-8") == plain.read_text(encoding="utf-8")
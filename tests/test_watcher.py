@@ -0,0 +1,116 @@
+import json
+import os
+
+import pytest
+
+from promptsections import classifier
+from promptsections import watcher as watcher_module
+from promptsections.rules import RuleStore, read_rules_file
+from promptsections.watcher import RulesWatcher
+
+
+@pytest.fixture
+def rule_files(tmp_path):
+    original_rules = classifier.get_rule_set()
+    config_path = tmp_path / "prompt_config.json"
+    config_path.write_text(json.dumps({"quality_terms": ["masterpiece"]}), encoding="utf-8")
+    rules_path = tmp_path / "custom_rules.json"
+    rules_path.write_text(json.dumps({"oekaki": "Estilo"}), encoding="utf-8")
+    classifier.set_rule_set(classifier.load_rule_set(config_path, rules_path))
+    yield config_path, rules_path
+    classifier.set_rule_set(original_rules)
+
+
+def touch_later(path, content):
+    stat = os.stat(path)
+    path.write_text(content, encoding="utf-8")
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_watcher_ignores_unchanged_files(rule_files):
+    config_path, rules_path = rule_files
+    watcher = RulesWatcher(config_path, rules_path, rules_path)
+    before = classifier.get_rule_set()
+
+    assert watcher.check() is False
+    assert classifier.get_rule_set() is before
+
+
+def test_watcher_swaps_rule_set_when_rules_change(rule_files):
+    config_path, rules_path = rule_files
+    watcher = RulesWatcher(config_path, rules_path, rules_path)
+
+    touch_later(rules_path, json.dumps({"oekaki": "Qualidade"}))
+
+    assert watcher.check() is True
+    categorized, _ = classifier.parse_prompt("oekaki")
+    assert categorized["Qualidade"] == ["oekaki"]
+    assert watcher.reloads == 1
+
+
+def test_watcher_recompiles_changed_config(rule_files):
+    config_path, rules_path = rule_files
+    watcher = RulesWatcher(config_path, rules_path, rules_path)
+
+    touch_later(config_path, json.dumps({"quality_terms": ["masterpiece", "newest"]}))
+
+    assert watcher.check() is True
+    categorized, _ = classifier.parse_prompt("newest")
+    assert categorized["Qualidade"] == ["newest"]
+
+
+def test_watcher_keeps_rules_when_file_is_invalid(rule_files):
+    config_path, rules_path = rule_files
+    watcher = RulesWatcher(config_path, rules_path, rules_path)
+    before = classifier.get_rule_set()
+
+    touch_later(config_path, "{ incompleto")
+
+    assert watcher.check() is False
+    assert classifier.get_rule_set() is before
+
+
+def test_watcher_keeps_rules_when_rules_file_is_invalid(rule_files):
+    config_path, rules_path = rule_files
+    watcher = RulesWatcher(config_path, rules_path, rules_path)
+    before = classifier.get_rule_set()
+
+    touch_later(rules_path, '{"oekaki": "Qual')
+
+    assert watcher.check() is False
+    assert classifier.get_rule_set() is before
+    assert before.custom_rules_raw == {"oekaki": "Estilo"}
+
+    # Arquivo completo: a próxima verificação tenta de novo e recarrega
+    touch_later(rules_path, json.dumps({"oekaki": "Qualidade"}))
+    assert watcher.check() is True
+    assert classifier.get_rule_set().custom_rules_raw == {"oekaki": "Qualidade"}
+
+
+def test_watcher_skips_reloading_its_own_writes(rule_files, monkeypatch):
+    config_path, rules_path = rule_files
+    monkeypatch.setattr(classifier, "_RULE_STORE", RuleStore(rules_path))
+    watcher = RulesWatcher(config_path, rules_path, rules_path)
+
+    reads = []
+
+    def counting_read(path):
+        reads.append(path)
+        return read_rules_file(path)
+
+    monkeypatch.setattr(watcher_module, "read_rules_file", counting_read)
+
+    assert classifier.set_custom_rule("tsinne", "Pose") is True
+    saved = classifier.get_rule_set()
+
+    assert watcher.check() is False
+    assert classifier.get_rule_set() is saved
+    assert reads == []
+
+    # Edição de outro processo junto com a próxima gravação: essa é recarregada
+    other = RuleStore(rules_path)
+    other.apply({"bikini": "Roupas"})
+    assert classifier.set_custom_rule("cyberpunk", "Pose") is True
+    assert watcher.check() is True
+    assert reads == [rules_path]
+    assert classifier.get_rule_set().custom_rules_raw["bikini"] == "Roupas"